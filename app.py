@@ -1,22 +1,89 @@
-from flask import Flask, render_template, abort, request, jsonify
+import json
+import os
+import tempfile
+from urllib.parse import quote
+from flask import Flask, Response, render_template, abort, request, jsonify
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.ttl_cache import TTLCache
+from utils.shared_snapshot import SharedSnapshot
 
 app = Flask(__name__)
 
 # Base API URL (adjust if needed)
-API_URL = "https://611vkfrpca.execute-api.us-east-2.amazonaws.com/products"
+API_BASE_URL = "https://611vkfrpca.execute-api.us-east-2.amazonaws.com"
+API_URL = f"{API_BASE_URL}/products"
+ORDERS_URL = f"{API_BASE_URL}/orders"
+
+# (connect, read) timeouts in seconds for calls to the API
+API_TIMEOUT = (3.05, 10)
+
+# One pooled session for every API call, so connections are kept alive
+# between page views. Idempotent GETs are retried on gateway errors.
+http = requests.Session()
+http.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=int(os.environ.get("API_POOL_SIZE", "20")),
+    max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=(502, 503, 504), allowed_methods=("GET",))
+))
+
+# Product pages are served from here for PRODUCT_CACHE_TTL seconds;
+# unknown ids are remembered for PRODUCT_NOT_FOUND_TTL seconds
+product_cache = TTLCache(
+    maxsize=int(os.environ.get("PRODUCT_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("PRODUCT_CACHE_TTL", "30")),
+    negative_ttl=float(os.environ.get("PRODUCT_NOT_FOUND_TTL", "5"))
+)
+
+# Attributes the storefront pages need from the catalog
+CATALOG_FIELDS = "productId,product_name,price,quantity"
+
+def load_catalog():
+    """Page through the whole catalog and return it as a JSON body"""
+    items = []
+    cursor = None
+    while True:
+        params = {"limit": 1000, "fields": CATALOG_FIELDS}
+        if cursor:
+            params["cursor"] = cursor
+        response = http.get(API_URL, params=params, timeout=API_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+        items.extend(data.get("items", []))
+        cursor = data.get("next_cursor")
+        if not cursor:
+            break
+    return json.dumps({"items": items, "count": len(items)}).encode("utf-8")
+
+# Catalog snapshot shared by every worker on the host: one upstream scan per
+# CATALOG_TTL seconds at most, however many pages are being viewed
+catalog = SharedSnapshot(
+    os.environ.get("CATALOG_SNAPSHOT_PATH", os.path.join(tempfile.gettempdir(), "catalog-snapshot.json")),
+    load_catalog,
+    ttl=float(os.environ.get("CATALOG_TTL", "30")),
+    max_stale=float(os.environ.get("CATALOG_MAX_STALE", "600"))
+)
 
 def get_product(product_id):
+    found, product = product_cache.lookup(product_id)
+    if found:
+        return product
+
     try:
-        response = requests.get(API_URL)
+        response = http.get(f"{API_URL}/{quote(product_id, safe='')}", timeout=API_TIMEOUT)
+        if response.status_code == 404:
+            product_cache.set(product_id, None)
+            return None
         response.raise_for_status()
-        data = response.json()
-        for product in data.get("items", []):
-            if product["productId"] == product_id:
-                return product
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching product data: {e}")
-    return None
+        product = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        # Errors aren't cached, the next view tries again
+        print(f"Error fetching product {product_id}: {e}")
+        return None
+
+    product_cache.set(product_id, product)
+    return product
 
 @app.route('/')
 def home():
@@ -36,25 +103,34 @@ def checkout():
     if not cart:
         return jsonify({"error": "Cart is empty"}), 400
 
-    # Process each cart item
+    lines = []
     for item in cart:
         product_id = item.get("productId")
         quantity = item.get("quantity")
         if not product_id or not quantity:
             return jsonify({"error": "Invalid cart item"}), 400
+        lines.append({"productId": product_id, "quantity": quantity})
+
+    # The whole cart is sold in one call; the API takes every line out of
+    # stock together or not at all
+    try:
+        response = http.post(ORDERS_URL, json={"cart": lines, "remarks": "Sold Product"}, timeout=API_TIMEOUT)
+        result = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Checkout error: {e}")
+        return jsonify({"error": "Error processing checkout"}), 500
 
-        try:
-            response = requests.post(
-                f"{API_URL}/{product_id}/inventory",
-                params={"quantity": -quantity, "remarks": "Sold Product"}
-            )
-            if response.status_code != 200:
-                return jsonify({"error": f"Failed to purchase product with id {product_id}"}), 500
-        except requests.exceptions.RequestException as e:
-            print(f"Checkout error for product {product_id}: {e}")
-            return jsonify({"error": f"Error processing checkout for product {product_id}"}), 500
+    # Stock changed (or was found to be stale), so don't serve these from cache
+    for line in lines:
+        product_cache.invalidate(line["productId"])
 
-    return jsonify({"message": "Purchase successful!"}), 200
+    if response.status_code != 200:
+        message = result.get("message", "Checkout failed")
+        if result.get("productId"):
+            message = f"{message} (product {result['productId']})"
+        return jsonify({"error": message}), response.status_code if response.status_code < 500 else 500
+
+    return jsonify({"message": result.get("message", "Purchase successful!"), "order_id": result.get("order_id")}), 200
 
 @app.route('/product/<product_id>')
 def product_detail(product_id):
@@ -63,5 +139,25 @@ def product_detail(product_id):
         abort(404)
     return render_template('product_detail.html', product=product)
 
+@app.route('/api/products')
+def api_products():
+    try:
+        meta, body = catalog.read()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Error loading catalog: {e}")
+        return jsonify({"error": "Catalog unavailable"}), 502
+    response = Response(body, mimetype="application/json", headers={
+        "Content-Length": str(meta["size"]),
+        "Cache-Control": "public, max-age=5",
+        "X-Snapshot-Age": str(meta["age"])
+    })
+    # Each snapshot write gets a new fetched_at, so it identifies the content
+    response.set_etag(f"{meta['fetched_at']}-{meta['size']}")
+    return response.make_conditional(request)
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(product_cache.stats())
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8080)
@@ -0,0 +1,243 @@
+import hashlib
+import io
+import threading
+import time
+import zlib
+from decimal import Decimal
+import botocore.exceptions
+from boto3.dynamodb.types import TypeSerializer
+
+
+def make_products(count):
+    """Build a synthetic catalog shaped like the products table"""
+    return [
+        {
+            "productId": f"P{i:07d}",
+            "brand_name": f"Brand {i % 97}",
+            "product_name": f"Product {i}",
+            "price": Decimal(f"{(i % 500) + 0.99:.2f}"),
+            "quantity": Decimal(i % 250),
+        }
+        for i in range(count)
+    ]
+
+
+class FakeTable:
+    """
+    In-memory stand-in for a boto3 Table that mimics scan paging.
+
+    Every scan() call sleeps for `latency` seconds to model the network
+    round trip and returns at most `page_size` items, the way DynamoDB
+    stops a page at 1 MB.
+    """
+
+    def __init__(self, items, key="productId", page_size=1000, latency=0.02):
+        self.items = list(items)
+        self.key = key
+        self.page_size = page_size
+        self.latency = latency
+        self.calls = 0
+        self._segments = {}
+
+    def _segment_items(self, segment, total_segments):
+        if total_segments is None:
+            return self.items
+        if (segment, total_segments) not in self._segments:
+            self._segments[(segment, total_segments)] = [
+                item for item in self.items
+                if zlib.crc32(item[self.key].encode()) % total_segments == segment
+            ]
+        return self._segments[(segment, total_segments)]
+
+    def _project(self, item, projection, names):
+        if not projection:
+            return dict(item)
+        fields = [names.get(f.strip(), f.strip()) for f in projection.split(",")]
+        return {f: item[f] for f in fields if f in item}
+
+    def scan(self, Segment=None, TotalSegments=None, ExclusiveStartKey=None, Limit=None,
+             ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+
+        items = self._segment_items(Segment, TotalSegments)
+        start = 0
+        if ExclusiveStartKey:
+            start = ExclusiveStartKey["_position"]
+
+        page_size = min(self.page_size, Limit) if Limit else self.page_size
+        page = items[start:start + page_size]
+        response = {
+            "Items": [self._project(item, ProjectionExpression, ExpressionAttributeNames or {}) for item in page],
+            "Count": len(page),
+        }
+        if start + page_size < len(items):
+            # Real keys are opaque to callers; carry the offset alongside the key
+            response["LastEvaluatedKey"] = {self.key: page[-1][self.key], "_position": start + page_size}
+        return response
+
+
+def client_error(code, operation, message=""):
+    return botocore.exceptions.ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+class FakeS3:
+    """
+    In-memory stand-in for a boto3 S3 client: get_object/put_object with
+    If-Match / If-None-Match, enough to exercise conditional writers.
+    """
+
+    def __init__(self, latency=0.0):
+        self.objects = {}   # (bucket, key) -> {"Body", "ETag", "Metadata", ...}
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None, Metadata=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        body = Body if isinstance(Body, bytes) else Body.encode("utf-8")
+        with self._lock:
+            current = self.objects.get((Bucket, Key))
+            if IfNoneMatch == "*" and current is not None:
+                raise client_error("PreconditionFailed", "PutObject")
+            if IfMatch is not None and (current is None or current["ETag"] != IfMatch):
+                raise client_error("PreconditionFailed", "PutObject")
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            self.objects[(Bucket, Key)] = {"Body": body, "ETag": etag, "Metadata": dict(Metadata or {}), **kwargs}
+        return {"ETag": etag}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        with self._lock:
+            current = self.objects.get((Bucket, Key))
+        if current is None:
+            raise client_error("NoSuchKey", "GetObject")
+        if IfNoneMatch is not None and IfNoneMatch == current["ETag"]:
+            raise client_error("304", "GetObject", "Not Modified")
+        return {
+            "Body": io.BytesIO(current["Body"]),
+            "ETag": current["ETag"],
+            "Metadata": dict(current["Metadata"]),
+            "ContentLength": len(current["Body"])
+        }
+
+
+def stream_record(event_name, product):
+    """Build a DynamoDB Streams record (NEW_IMAGE view) for a product change"""
+    serializer = TypeSerializer()
+    change = {"Keys": {"productId": serializer.serialize(product["productId"])}}
+    if event_name != "REMOVE":
+        change["NewImage"] = {name: serializer.serialize(value) for name, value in product.items()}
+    return {"eventName": event_name, "eventSource": "aws:dynamodb", "dynamodb": change}
+
+
+class CallCounter:
+    """
+    Counts calls made through wrapped stand-ins as "service.operation",
+    optionally sleeping `latency` seconds per call to model the round trip.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, service, target):
+        return _Counted(self, service, target)
+
+    def record(self, operation):
+        with self._lock:
+            self.counts[operation] = self.counts.get(operation, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def since(self, snapshot):
+        """Calls per operation made after `snapshot` was taken"""
+        current = self.snapshot()
+        return {
+            operation: count - snapshot.get(operation, 0)
+            for operation, count in current.items()
+            if count != snapshot.get(operation, 0)
+        }
+
+
+class _Counted:
+    def __init__(self, counter, service, target):
+        self._counter = counter
+        self._service = service
+        self._target = target
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute) or name.startswith("_"):
+            return attribute
+
+        operation = f"{self._service}.{name}"
+
+        def call(*args, **kwargs):
+            self._counter.record(operation)
+            return attribute(*args, **kwargs)
+
+        # Cache the wrapper so later lookups skip __getattr__
+        self.__dict__[name] = call
+        return call
+
+
+class FakeSQS:
+    """In-memory stand-in for a boto3 SQS client that accepts every message"""
+
+    def __init__(self):
+        self.sent = 0
+
+    def get_queue_url(self, QueueName, **kwargs):
+        return {"QueueUrl": f"https://sqs.local/000000000000/{QueueName}"}
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        self.sent += 1
+        return {"MessageId": f"m-{self.sent}"}
+
+    def send_message_batch(self, QueueUrl, Entries, **kwargs):
+        self.sent += len(Entries)
+        return {"Successful": [{"Id": entry["Id"], "MessageId": f"m-{entry['Id']}"} for entry in Entries], "Failed": []}
+
+
+class FakeEventBridge:
+    """In-memory stand-in for a boto3 EventBridge client"""
+
+    def __init__(self):
+        self.events = 0
+
+    def put_events(self, Entries, **kwargs):
+        self.events += len(Entries)
+        return {"FailedEntryCount": 0, "Entries": [{"EventId": f"e-{i}"} for i in range(len(Entries))]}
+
+
+class FakeCloudWatchLogs:
+    """In-memory stand-in for a boto3 CloudWatch Logs client"""
+
+    def __init__(self):
+        self.streams = set()
+        self.log_events = 0
+
+    def create_log_group(self, logGroupName, **kwargs):
+        return {}
+
+    def create_log_stream(self, logGroupName, logStreamName, **kwargs):
+        self.streams.add((logGroupName, logStreamName))
+        return {}
+
+    def describe_log_streams(self, logGroupName, logStreamNamePrefix=None, **kwargs):
+        return {"logStreams": [
+            {"logStreamName": stream} for group, stream in self.streams
+            if group == logGroupName and stream.startswith(logStreamNamePrefix or "")
+        ]}
+
+    def put_log_events(self, logGroupName, logStreamName, logEvents, **kwargs):
+        self.log_events += len(logEvents)
+        return {"nextSequenceToken": str(self.log_events)}
@@ -0,0 +1,299 @@
+"""
+Benchmark handlers/product_handler.handler route by route with synthetic
+API Gateway proxy events, against local stand-ins for every AWS service.
+
+DynamoDB is the SQLite ProductStore (each store operation counts as one
+DynamoDB call); S3, SQS, EventBridge and CloudWatch Logs are the in-memory
+fakes from benchmarks.fakes. Nothing touches the network, so results only
+measure the handlers themselves plus any --latency added per AWS call.
+
+For every catalog size and route it reports p50/p95/p99 latency,
+throughput, AWS calls per request and the peak memory one request
+allocates (measured in a separate tracemalloc pass, which is slow).
+Output is JSON so runs can be diffed across changes.
+
+Usage:
+    python -m benchmarks.handler_benchmark [--sizes 1000 10000] [--requests 200]
+        [--warmup 20] [--memory-requests 20] [--latency 0] [--seed 42]
+        [--routes get_product search ...] [--snapshot] [--metrics] [--output results.json]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from urllib.parse import quote
+
+# Telemetry is sent at the end of each invocation rather than by a
+# background thread, so its calls land in the request that made them
+os.environ.setdefault("TELEMETRY_MODE", "deferred")
+os.environ.setdefault("SQS_PRODUCER_MODE", "sync")
+
+from benchmarks.fakes import (
+    CallCounter, FakeS3, FakeSQS, FakeEventBridge, FakeCloudWatchLogs, make_products
+)
+from models.sqlite_product_store import SQLiteProductStore
+from utils import aws_clients, decimal_encoder, metrics
+from utils.stock_index import stock_shard
+import gateway.dynamodb_gateway as product_gateway
+from handlers.product_handler import handler
+
+SNAPSHOT_BUCKET = "benchmark-catalog"
+
+
+class Catalog:
+    """Product ids the event factories draw from, and ids created during the run"""
+
+    def __init__(self, products, rng):
+        self.ids = [product["productId"] for product in products]
+        self.names = [product["product_name"] for product in products]
+        self.brands = sorted({product["brand_name"] for product in products})
+        # Enough stock that repeated single-unit orders keep succeeding
+        self.in_stock = [product["productId"] for product in products if product["quantity"] >= 100] or self.ids
+        self.rng = rng
+        self.created = []
+        self._sequence = 0
+
+    def product_id(self):
+        return self.rng.choice(self.ids)
+
+    def new_product(self):
+        self._sequence += 1
+        product_id = f"BENCH{self._sequence:07d}"
+        self.created.append(product_id)
+        return {
+            "productId": product_id,
+            "brand_name": self.rng.choice(self.brands),
+            "product_name": f"Benchmark product {self._sequence}",
+            "price": 19.99,
+            "quantity": self.rng.randint(0, 250)
+        }
+
+
+def api_event(method, resource, path_parameters=None, query=None, body=None):
+    """A REST API (v1) Lambda proxy event, shaped like the ones API Gateway sends"""
+    path = resource
+    for name, value in (path_parameters or {}).items():
+        path = path.replace("{" + name + "}", quote(str(value), safe=""))
+    headers = {
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Host": "api.example.com",
+        "User-Agent": "handler-benchmark",
+        "X-Forwarded-Proto": "https"
+    }
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+    return {
+        "resource": resource,
+        "path": path,
+        "httpMethod": method,
+        "headers": headers,
+        "multiValueHeaders": {name: [value] for name, value in headers.items()},
+        "queryStringParameters": query,
+        "multiValueQueryStringParameters": {name: [value] for name, value in query.items()} if query else None,
+        "pathParameters": path_parameters,
+        "stageVariables": None,
+        "requestContext": {
+            "resourcePath": resource,
+            "httpMethod": method,
+            "path": "/dev" + path,
+            "stage": "dev",
+            "requestId": f"{random.getrandbits(64):016x}",
+            "requestTimeEpoch": int(time.time() * 1000),
+            "identity": {"sourceIp": "203.0.113.10", "userAgent": "handler-benchmark"}
+        },
+        "body": None if body is None else json.dumps(body),
+        "isBase64Encoded": False
+    }
+
+
+# (name, event factory); writes that add products come before the route that deletes them
+ROUTES = [
+    ("list_products", lambda c: api_event("GET", "/products")),
+    ("list_products_page", lambda c: api_event("GET", "/products", query={"limit": "100"})),
+    ("create_product", lambda c: api_event("POST", "/products", body=c.new_product())),
+    ("create_products_bulk", lambda c: api_event("POST", "/products", body=[c.new_product() for _ in range(25)])),
+    ("search", lambda c: api_event("GET", "/products/search", query={
+        "q": c.rng.choice(c.names).split()[0][:5] + " " + str(c.rng.randint(1, 99))
+    })),
+    ("get_products_batch", lambda c: api_event("GET", "/products/batch", query={
+        "ids": ",".join(c.rng.sample(c.ids, min(50, len(c.ids))))
+    })),
+    ("get_product", lambda c: api_event("GET", "/products/{productId}", {"productId": c.product_id()})),
+    ("update_product", lambda c: api_event("PUT", "/products/{productId}", {"productId": c.product_id()}, body={
+        "price": round(c.rng.uniform(1, 500), 2)
+    })),
+    ("delete_product", lambda c: api_event("DELETE", "/products/{productId}", {
+        "productId": c.created.pop(0) if c.created else c.product_id()
+    })),
+    ("get_inventory", lambda c: api_event("GET", "/products/{productId}/inventory", {"productId": c.product_id()})),
+    ("add_stock", lambda c: api_event("POST", "/products/{productId}/inventory", {"productId": c.product_id()}, body={
+        "quantity": c.rng.randint(1, 10), "remarks": "Restock"
+    })),
+    ("create_order", lambda c: api_event("POST", "/orders", body={
+        "cart": [{"productId": product_id, "quantity": 1} for product_id in c.rng.sample(c.in_stock, min(3, len(c.in_stock)))]
+    })),
+    ("get_by_name", lambda c: api_event("GET", "/products/by-name", query={"product_name": c.rng.choice(c.names)})),
+    ("lowest_quantity", lambda c: api_event("GET", "/products/lowest_quantity")),
+    ("lowest_quantity_k", lambda c: api_event("GET", "/products/lowest_quantity", query={"k": "10"})),
+]
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def install_fakes(calls):
+    """Point the shared client registry at counted in-memory stand-ins"""
+    fakes = {"s3": FakeS3(), "sqs": FakeSQS(), "events": FakeEventBridge(), "logs": FakeCloudWatchLogs()}
+    for service, fake in fakes.items():
+        aws_clients.set_client(service, calls.wrap(service, fake))
+
+
+def build_service(products, calls, store_path, snapshot):
+    """A ProductService over a freshly seeded SQLite store, installed as the handlers' service"""
+    if store_path != ":memory:" and os.path.exists(store_path):
+        os.remove(store_path)
+    store = SQLiteProductStore(store_path)
+    store.put_products({**product, "current_stock": product["quantity"], "stock_shard": stock_shard(product["productId"])}
+                       for product in products)
+
+    service = product_gateway.ProductService()
+    service.store = calls.wrap("dynamodb", store)
+    if snapshot:
+        product_gateway.CATALOG_SNAPSHOT_BUCKET = SNAPSHOT_BUCKET
+        service.catalog_snapshot.rebuild(store.scan_products())
+    else:
+        product_gateway.CATALOG_SNAPSHOT_BUCKET = None
+    product_gateway._product_service = service
+    return service
+
+
+def run_route(make_event, catalog, calls, requests, warmup, memory_requests):
+    events = [make_event(catalog) for _ in range(warmup + requests)]
+    for event in events[:warmup]:
+        handler(event, None)
+
+    latencies, statuses = [], {}
+    before = calls.snapshot()
+    started = time.perf_counter()
+    for event in events[warmup:]:
+        request_started = time.perf_counter()
+        response = handler(event, None)
+        latencies.append(time.perf_counter() - request_started)
+        status = str(response.get("statusCode"))
+        statuses[status] = statuses.get(status, 0) + 1
+    elapsed = time.perf_counter() - started
+    aws_calls = calls.since(before)
+
+    # Memory is measured separately; tracemalloc slows every allocation down
+    peak = 0
+    memory_events = [make_event(catalog) for _ in range(memory_requests)]
+    tracemalloc.start()
+    try:
+        for event in memory_events:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            handler(event, None)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "status_codes": statuses,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3)
+        },
+        "throughput_rps": round(requests / elapsed, 1),
+        "aws_calls_per_request": {
+            "total": round(sum(aws_calls.values()) / requests, 3),
+            **{operation: round(count / requests, 3) for operation, count in sorted(aws_calls.items())}
+        },
+        "peak_memory_kib": round(peak / 1024, 1) if memory_requests else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="catalog sizes to seed")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per route")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per route first")
+    parser.add_argument("--memory-requests", type=int, default=20, help="requests in the tracemalloc pass (0 to skip)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every AWS call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--routes", nargs="+", choices=[name for name, _ in ROUTES], help="only these routes")
+    parser.add_argument("--snapshot", action="store_true", help="serve GET /products from an S3 catalog snapshot")
+    parser.add_argument("--store-path", default=":memory:", help="SQLite file for the DynamoDB stand-in")
+    parser.add_argument("--metrics", action="store_true", help="keep the per-invocation EMF metrics on (written to /dev/null)")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    # The EMF lines would otherwise be mixed into the JSON on stdout
+    if args.metrics:
+        metrics.configure(enabled=True, output=open(os.devnull, "w"))
+    else:
+        metrics.configure(enabled=False)
+
+    calls = CallCounter(latency=args.latency)
+    install_fakes(calls)
+    routes = [(name, make_event) for name, make_event in ROUTES if not args.routes or name in args.routes]
+
+    results = []
+    for size in args.sizes:
+        # Same seed per size, so a size's events are identical between runs
+        rng = random.Random(args.seed)
+        random.seed(args.seed)
+        products = make_products(size)
+        build_service(products, calls, args.store_path, args.snapshot)
+        catalog = Catalog(products, rng)
+
+        for name, make_event in routes:
+            result = {"catalog_size": size, "route": name,
+                      **run_route(make_event, catalog, calls, args.requests, args.warmup, args.memory_requests)}
+            results.append(result)
+            print(f"{size:>8} {name:<22} p50 {result['latency_ms']['p50']:>9.3f} ms  "
+                  f"p99 {result['latency_ms']['p99']:>9.3f} ms  {result['throughput_rps']:>9.1f} req/s  "
+                  f"{result['aws_calls_per_request']['total']:>6.2f} calls/req  "
+                  f"{result['peak_memory_kib'] or 0:>9.1f} KiB", file=sys.stderr)
+
+    report = {
+        "benchmark": "handler",
+        "config": {
+            "sizes": args.sizes,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "memory_requests": args.memory_requests,
+            "latency": args.latency,
+            "seed": args.seed,
+            "snapshot": args.snapshot,
+            "telemetry_mode": os.environ["TELEMETRY_MODE"],
+            "metrics": args.metrics,
+            "python": platform.python_version(),
+            "orjson": decimal_encoder.orjson is not None
+        },
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Compare a sequential scan with the parallel segmented scan engine.
+
+Usage:
+    python -m benchmarks.scan_benchmark [--items 50000] [--page-size 1000]
+        [--latency 0.02] [--segments 1 2 4 8 16]
+"""
+import argparse
+import time
+
+from benchmarks.fakes import FakeTable, make_products
+from utils.parallel_scan import ParallelScanner, scan_segment
+
+
+def run(table, segments):
+    table.calls = 0
+    started = time.perf_counter()
+    if segments == 1:
+        items = scan_segment(table)
+    else:
+        items = ParallelScanner(table, segments=segments).scan()
+    elapsed = time.perf_counter() - started
+    return len(items), table.calls, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per scan page")
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    table = FakeTable(make_products(args.items), page_size=args.page_size, latency=args.latency)
+
+    print(f"{'segments':>8} {'items':>8} {'calls':>6} {'seconds':>8} {'speedup':>8}")
+    baseline = None
+    for segments in args.segments:
+        count, calls, elapsed = run(table, segments)
+        baseline = baseline or elapsed
+        print(f"{segments:>8} {count:>8} {calls:>6} {elapsed:>8.3f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
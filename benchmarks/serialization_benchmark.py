@@ -0,0 +1,66 @@
+"""
+Compare response serialization paths on a synthetic catalog, and the cost
+and savings of gzip-compressing the result.
+
+Usage:
+    python -m benchmarks.serialization_benchmark [--items 50000] [--repeat 5]
+        [--levels 1 5 9]
+"""
+import argparse
+import gzip
+import json
+import time
+from decimal import Decimal
+
+from benchmarks.fakes import make_products
+from utils import decimal_encoder
+from utils.decimal_encoder import DecimalEncoder
+
+
+def best_of(repeat, func):
+    """Fastest of `repeat` runs, in seconds, and the last result"""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 5, 9], help="gzip levels to try")
+    args = parser.parse_args()
+
+    body = {"items": make_products(args.items), "status": "success"}
+
+    paths = [
+        ("json + DecimalEncoder", lambda: json.dumps(body, cls=DecimalEncoder)),
+        ("json, C default hook", lambda: decimal_encoder._compact_encoder.encode(body)),
+    ]
+    if decimal_encoder.orjson is not None:
+        orjson = decimal_encoder.orjson
+        paths.append(("orjson", lambda: orjson.dumps(body, default=Decimal.__str__).decode("utf-8")))
+    else:
+        print("orjson is not installed, skipping it\n")
+
+    print(f"{'serializer':<24} {'ms':>8} {'bytes':>10} {'speedup':>8}")
+    baseline = None
+    for name, func in paths:
+        elapsed, text = best_of(args.repeat, func)
+        baseline = baseline or elapsed
+        print(f"{name:<24} {elapsed * 1000:>8.1f} {len(text):>10} {baseline / elapsed:>7.1f}x")
+
+    # What the handlers send: decimal_encoder.dumps picks the fastest available path
+    raw = decimal_encoder.dumps(body).encode("utf-8")
+    print(f"\n{'gzip level':<24} {'ms':>8} {'bytes':>10} {'ratio':>8}")
+    for level in args.levels:
+        elapsed, compressed = best_of(args.repeat, lambda: gzip.compress(raw, compresslevel=level, mtime=0))
+        print(f"{level:<24} {elapsed * 1000:>8.1f} {len(compressed):>10} {len(raw) / len(compressed):>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,76 @@
 import json
-import csv
 import logging
-import urllib
 import time
 import os
-import boto3
+import heapq
+import uuid
 import botocore.exceptions
+from functools import cached_property
 from decimal import Decimal
-from boto3.dynamodb.conditions import Key
-from decimal import Decimal
+from boto3.dynamodb.types import TypeDeserializer
 from models.eventbridge_event import EventbridgeEvent
-from utils.decimal_encoder import DecimalEncoder
-from utils.generate_code import generate_code
-from models.sqs_service import send_message_to_queue
-from models.logging_service import log_product_creation
+from models.product_store import (
+    create_product_store, InventoryAdjustmentError, PRODUCT_NOT_FOUND, INSUFFICIENT_STOCK, INVALID_QUANTITY,
+    TRANSACTION_CONFLICT
+)
+from models.sqs_service import sqs_producer
+from utils.decimal_encoder import DecimalEncoder, dumps
+from utils.pagination import encode_cursor, decode_cursor, parse_limit, parse_fields
+from utils.telemetry import telemetry, flush_telemetry
+from utils.metrics import emit_metrics
+from utils.aws_clients import get_client
+from utils.startup_profiler import timed_init, profile_startup
+from utils.s3_stream import iter_s3_lines, read_first_line
+from utils.job_checkpoint import CheckpointStore, make_job_id, upload_id, plan_byte_ranges, DEFAULT_RANGE_BYTES
+from utils.stock_index import stock_shard
+from utils.search_index import SearchIndex, RESULT_FIELDS
+from utils.http_cache import conditional_response
+from utils.http_compression import accepts_gzip, gzipped, gzip_response
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Inventory transactions embedded in a product read, and the default page
+# size of GET /products/{productId}/inventory
+INVENTORY_HISTORY_PREVIEW = int(os.environ.get("INVENTORY_HISTORY_PREVIEW", "10"))
+INVENTORY_PAGE_SIZE = 50
+
+# Largest ?k= accepted by GET /products/lowest_quantity
+MAX_LOWEST_K = 100
+
+# Numeric product attributes; CSV imports arrive as strings
+NUMERIC_PRODUCT_FIELDS = ("price", "quantity")
+
+# DynamoDB's item size limit. A product's JSON is a little larger than its
+# stored size, so this errs on the side of rejecting.
+MAX_PRODUCT_BYTES = 400 * 1024
+
+# GET /products is served from this S3 snapshot when CATALOG_SNAPSHOT_BUCKET is set
+CATALOG_SNAPSHOT_BUCKET = os.environ.get("CATALOG_SNAPSHOT_BUCKET")
+CATALOG_SNAPSHOT_KEY = os.environ.get("CATALOG_SNAPSHOT_KEY", "catalog/products.json.gz")
+
+# Catalog listings may be reused briefly by browsers/CDNs; single-product
+# reads always revalidate (cheap with If-None-Match)
+CATALOG_CACHE_CONTROL = os.environ.get("CATALOG_CACHE_CONTROL", "public, max-age=5")
+
+# Most ids accepted by one GET /products/batch request
+MAX_BATCH_IDS = 500
+
+# GET /products/search: the in-memory index is checked against the catalog
+# snapshot every SEARCH_INDEX_TTL seconds, or rebuilt from a scan every
+# SEARCH_INDEX_SCAN_TTL seconds when there is no snapshot
+SEARCH_INDEX_TTL = float(os.environ.get("SEARCH_INDEX_TTL", "30"))
+SEARCH_INDEX_SCAN_TTL = float(os.environ.get("SEARCH_INDEX_SCAN_TTL", "300"))
+MAX_SEARCH_RESULTS = 100
+
+# Most products accepted by one POST /products array
+MAX_BULK_CREATE = 1000
+PRODUCTS_QUEUE_NAME = "products-queue-johnbons-sqs"
+
+# TransactWriteItems takes at most 100 actions and every order line uses two
+# (the product update and its ledger row)
+MAX_ORDER_LINES = 50
+
 class ProductService:
     """Service class for handling product-related operations in DynamoDB"""
     
@@ -25,25 +78,52 @@ class ProductService:
         self.table_name = os.environ.get('DYNAMODB_TABLE')
         self.inventory_table_name = "ProductInventory-chall-johnbons2"
         self.region = "us-east-2"
-        self.dynamodb = boto3.resource("dynamodb", region_name=self.region)
-        self.product_table = self.dynamodb.Table(self.table_name)
-        self.inventory_table = self.dynamodb.Table(self.inventory_table_name)
-        self.log_client = boto3.client("logs", region_name=self.region)
-        self.s3_client = boto3.client('s3', region_name=self.region)
+
+        # Search index kept for the container's lifetime, and when to look for a newer catalog
+        self._search_index = None
+        self._search_index_expires = 0
+
+    # AWS resources are built on first use so each route only pays for what it touches
+    @cached_property
+    def store(self):
+        # DynamoDB unless PRODUCT_STORE selects the local SQLite store
+        return create_product_store(self.table_name, self.inventory_table_name, region=self.region)
+
+    @cached_property
+    def s3_client(self):
+        return get_client('s3', region_name=self.region)
+
+    def _new_sqs_sink(self):
+        # One per SQS batch; it's flushed before the batch is acknowledged
+        from models.compacting_sink import CompactingS3Sink
+        return CompactingS3Sink(
+            self.s3_client,
+            bucket=os.environ.get("SQS_SINK_BUCKET", "products-s3bucket-johnbons-sqs"),
+            prefix=os.environ.get("SQS_SINK_PREFIX", "product_created/"),
+            fieldnames=["productId", "brand_name", "product_name", "price", "quantity"]
+        )
+
+    @cached_property
+    def catalog_snapshot(self):
+        # Kept for the container's lifetime so unchanged snapshots aren't downloaded again
+        from models.catalog_snapshot import CatalogSnapshot
+        return CatalogSnapshot(self.s3_client, CATALOG_SNAPSHOT_BUCKET, CATALOG_SNAPSHOT_KEY)
     
     def get_all_products(self, event, context):
         """Retrieve all products from DynamoDB"""
-        try:
-            items = []
-            response = self.product_table.scan()
+        # Callers that pass cursor/limit/fields get a single page; everyone
+        # else keeps the original unpaginated response
+        query_params = event.get("queryStringParameters") or {}
+        if any(param in query_params for param in ("cursor", "limit", "fields")):
+            return self.get_products_page(event, context)
 
-            # Handle pagination if data is more than 1MB
-            while 'LastEvaluatedKey' in response:
-                items.extend(response.get("Items", []))
-                response = self.product_table.scan(ExclusiveStartKey=response["LastEvaluatedKey"])
-            
-            # Add remaining items
-            items.extend(response.get("Items", []))
+        if CATALOG_SNAPSHOT_BUCKET:
+            response = self._catalog_snapshot_response(event)
+            if response is not None:
+                return response
+
+        try:
+            items = self.store.scan_products()
 
             return_body = {"items": items, "status": "success"}
 
@@ -53,13 +133,13 @@ class ProductService:
             # Log the product retrieval
             self._log_product_retrieval(len(items))
 
-            return {
+            return conditional_response(event, {
                 "statusCode": 200,
                 "headers": {
                     "Content-Type": "application/json"  # Ensure correct content type
                 },
-                "body": json.dumps(return_body, cls=DecimalEncoder)
-            }
+                "body": dumps(return_body)
+            }, cache_control=CATALOG_CACHE_CONTROL)
 
         except botocore.exceptions.BotoCoreError as e:
             return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
@@ -70,12 +150,111 @@ class ProductService:
         except Exception as e:
             return {"statusCode": 500, "body": json.dumps({"error": "Internal Server Error", "details": str(e)})}
     
+    def _catalog_snapshot_response(self, event):
+        """
+        Serve GET /products from the catalog snapshot. Returns None when
+        there is no snapshot (or it can't be read) so the caller falls back
+        to a scan.
+        """
+        try:
+            snapshot = self.catalog_snapshot.read()
+        except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as e:
+            logger.exception("Error reading catalog snapshot, scanning instead: %s", e)
+            return None
+        if snapshot is None:
+            logger.warning("No catalog snapshot at s3://%s/%s, scanning instead",
+                           CATALOG_SNAPSHOT_BUCKET, CATALOG_SNAPSHOT_KEY)
+            return None
+
+        body, version, count, compressed = snapshot
+        self._send_products_event(count)
+        self._log_product_retrieval(count)
+
+        # The version identifies the snapshot content, so there's nothing to hash
+        response = conditional_response(event, {
+            "statusCode": 200,
+            "headers": {
+                "Content-Type": "application/json",
+                "X-Catalog-Version": str(version)
+            },
+            "body": body.decode("utf-8")
+        }, etag=f'"catalog-v{version}"', cache_control=CATALOG_CACHE_CONTROL)
+
+        # The object is stored gzip-compressed, so those bytes go out as they are
+        if response["statusCode"] == 200 and accepts_gzip(event):
+            return gzipped(response, compressed)
+        return response
+
+    def get_products_page(self, event, context):
+        """
+        Retrieve one page of products.
+        Supports ?limit=, an opaque ?cursor= from the previous page and
+        ?fields= (comma-separated) to project only the attributes needed.
+        """
+        query_params = event.get("queryStringParameters") or {}
+
+        try:
+            limit = parse_limit(query_params.get("limit"))
+            start_key = decode_cursor(query_params.get("cursor"))
+        except ValueError as e:
+            return {"statusCode": 400, "body": json.dumps({"message": f"Bad Request: {e}"})}
+
+        try:
+            items, last_key = self.store.scan_page(limit, start_key, fields=parse_fields(query_params.get("fields")))
+
+            return_body = {
+                "items": items,
+                "count": len(items),
+                "next_cursor": encode_cursor(last_key),
+                "status": "success"
+            }
+
+            # Send event to EventBridge
+            self._send_products_event(len(items))
+
+            # Log the product retrieval
+            self._log_product_retrieval(len(items))
+
+            return conditional_response(event, {
+                "statusCode": 200,
+                "headers": {
+                    "Content-Type": "application/json"
+                },
+                "body": dumps(return_body)
+            }, cache_control=CATALOG_CACHE_CONTROL)
+
+        except botocore.exceptions.ClientError as e:
+            # A cursor that decodes fine but doesn't match the key schema
+            if e.response['Error']['Code'] == 'ValidationException':
+                return {"statusCode": 400, "body": json.dumps({"message": e.response['Error']['Message']})}
+            return {"statusCode": 500, "body": json.dumps({"error": e.response['Error']['Message']})}
+
+        except botocore.exceptions.BotoCoreError as e:
+            return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+        except ValueError as e:
+            # The local store's equivalent of a ValidationException
+            return {"statusCode": 400, "body": json.dumps({"message": f"Bad Request: {e}"})}
+
+        except Exception as e:
+            return {"statusCode": 500, "body": json.dumps({"error": "Internal Server Error", "details": str(e)})}
+
     def create_one_product(self, event, context):
-        """Create a single product in DynamoDB"""
-        body = json.loads(event["body"], parse_float=Decimal)
+        """Create a single product in DynamoDB, or many when the body is a JSON array"""
+        try:
+            body = json.loads(event["body"], parse_float=Decimal)
+        except (TypeError, json.JSONDecodeError):
+            return {"statusCode": 400, "body": json.dumps({"message": "Invalid JSON body"})}
+        if isinstance(body, list):
+            return self.create_products(body)
+
+        try:
+            body = self._prepare_product(body)
+        except ValueError as e:
+            return {"statusCode": 400, "body": json.dumps({"message": f"Bad Request: {e}"})}
         
-        # Save product to DynamoDB
-        self.product_table.put_item(Item=body)
+        # Save product to DynamoDB, placing it in its low-stock index shard
+        self.store.put_product({**body, "stock_shard": stock_shard(body["productId"])})
         
         # Send message to SQS
         self._send_product_to_sqs(body)
@@ -88,7 +267,86 @@ class ProductService:
         
         return {"statusCode": 200, "body": json.dumps(body, cls=DecimalEncoder)}
 
-    
+
+    def create_products(self, products):
+        """
+        Create many products in one request. The writes go through
+        BatchWriteItem, SQS gets packed SendMessageBatch calls and the
+        EventBridge/CloudWatch telemetry is sent in batches, so the AWS round
+        trips per product drop from about seven to well under one.
+
+        Returns one result per submitted product, in order; 207 if any failed.
+        """
+        if not products:
+            return {"statusCode": 400, "body": json.dumps({"message": "Bad Request: no products given"})}
+        if len(products) > MAX_BULK_CREATE:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": f"Bad Request: at most {MAX_BULK_CREATE} products per request"})
+            }
+
+        # Items DynamoDB would reject are reported here, since one of them
+        # fails every other product in its BatchWriteItem call
+        results = [None] * len(products)
+        valid, seen = [], set()
+        for index, product in enumerate(products):
+            try:
+                product = self._prepare_product(product)
+            except ValueError as e:
+                product_id = product.get("productId") if isinstance(product, dict) else None
+                if isinstance(product_id, str) and product_id:
+                    results[index] = {"index": index, "productId": product_id, "status": "invalid", "error": str(e)}
+                else:
+                    results[index] = {"index": index, "status": "invalid", "error": str(e)}
+                continue
+            product_id = product["productId"]
+            if product_id in seen:
+                # BatchWriteItem rejects a key twice in one call
+                results[index] = {"index": index, "productId": product_id, "status": "invalid",
+                                  "error": "Duplicate productId in request"}
+            else:
+                seen.add(product_id)
+                valid.append((index, product))
+
+        failed_keys = []
+        self.store.put_products(
+            ({**product, "stock_shard": stock_shard(product["productId"])} for _, product in valid),
+            failed_keys=failed_keys
+        )
+        failed = {key["productId"] for key in failed_keys}
+
+        created = []
+        for index, product in valid:
+            if product["productId"] in failed:
+                results[index] = {"index": index, "productId": product["productId"], "status": "failed",
+                                  "error": "Write was not processed"}
+            else:
+                results[index] = {"index": index, "productId": product["productId"], "status": "created"}
+                created.append((index, product))
+
+        unsent = self._send_products_to_sqs([product for _, product in created])
+
+        log_stream_name = time.strftime("%Y/%m/%d")
+        for index, product in created:
+            results[index]["queued"] = product["productId"] not in unsent
+            # Queued in the telemetry buffer, which sends 10 events per put_events
+            self._send_event_to_eventbridge(product)
+            telemetry.put_log("/aws/lambda/product-creation-logs", log_stream_name,
+                              f"Product created: {product['productId']}")
+
+        summary = {
+            "submitted": len(products),
+            "created": len(created),
+            "failed": len(failed),
+            "invalid": len(products) - len(valid),
+            "not_queued": len(unsent)
+        }
+        logger.info("Bulk product creation: %s", json.dumps(summary))
+        return {
+            "statusCode": 200 if summary["created"] == len(products) else 207,
+            "body": json.dumps({**summary, "results": results})
+        }
+
     def get_one_product(self, event, context):
         """Retrieve a single product by ID, including inventory data"""
         # Extract the productId from the API Gateway event
@@ -102,45 +360,162 @@ class ProductService:
         product_id = path_params["productId"]
 
         # Get the product details
-        response = self.product_table.get_item(Key={"productId": product_id})
+        product = self.store.get_product(product_id)
 
         # Check if the product exists
-        if "Item" not in response:
+        if product is None:
             return {
                 "statusCode": 404,
                 "body": json.dumps({"message": "Product not found"})
             }
         
-        product = response["Item"]
-        
-        # Get inventory transactions for this product
+        # Get the most recent inventory transactions for this product;
+        # the full history is paged through GET /products/{productId}/inventory
         try:
-            inventory_response = self.inventory_table.query(
-                KeyConditionExpression=boto3.dynamodb.conditions.Key('productId').eq(product_id)
-            )
+            inventory_items, next_cursor = self._latest_inventory(product_id)
             
-            inventory_items = inventory_response.get('Items', [])
-            
-            # Calculate total stock by summing all quantity values
-            total_stock = sum(Decimal(item.get('quantity', 0)) for item in inventory_items)
+            # current_stock is maintained on the product item; only products
+            # that predate it fall back to summing the ledger
+            if 'current_stock' not in product:
+                product['current_stock'] = self.store.sum_inventory(product_id)
             
             # Add inventory information to product
-            product['current_stock'] = total_stock
             product['inventory_history'] = inventory_items
+            product['inventory_history_cursor'] = next_cursor
             
         except Exception as e:
             # If there's an error with inventory, still return the product but with a note
             product['current_stock'] = "Error fetching inventory"
             product['inventory_error'] = str(e)
 
-        return {
+        return conditional_response(event, {
             "statusCode": 200,
             "headers": {
                 "Content-Type": "application/json"  # Ensure the correct content type
             },
-            "body": json.dumps(product, cls=DecimalEncoder)
-        }
+            "body": dumps(product)
+        })
         
+    def search_products(self, event, context):
+        """
+        Search products by product_name and brand_name.
+        Expects ?q= and optionally ?limit= (default 20). Matches prefixes and
+        small typos; results are ranked best first.
+        """
+        query_params = event.get("queryStringParameters") or {}
+        query = (query_params.get("q") or "").strip()
+        if not query:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": "Bad Request: q is required"})
+            }
+        try:
+            limit = parse_limit(query_params.get("limit"), default=20, maximum=MAX_SEARCH_RESULTS)
+        except ValueError as e:
+            return {"statusCode": 400, "body": json.dumps({"message": f"Bad Request: {e}"})}
+
+        try:
+            index = self._current_search_index()
+        except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as e:
+            logger.exception("Error building the search index: %s", e)
+            return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+
+        started = time.perf_counter()
+        results = index.search(query, limit=limit)
+        took_ms = round((time.perf_counter() - started) * 1000, 3)
+
+        return conditional_response(event, {
+            "statusCode": 200,
+            "headers": {
+                "Content-Type": "application/json",
+                # Kept out of the body so identical results keep the same ETag
+                "Server-Timing": f"search;dur={took_ms}"
+            },
+            "body": dumps({
+                "query": query,
+                "items": [{**product, "score": score} for score, product in results],
+                "count": len(results),
+                "index_version": index.version
+            })
+        }, cache_control=CATALOG_CACHE_CONTROL)
+
+    def _current_search_index(self):
+        """
+        Return the container's search index, rebuilding it when the catalog
+        snapshot has a new version (or, without a snapshot, from a scan once
+        the old one is SEARCH_INDEX_SCAN_TTL seconds old). If the catalog
+        can't be read, an existing index keeps being served.
+        """
+        now = time.monotonic()
+        index = self._search_index
+        if index is not None and now < self._search_index_expires:
+            return index
+
+        try:
+            if CATALOG_SNAPSHOT_BUCKET:
+                snapshot = self.catalog_snapshot.read()
+                if snapshot is not None:
+                    body, version = snapshot[0], snapshot[1]
+                    if index is None or index.version != version:
+                        index = SearchIndex(json.loads(body)["items"], version=version)
+                        logger.info("Built search index for catalog version %s (%d products)", version, len(index))
+                    self._search_index, self._search_index_expires = index, now + SEARCH_INDEX_TTL
+                    return index
+
+            items = self.store.scan_products(fields=list(RESULT_FIELDS))
+            index = SearchIndex(items, version=f"scan-{int(time.time())}")
+            logger.info("Built search index from a scan (%d products)", len(index))
+            self._search_index, self._search_index_expires = index, now + SEARCH_INDEX_SCAN_TTL
+            return index
+        except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as e:
+            if self._search_index is None:
+                raise
+            logger.exception("Error refreshing the search index, keeping the current one: %s", e)
+            self._search_index_expires = now + SEARCH_INDEX_TTL
+            return self._search_index
+
+    def get_products_batch(self, event, context):
+        """
+        Retrieve several products by ID in one request.
+        Expects ?ids=a,b,c and optionally ?fields= to project attributes.
+        Items come back in the order the ids were given; ids that don't
+        exist are listed under "missing".
+        """
+        query_params = event.get("queryStringParameters") or {}
+        ids = [i.strip() for i in (query_params.get("ids") or "").split(",") if i.strip()]
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": "Bad Request: ids is required"})
+            }
+        if len(ids) > MAX_BATCH_IDS:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": f"Bad Request: at most {MAX_BATCH_IDS} ids per request"})
+            }
+
+        try:
+            items, unprocessed_ids = self.store.get_products(ids, fields=parse_fields(query_params.get("fields")))
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] == 'ValidationException':
+                return {"statusCode": 400, "body": json.dumps({"message": e.response['Error']['Message']})}
+            logger.exception("Error fetching products %s: %s", ids, e)
+            return {"statusCode": 500, "body": json.dumps({"error": e.response['Error']['Message']})}
+
+        found = {item["productId"]: item for item in items}
+        skipped = set(unprocessed_ids)
+        return conditional_response(event, {
+            "statusCode": 200,
+            "headers": {"Content-Type": "application/json"},
+            "body": dumps({
+                "items": [found[product_id] for product_id in ids if product_id in found],
+                "count": len(found),
+                "missing": [product_id for product_id in ids if product_id not in found and product_id not in skipped],
+                "unprocessed": unprocessed_ids
+            })
+        })
+
     def get_one_product_by_name(self, event, context):
         """
         Retrieve a single product by product_name using a GSI.
@@ -163,19 +538,14 @@ class ProductService:
         
         # Query the table using the GSI on product_name
         try:
-            response = self.product_table.query(
-                IndexName="product_name-index",
-                KeyConditionExpression=Key("product_name").eq(product_name)
-            )
-            logger.info("DynamoDB query response: %s", json.dumps(response, default=str))
+            items = self.store.query_products_by_name(product_name)
         except Exception as e:
-            logger.exception("Error querying product_table with product_name %s: %s", product_name, e)
+            logger.exception("Error querying products with product_name %s: %s", product_name, e)
             return {
                 "statusCode": 500,
                 "body": json.dumps({"message": "Internal Server Error", "error": str(e)})
             }
         
-        items = response.get("Items", [])
         logger.info("Query returned %d items", len(items))
         
         if not items:
@@ -191,24 +561,77 @@ class ProductService:
         
         # Retrieve and attach inventory details using the product's productId
         try:
-            inventory_response = self.inventory_table.query(
-                KeyConditionExpression=Key('productId').eq(product.get("productId"))
-            )
-            logger.info("Inventory query response: %s", json.dumps(inventory_response, default=str))
-            inventory_items = inventory_response.get('Items', [])
-            total_stock = sum(Decimal(item.get('quantity', 0)) for item in inventory_items)
-            product['current_stock'] = total_stock
+            inventory_items, next_cursor = self._latest_inventory(product.get("productId"))
+            logger.info("Latest inventory transactions: %s", json.dumps(inventory_items, default=str))
+            if 'current_stock' not in product:
+                product['current_stock'] = self.store.sum_inventory(product.get("productId"))
             product['inventory_history'] = inventory_items
+            product['inventory_history_cursor'] = next_cursor
         except Exception as e:
             logger.exception("Error fetching inventory for productId %s: %s", product.get("productId"), e)
             product['current_stock'] = "Error fetching inventory"
             product['inventory_error'] = str(e)
         
         logger.info("Returning product with inventory info: %s", json.dumps(product, default=str))
+        return conditional_response(event, {
+            "statusCode": 200,
+            "headers": {"Content-Type": "application/json"},
+            "body": dumps(product)
+        })
+    
+    def get_inventory_history(self, event, context):
+        """
+        Retrieve a product's inventory transactions, newest first.
+        Supports ?from= and ?to= (inclusive datetime prefixes, e.g. 2025-01 or
+        2025-01-31T12), ?limit= and an opaque ?cursor= from the previous page.
+        """
+        path_params = event.get("pathParameters")
+        if not path_params or "productId" not in path_params:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": "Bad Request: productId is required"})
+            }
+
+        product_id = path_params["productId"]
+        query_params = event.get("queryStringParameters") or {}
+
+        try:
+            limit = parse_limit(query_params.get("limit"), default=INVENTORY_PAGE_SIZE)
+            start_key = decode_cursor(query_params.get("cursor"))
+        except ValueError as e:
+            return {"statusCode": 400, "body": json.dumps({"message": f"Bad Request: {e}"})}
+
+        if start_key and start_key.get("productId") != product_id:
+            return {"statusCode": 400, "body": json.dumps({"message": "Bad Request: cursor belongs to another product"})}
+
+        # Range conditions on the datetime sort key. "to" is treated as a prefix
+        # so ?to=2025-01-31 includes every transaction on that day.
+        date_to = query_params.get("to")
+        try:
+            items, last_key = self.store.query_inventory(
+                product_id,
+                since=query_params.get("from"),
+                until=date_to + "\uffff" if date_to else None,
+                limit=limit,
+                start_key=start_key
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] == 'ValidationException':
+                return {"statusCode": 400, "body": json.dumps({"message": e.response['Error']['Message']})}
+            logger.exception("Error querying inventory for productId %s: %s", product_id, e)
+            return {"statusCode": 500, "body": json.dumps({"error": e.response['Error']['Message']})}
+        except ValueError as e:
+            return {"statusCode": 400, "body": json.dumps({"message": f"Bad Request: {e}"})}
+
         return {
             "statusCode": 200,
             "headers": {"Content-Type": "application/json"},
-            "body": json.dumps(product, cls=DecimalEncoder)
+            "body": dumps({
+                "productId": product_id,
+                "items": items,
+                "count": len(items),
+                "next_cursor": encode_cursor(last_key)
+            })
         }
     
     def add_stocks_to_product(self, event, context):
@@ -225,17 +648,6 @@ class ProductService:
     
         product_id = path_params["productId"]
         logger.info("Updating inventory for productId: %s", product_id)
-        
-        # Verify product exists
-        product_response = self.product_table.get_item(Key={"productId": product_id})
-        if "Item" not in product_response:
-            logger.warning("Product %s not found", product_id)
-            return {
-                "statusCode": 404,
-                "body": json.dumps({"message": "Product not found"})
-            }
-        
-        product = product_response["Item"]
     
         # Determine input parameters
         # Prioritize queryStringParameters if quantity is provided there, otherwise try JSON body
@@ -277,61 +689,131 @@ class ProductService:
                 "statusCode": 400,
                 "body": json.dumps({"message": "Quantity must be a number"})
             }
-        
-        # Get the current quantity (default to 0 if missing)
-        current_quantity = Decimal(product.get("quantity", 0))
-        new_quantity = current_quantity + quantity_change
-        logger.info("Current quantity: %s, New quantity: %s", str(current_quantity), str(new_quantity))
-        
-        # Ensure it doesn't go below 0
-        if new_quantity < 0:
-            logger.error("New quantity cannot be negative")
+        # NaN can't be compared and Infinity can't be stored
+        if not quantity_change.is_finite():
+            logger.error("Quantity is not a finite number: %s", quantity_change)
             return {
                 "statusCode": 400,
-                "body": json.dumps({"message": "Cannot reduce quantity below 0"})
-            }
-        
-        # Update product's quantity in product_table
-        try:
-            self.product_table.update_item(
-                Key={"productId": product_id},
-                UpdateExpression="SET quantity = :q",
-                ExpressionAttributeValues={":q": new_quantity}
-            )
-            logger.info("Updated product quantity to %s for productId %s", str(new_quantity), product_id)
-        except Exception as e:
-            logger.exception("Error updating product quantity: %s", e)
-            return {
-                "statusCode": 500,
-                "body": json.dumps({"message": "Error updating product quantity", "error": str(e)})
+                "body": json.dumps({"message": "Quantity must be a number"})
             }
         
-        # Log inventory transaction
-        inventory_item = {
-            "productId": product_id,
-            "datetime": time.strftime("%Y-%m-%dT%H:%M:%S"),
-            "quantity": quantity_change,
-            "remarks": input_data.get("remarks", "")
-        }
+        # Apply the quantity change and write the ledger row in one transaction.
+        # The product must exist and its quantity must stay at or above 0.
         try:
-            self.inventory_table.put_item(Item=inventory_item)
+            inventory_item, = self.store.adjust_inventory([(product_id, quantity_change, input_data.get("remarks", ""))])
             logger.info("Logged inventory transaction: %s", json.dumps(inventory_item, default=str))
-        except Exception as e:
-            logger.exception("Error logging inventory transaction: %s", e)
+        except InventoryAdjustmentError as e:
+            error = self._inventory_adjustment_error(e)
+            logger.warning("Inventory update rejected for %s: %s", product_id, error["message"])
+            return {"statusCode": error["statusCode"], "body": json.dumps({"message": error["message"]})}
+        except botocore.exceptions.ClientError as e:
+            logger.exception("Error updating inventory: %s", e)
             return {
                 "statusCode": 500,
-                "body": json.dumps({"message": "Error logging inventory transaction", "error": str(e)})
+                "body": json.dumps({"message": "Error updating inventory", "error": str(e)})
             }
         
         return {
             "statusCode": 200,
             "body": json.dumps({
                 "message": f"Inventory updated for product {product_id}",
-                "new_quantity": str(new_quantity),
+                "quantity_change": quantity_change,
                 "transaction": inventory_item
             }, cls=DecimalEncoder)
         }
     
+
+    def create_order(self, event, context):
+        """
+        Check out a cart: take every line's quantity out of stock and write
+        the ledger rows.
+
+        Carts of up to MAX_ORDER_LINES products are committed in one
+        transaction, so either every line is sold or none is. Larger carts
+        are committed in chunks of MAX_ORDER_LINES; if a chunk is rejected,
+        the chunks already committed are put back before returning the error.
+        Transactions cancelled by a concurrent update of the same products
+        are retried by the store; an order that still conflicts gets a 409
+        with Retry-After, and nothing of it stays committed.
+        """
+        try:
+            body = json.loads(event.get("body") or "{}", parse_float=Decimal)
+        except (TypeError, json.JSONDecodeError) as e:
+            logger.exception("Error parsing JSON body: %s", e)
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": "Invalid JSON body"})
+            }
+
+        cart = body.get("cart") if isinstance(body, dict) else None
+        if not cart or not isinstance(cart, list):
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": "Cart is empty"})
+            }
+
+        # A transaction may touch each product only once, so repeated lines are merged
+        lines = {}
+        for index, item in enumerate(cart):
+            product_id = item.get("productId") if isinstance(item, dict) else None
+            try:
+                quantity = Decimal(str(item.get("quantity")))
+            except (AttributeError, ArithmeticError, ValueError):
+                quantity = None
+            if not (isinstance(product_id, str) and product_id) or quantity is None \
+                    or not quantity.is_finite() or quantity <= 0:
+                return {
+                    "statusCode": 400,
+                    "body": json.dumps({"message": "Invalid cart item", "line": index, "item": item},
+                                       cls=DecimalEncoder)
+                }
+            lines[product_id] = lines.get(product_id, 0) + quantity
+
+        order_id = uuid.uuid4().hex
+        remarks = f"{body.get('remarks') or 'Sold Product'} (order {order_id})"
+        lines = list(lines.items())
+        chunks = [lines[i:i + MAX_ORDER_LINES] for i in range(0, len(lines), MAX_ORDER_LINES)]
+        logger.info("Order %s: %d line(s) in %d transaction(s)", order_id, len(lines), len(chunks))
+
+        committed = []
+        for chunk in chunks:
+            try:
+                self._adjust_order_lines(chunk, -1, remarks)
+            except InventoryAdjustmentError as e:
+                if committed:
+                    self._compensate_order(order_id, committed)
+                error = self._inventory_adjustment_error(e)
+                logger.warning("Order %s rejected for %s: %s", order_id, e.product_id, error["message"])
+                response = {
+                    "statusCode": error["statusCode"],
+                    "body": json.dumps({
+                        "message": error["message"],
+                        "productId": e.product_id,
+                        "order_id": order_id
+                    })
+                }
+                if e.reason == TRANSACTION_CONFLICT:
+                    response["headers"] = {"Retry-After": "1"}
+                return response
+            except botocore.exceptions.ClientError as e:
+                if committed:
+                    self._compensate_order(order_id, committed)
+                logger.exception("Error processing order %s: %s", order_id, e)
+                return {
+                    "statusCode": 500,
+                    "body": json.dumps({"message": "Error processing order", "error": str(e)})
+                }
+            committed.append(chunk)
+
+        return {
+            "statusCode": 200,
+            "body": json.dumps({
+                "message": "Purchase successful!",
+                "order_id": order_id,
+                "lines": [{"productId": product_id, "quantity": quantity} for product_id, quantity in lines],
+                "transactions": len(chunks)
+            }, cls=DecimalEncoder)
+        }
         
     def delete_one_product(self, event, context):
         """Delete a single product by ID"""
@@ -346,7 +828,7 @@ class ProductService:
         product_id = path_params["productId"]
 
         # Attempt to delete the item
-        self.product_table.delete_item(Key={"productId": product_id})
+        self.store.delete_product(product_id)
 
         return {
             "statusCode": 200,
@@ -375,222 +857,535 @@ class ProductService:
             }
 
         # Ensure there's at least one field to update
-        if not body:
+        if not body or not isinstance(body, dict):
             return {
                 "statusCode": 400,
                 "body": json.dumps({"message": "Bad Request: No update data provided"})
             }
 
-        # Build the UpdateExpression dynamically
-        update_expression = "SET " + ", ".join(f"#{k} = :{k}" for k in body.keys())
-        expression_attribute_names = {f"#{k}": k for k in body.keys()}
-        expression_attribute_values = {f":{k}": v for k, v in body.items()}
-
-        # Update the item in DynamoDB
-        response = self.product_table.update_item(
-            Key={"productId": product_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeNames=expression_attribute_names, 
-            ExpressionAttributeValues=expression_attribute_values,
-            ReturnValues="ALL_NEW"
-        )
+        # quantity is the low-stock index's sort key, so DynamoDB refuses a
+        # non-numeric one on any product that is in the index
+        try:
+            for field in NUMERIC_PRODUCT_FIELDS:
+                if field in body:
+                    body[field] = self._parse_number(field, body[field])
+        except ValueError as e:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": f"Bad Request: {e}"})
+            }
+
+        # Update the item, getting every attribute back
+        try:
+            attributes = self.store.update_product(product_id, body)
+        except ValueError as e:
+            return {"statusCode": 400, "body": json.dumps({"message": f"Bad Request: {e}"})}
+        except botocore.exceptions.ClientError as e:
+            logger.exception("Error updating product %s: %s", product_id, e)
+            status_code = 400 if e.response["Error"]["Code"] == "ValidationException" else 500
+            return {
+                "statusCode": status_code,
+                "body": json.dumps({"message": "Error updating product", "error": str(e)})
+            }
 
         return {
             "statusCode": 200,
             "body": json.dumps({
                 "message": "Product updated successfully",
-                "updatedAttributes": response.get("Attributes")
+                "updatedAttributes": attributes
             }, cls=DecimalEncoder)
         }
     
     def batch_create_products(self, event, context):
-        """Process uploaded CSV file to create multiple products"""
+        """Stream an uploaded CSV file from S3 into DynamoDB with parallel BatchWriteItem calls"""
+        # Continuation or fan-out invocation for part of a large file
+        if "bulk_job" in event:
+            return self._run_bulk_part(event["bulk_job"], context)
+
+        # Only the S3-triggered jobs need this; keep it off the API cold start
+        from urllib.parse import unquote_plus
+
         print("File uploaded trigger")
         
         # Extract file location from event payload
         bucket = event['Records'][0]['s3']['bucket']['name']
-        key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'])
+        key = unquote_plus(event['Records'][0]['s3']['object']['key'])
 
         # Ensure only files from for_create/ folder are processed
         if not key.startswith("for_create/"):
             print(f"Skipping file {key} as it is not in the for_create/ folder")
             return {"statusCode": 400, "body": json.dumps({"message": "Invalid file location"})}
 
-        localFilename = f'/tmp/{key.split("/")[-1]}'  # Extract filename only
-        
-        print("Downloading file to /tmp folder")
-        self.s3_client.download_file(bucket, key, localFilename)
-        
-        print("Reading CSV file and inserting into DynamoDB...")
-        
-        with open(localFilename, 'r') as f:
-            csv_reader = csv.DictReader(f)
-            
-            for row in csv_reader:
-                self.product_table.put_item(Item=row)
-        
-        print("All products have been added successfully!")
-        return {"statusCode": 200, "body": json.dumps({"message": "Products added successfully"})}
+        print("Streaming CSV file from S3 and writing to DynamoDB...")
+        return self._start_bulk_job(bucket, key, "create", context, upload_id(event['Records'][0]))
     
     def batch_delete_products(self, event, context):
-        """Process uploaded CSV file to delete multiple products"""
+        """Stream an uploaded CSV file of productIds from S3 and delete them with parallel BatchWriteItem calls"""
+        if "bulk_job" in event:
+            return self._run_bulk_part(event["bulk_job"], context)
+
+        from urllib.parse import unquote_plus
+
         print("File uploaded trigger for deletion")
         
         # Extract file location from event payload
         bucket = event['Records'][0]['s3']['bucket']['name']
-        key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'])
+        key = unquote_plus(event['Records'][0]['s3']['object']['key'])
 
         # Ensure only files from for_delete/ folder are processed
         if not key.startswith("for_delete/"):
             print(f"Skipping file {key} as it is not in the for_delete/ folder")
             return {"statusCode": 400, "body": json.dumps({"message": "Invalid file location"})}
 
-        localFilename = f'/tmp/{key.split("/")[-1]}'  # Extract filename only
-        
-        print("Downloading file to /tmp folder")
-        self.s3_client.download_file(bucket, key, localFilename)
-        
-        print("Reading CSV file and deleting products from DynamoDB...")
-
-        with open(localFilename, 'r') as f:
-            csv_reader = csv.reader(f)
-
-            for row in csv_reader:
-                product_id = row[0]  # Assuming each row contains only one column: productId
-                print(f"Deleting productId: {product_id}")
-
-                self.product_table.delete_item(Key={"productId": product_id})
-
-        print("All products listed in the file have been deleted!")
-        return {"statusCode": 200, "body": json.dumps({"message": "Products deleted successfully"})}
+        print("Streaming CSV file from S3 and deleting products from DynamoDB...")
+        return self._start_bulk_job(bucket, key, "delete", context, upload_id(event['Records'][0]))
     
     def receive_message_from_sqs(self, event, context):
-        """Process SQS messages and create CSV file"""
-        fieldnames = ["productId", "brand_name", "product_name", "price", "quantity"]
-        file_randomized_prefix = generate_code("pycon_", 8)
-        file_name = f'/tmp/product_created_{file_randomized_prefix}.csv'
-        bucket = "products-s3bucket-johnbons-sqs"
-        object_name = f'product_created_{file_randomized_prefix}.csv'
-
-        with open(file_name, 'w') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            for payload in event["Records"]:
-                json_payload = json.loads(payload["body"])
-                writer.writerow(json_payload)
-
-        self.s3_client.upload_file(file_name, bucket, object_name)
-        return {"statusCode": 200, "body": json.dumps({"message": "SQS messages processed successfully"})}
+        """
+        Write an SQS batch of product records to compacted, time-partitioned S3 objects.
+        Returns an SQS partial batch response so unreadable records, and the
+        records of any partition that couldn't be written, are redelivered.
+        """
+        sink = self._new_sqs_sink()
+        failures = []
+        for record in event["Records"]:
+            try:
+                json_payload = json.loads(record["body"])
+                # SentTimestamp is epoch milliseconds; partition by when the product was sent
+                sent_at = int(record.get("attributes", {}).get("SentTimestamp", 0)) / 1000 or None
+                sink.add(json_payload, sent_at, record_id=record["messageId"])
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.error("Skipping SQS message %s: %s", record.get("messageId"), e)
+                failures.append({"itemIdentifier": record["messageId"]})
+
+        _, unwritten = sink.flush()
+        failures.extend({"itemIdentifier": message_id} for message_id in unwritten)
+        return {"batchItemFailures": failures}
     
     # Private helper methods
     def _send_products_event(self, count):
-        """Send event to EventBridge"""
+        """Queue products_fetched event for EventBridge"""
         event_payload = {"total_products": count, "timestamp": time.time()}
         event = EventbridgeEvent("products_fetched", event_payload)
-        event.send()
+        telemetry.put_event(event.to_entry())
         
     def _send_event_to_eventbridge(self, product_data):
-        """Send product creation event to EventBridge"""
-        event_client = boto3.client('events')
-        
-        response = event_client.put_events(
-            Entries=[
-                {
-                    'EventBusName': 'custom-johnbons-event-bus2',
-                    'Source': 'com.johnbons.products',
-                    'DetailType': 'create_product',
-                    'Detail': json.dumps(product_data, cls=DecimalEncoder)
-                }
-            ]
-        )
-        
-        # Optional: handle response
-        if response.get('FailedEntryCount', 0) > 0:
-            # Handle failed entries if needed
-            print(f"Failed to send event to EventBridge: {response}")
+        """Queue product creation event for EventBridge"""
+        telemetry.put_event({
+            'EventBusName': 'custom-johnbons-event-bus2',
+            'Source': 'com.johnbons.products',
+            'DetailType': 'create_product',
+            'Detail': json.dumps(product_data, cls=DecimalEncoder)
+        })
     
     def _log_product_retrieval(self, count):
         """Log product retrieval to CloudWatch"""
         log_group_name = "/aws/lambda/python-serverless-johnbons-dev-getAllProducts"
         log_stream_name = time.strftime("%Y/%m/%d")
         
-        # Ensure log group exists
-        self._ensure_log_group_exists(log_group_name)
-        
-        # Ensure log stream exists
-        self._ensure_log_stream_exists(log_group_name, log_stream_name)
+        # Ensure log group and stream exist (created once per container, off the request path)
+        telemetry.ensure_log_stream(log_group_name, log_stream_name)
         
         # Log the product retrieval
         logger.info(f"Retrieved {count} products")
     
     def _send_product_to_sqs(self, product_data):
-        """Send product data to SQS queue"""
-        sqs = boto3.resource('sqs', region_name=self.region)
-        queue = sqs.get_queue_by_name(QueueName='products-queue-johnbons-sqs')
-        
-        # Create a new message
-        queue.send_message(MessageBody=json.dumps(product_data, cls=DecimalEncoder))
-    
+        """Send product data to SQS queue (queued in buffered producer mode)"""
+        sqs_producer.enqueue(PRODUCTS_QUEUE_NAME, product_data)
+
+    def _send_products_to_sqs(self, products):
+        """Send products to SQS in packed SendMessageBatch calls. Returns the productIds that were not sent."""
+        failed = sqs_producer.send_messages(PRODUCTS_QUEUE_NAME, products)
+        return {products[index]["productId"] for index in failed}
+
     def _log_product_creation(self, product_data):
         """Log product creation to CloudWatch"""
         logger.info(f"Creating product: {product_data}")
         logger.info(json.dumps({"message":"Product Created"}))
 
-        # Log the event to CloudWatch
+        # Queue the event for CloudWatch; the group and stream are created on first flush
         log_group_name = "/aws/lambda/product-creation-logs"
         log_stream_name = time.strftime("%Y/%m/%d")
+        telemetry.put_log(log_group_name, log_stream_name, f"Product created: {product_data['productId']}")
 
-        # Ensure log group and stream exist
-        self._ensure_log_group_exists(log_group_name)
-        self._ensure_log_stream_exists(log_group_name, log_stream_name)
+    def sync_catalog_snapshot(self, event, context):
+        """
+        DynamoDB Streams consumer for the products table: patch the catalog
+        snapshot with every product the batch inserted, modified or removed.
+        Any error fails the whole batch so Lambda retries it, including
+        losing every If-Match attempt to other writers.
+        """
+        deserializer = TypeDeserializer()
+        upserts, deletes = {}, set()
 
-        # Log the product creation
-        self.log_client.put_log_events(
-            logGroupName=log_group_name,
-            logStreamName=log_stream_name,
-            logEvents=[{
-                "timestamp": int(time.time() * 1000),
-                "message": f"Product created: {product_data['productId']}"
-            }]
-        )
-    
-    def _ensure_log_group_exists(self, log_group_name):
-        """Ensure CloudWatch log group exists"""
-        try:
-            self.log_client.create_log_group(logGroupName=log_group_name)
-        except self.log_client.exceptions.ResourceAlreadyExistsException:
-            pass
-    
-    def _ensure_log_stream_exists(self, log_group_name, log_stream_name):
-        """Ensure CloudWatch log stream exists"""
+        # Records for one product arrive in order, so the last one wins
+        for record in event.get("Records", []):
+            change = record.get("dynamodb", {})
+            product_id = deserializer.deserialize(change["Keys"]["productId"])
+            if record.get("eventName") == "REMOVE":
+                upserts.pop(product_id, None)
+                deletes.add(product_id)
+            else:
+                upserts[product_id] = {
+                    name: deserializer.deserialize(value)
+                    for name, value in change["NewImage"].items()
+                }
+                deletes.discard(product_id)
+
+        if not upserts and not deletes:
+            return {"statusCode": 200, "body": json.dumps({"message": "No changes"})}
+
+        version = self.catalog_snapshot.apply_changes(upserts, deletes, rebuild=self.store.scan_products)
+        summary = {"version": version, "upserted": len(upserts), "deleted": len(deletes)}
+        logger.info("Catalog snapshot updated: %s", json.dumps(summary))
+        return {"statusCode": 200, "body": json.dumps(summary)}
+
+    def rebuild_catalog_snapshot(self, event, context):
+        """
+        Scheduled: rewrite the catalog snapshot from a full scan of the table,
+        so a change the stream consumer never applied (a batch that ran out
+        of retries) doesn't stay out of GET /products for good.
+        """
+        products = self.store.scan_products()
+        version = self.catalog_snapshot.rebuild(products)
+        summary = {"version": version, "count": len(products)}
+        logger.info("Catalog snapshot rebuilt: %s", json.dumps(summary))
+        return {"statusCode": 200, "body": json.dumps(summary)}
+
+    def reconcile_current_stock(self, event, context):
+        """
+        Rebuild each product's materialized current_stock from the inventory ledger,
+        convert quantities the original CSV import stored as strings into
+        numbers and add products that predate the low-stock index to it.
+        Reconciles every product, or only event["productIds"] when given.
+        """
+        product_ids = (event or {}).get("productIds")
+        fields = ["productId", "quantity", "current_stock", "stock_shard"]
+        if product_ids is None:
+            products = self.store.scan_products(fields=fields)
+        else:
+            products = [
+                self.store.get_product(product_id, fields=fields) or {"productId": product_id, "missing": True}
+                for product_id in product_ids
+            ]
+
+        summary = {"checked": 0, "converted": 0, "invalid_quantity": 0, "drifted": 0, "fixed": 0, "indexed": 0,
+                   "errors": 0}
+        for product in products:
+            if product.get("missing"):
+                continue
+            summary["checked"] += 1
+            # One product DynamoDB refuses to update mustn't stop the whole job
+            try:
+                self._reconcile_product(product, summary)
+            except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as e:
+                logger.exception("Error reconciling product %s, continuing: %s", product["productId"], e)
+                summary["errors"] += 1
+
+        logger.info("Stock reconciliation finished: %s", json.dumps(summary))
+        return {"statusCode": 200, "body": json.dumps(summary)}
+
+    def _reconcile_product(self, product, summary):
+        """Reconcile one product read by reconcile_current_stock, counting what was done in summary"""
+        # Migrate legacy string quantities, which ADD and the stock index can't use
+        quantity_is_number = True
+        if isinstance(product.get("quantity"), str):
+            if self.store.convert_legacy_quantity(product["productId"], product["quantity"]):
+                summary["converted"] += 1
+            else:
+                logger.error("Product %s has a quantity that isn't a number: %r",
+                             product["productId"], product["quantity"])
+                summary["invalid_quantity"] += 1
+                quantity_is_number = False
+
+        # Products created before the low-stock index existed need a shard.
+        # The index key is numeric, so a text quantity would fail the write.
+        if "stock_shard" not in product and quantity_is_number:
+            self.store.backfill_stock_shard(product["productId"])
+            summary["indexed"] += 1
+
+        ledger_total = self.store.sum_inventory(product["productId"])
+        if product.get("current_stock") == ledger_total:
+            return
+
+        summary["drifted"] += 1
+        logger.warning("current_stock drift for %s: stored %s, ledger %s",
+                       product["productId"], product.get("current_stock"), ledger_total)
+
+        # Only overwrite the value we read, so a concurrent ADD isn't lost;
+        # a product that changed meanwhile is picked up by the next run
+        if self.store.set_current_stock(product["productId"], ledger_total, expected=product.get("current_stock")):
+            summary["fixed"] += 1
+        else:
+            logger.info("Product %s changed during reconciliation, skipping", product["productId"])
+
+    @staticmethod
+    def _inventory_adjustment_error(error):
+        """Map a refused inventory adjustment to {"statusCode", "message"}"""
+        if error.reason == PRODUCT_NOT_FOUND:
+            return {"statusCode": 404, "message": "Product not found"}
+        if error.reason == INSUFFICIENT_STOCK:
+            return {"statusCode": 400, "message": "Cannot reduce quantity below 0"}
+        if error.reason == INVALID_QUANTITY:
+            return {"statusCode": 409, "message": "The product's stored quantity is not a number"}
+        # TRANSACTION_CONFLICT: the product kept changing while the store
+        # retried. Nothing was written, so it's safe to send again.
+        return {"statusCode": 409, "message": "Inventory is being updated concurrently, please retry"}
+
+    def _adjust_order_lines(self, lines, sign, remarks):
+        """Apply sign * quantity to every (productId, quantity) line in one transaction"""
+        self.store.adjust_inventory([(product_id, sign * quantity, remarks) for product_id, quantity in lines])
+
+    def _compensate_order(self, order_id, chunks):
+        """
+        Put back the stock taken by already committed chunks of an order.
+        A chunk that can't be restored as a whole (e.g. a product was deleted
+        meanwhile) is retried line by line; lines that still fail are logged
+        for manual reconciliation.
+        """
+        remarks = f"Order {order_id} rolled back"
+        for chunk in chunks:
+            try:
+                self._adjust_order_lines(chunk, 1, remarks)
+                continue
+            except (InventoryAdjustmentError, botocore.exceptions.ClientError) as e:
+                logger.warning("Could not roll back order %s in one transaction: %s", order_id, e)
+            for line in chunk:
+                try:
+                    self._adjust_order_lines([line], 1, remarks)
+                except (InventoryAdjustmentError, botocore.exceptions.ClientError) as e:
+                    logger.error("Could not roll back %s of product %s for order %s: %s",
+                                 line[1], line[0], order_id, e)
+
+    def _latest_inventory(self, product_id):
+        """Return (latest INVENTORY_HISTORY_PREVIEW transactions, cursor for the rest)"""
+        items, last_key = self.store.query_inventory(product_id, limit=INVENTORY_HISTORY_PREVIEW)
+        return items, encode_cursor(last_key)
+
+    def _start_bulk_job(self, bucket, key, operation, context, upload=""):
+        """
+        Plan a bulk create/delete job for one upload of an S3 object.
+        `upload` identifies the upload (see job_checkpoint.upload_id), so
+        re-uploading an identical file starts a new job.
+
+        Small files are processed in this invocation. Files larger than
+        BULK_RANGE_BYTES are split into byte ranges, and each range is
+        handed to its own asynchronous invocation of this function.
+        """
+        import csv
+
+        head = self.s3_client.head_object(Bucket=bucket, Key=key)
+        etag = head["ETag"]
+        job_id = make_job_id(bucket, key, etag, upload)
+
+        # Create files carry a header row; delete files are one productId per line
+        header, data_start = None, 0
+        if operation == "create":
+            header_line, data_start = read_first_line(self.s3_client, bucket, key)
+            header = next(csv.reader([header_line]), [])
+
+        range_bytes = int(os.environ.get("BULK_RANGE_BYTES", DEFAULT_RANGE_BYTES))
+        parts = [
+            {
+                "job_id": job_id,
+                "bucket": bucket,
+                "key": key,
+                "etag": etag,
+                "operation": operation,
+                "header": header,
+                "part": part,
+                "start": start,
+                "end": end
+            }
+            for part, (start, end) in enumerate(plan_byte_ranges(data_start, head["ContentLength"], range_bytes))
+        ]
+
+        if len(parts) == 1 or context is None:
+            results = [self._run_bulk_part(part, context) for part in parts]
+            return results[0] if len(results) == 1 else {
+                "statusCode": 200,
+                "body": json.dumps({"message": "Bulk job finished", "job_id": job_id, "parts": len(parts)})
+            }
+
+        for part in parts:
+            self._invoke_bulk_part(part, context)
+
+        print(f"Bulk job {job_id} split into {len(parts)} parts")
+        return {
+            "statusCode": 202,
+            "body": json.dumps({"message": "Bulk job started", "job_id": job_id, "parts": len(parts)})
+        }
+
+    def _run_bulk_part(self, part, context):
+        """
+        Process one byte range of a bulk job, checkpointing after every window
+        of rows. When the invocation is close to its timeout the part hands
+        itself to a fresh invocation, which resumes from the last checkpoint.
+        """
+        import csv
+
+        checkpoints = CheckpointStore(self.s3_client, os.environ.get("BULK_JOB_STATE_BUCKET", part["bucket"]))
+        state = checkpoints.load(part["job_id"], part["part"]) or {
+            "offset": part["start"], "rows": 0, "written": 0, "retried": 0, "failed": 0, "done": False
+        }
+        if state["done"]:
+            print(f"Part {part['part']} of job {part['job_id']} already finished, skipping")
+            return self._bulk_part_response(part, state)
+
+        window_rows = int(os.environ.get("BULK_WINDOW_ROWS", "1000"))
+        time_buffer_ms = int(os.environ.get("BULK_TIME_BUFFER_MS", "30000"))
+
+        def write_window(rows, next_offset):
+            if part["operation"] == "create":
+                summary = self.store.put_products(rows)
+            else:
+                summary = self.store.delete_products(rows)
+            for field in ("rows", "written", "retried", "failed"):
+                state[field] += summary[field]
+            state["offset"] = next_offset
+            checkpoints.save(part["job_id"], part["part"], state)
+
+        window, next_offset = [], state["offset"]
+        lines = iter_s3_lines(self.s3_client, part["bucket"], part["key"], state["offset"], part["end"], IfMatch=part["etag"])
+        for line, next_offset in lines:
+            values = next(csv.reader([line.decode("utf-8-sig")]), None)
+            if values:
+                if part["operation"] == "create":
+                    try:
+                        product = self._prepare_product(dict(zip(part["header"], values)), from_csv=True)
+                    except ValueError as e:
+                        # Count rows that can't be stored without failing a whole batch
+                        logger.error("Skipping CSV row %s: %s", values[:1], e)
+                        state["rows"] += 1
+                        state["failed"] += 1
+                    else:
+                        window.append({**product, "stock_shard": stock_shard(product["productId"])})
+                else:
+                    # Assuming each row contains only one column: productId
+                    window.append({"productId": values[0]})
+
+            if len(window) >= window_rows:
+                write_window(window, next_offset)
+                window = []
+
+                if context is not None and context.get_remaining_time_in_millis() < time_buffer_ms:
+                    print(f"Part {part['part']} of job {part['job_id']} checkpointed at byte {next_offset}, continuing in a new invocation")
+                    self._invoke_bulk_part(part, context)
+                    return self._bulk_part_response(part, state, status_code=202)
+
+        state["done"] = True
+        write_window(window, next_offset)
+        print(f"Part {part['part']} of job {part['job_id']} finished: {json.dumps(state)}")
+        return self._bulk_part_response(part, state)
+
+    @staticmethod
+    def _prepare_product(product, from_csv=False):
+        """
+        Check a product before it is written and convert its numeric fields
+        to Decimal. DynamoDB rejects a non-numeric index key or an oversized
+        item for a whole batch, so such products are refused up front.
+
+        Args:
+            product (dict): Product from a request body or a CSV row
+            from_csv (bool): Empty numeric columns are left out rather than refused
+
+        Raises:
+            ValueError: The product can't be stored; the message says why
+        """
+        if not isinstance(product, dict):
+            raise ValueError("product must be a JSON object")
+        product_id = product.get("productId")
+        if not isinstance(product_id, str) or not product_id:
+            raise ValueError("productId is required")
+
+        product = dict(product)
+        for field in NUMERIC_PRODUCT_FIELDS:
+            value = product.get(field)
+            if value is None or (from_csv and value == ""):
+                product.pop(field, None)
+                continue
+            product[field] = ProductService._parse_number(field, value)
+
+        if len(json.dumps(product, cls=DecimalEncoder, separators=(",", ":")).encode("utf-8")) > MAX_PRODUCT_BYTES:
+            raise ValueError(f"product is larger than {MAX_PRODUCT_BYTES // 1024} KB")
+        return product
+
+    @staticmethod
+    def _parse_number(field, value):
+        """Convert a numeric product field to a finite Decimal, raising ValueError if it isn't one"""
         try:
-            self.log_client.create_log_stream(logGroupName=log_group_name, logStreamName=log_stream_name)
-        except self.log_client.exceptions.ResourceAlreadyExistsException:
-            pass
+            if isinstance(value, bool) or not isinstance(value, (str, int, Decimal)):
+                raise ArithmeticError
+            number = Decimal(value.strip() if isinstance(value, str) else value)
+            if not number.is_finite():
+                raise ArithmeticError
+        except ArithmeticError:
+            raise ValueError(f"{field} must be a number")
+        return number
+
+    def _invoke_bulk_part(self, part, context):
+        """Asynchronously invoke this function to process (or resume) one part of a bulk job"""
+        get_client("lambda", region_name=self.region).invoke(
+            FunctionName=context.function_name,
+            InvocationType="Event",
+            Payload=json.dumps({"bulk_job": part}).encode("utf-8")
+        )
+
+    def _bulk_part_response(self, part, state, status_code=200):
+        verb = "added" if part["operation"] == "create" else "deleted"
+        summary = {field: state[field] for field in ("rows", "written", "retried", "failed")}
+        message = f"Products {verb} successfully"
+        if status_code == 202:
+            message = "Bulk job checkpointed and continuing"
+        elif summary["failed"]:
+            message = f"{summary['failed']} product(s) could not be {verb}"
+        return {
+            "statusCode": status_code,
+            "body": json.dumps({
+                "message": message,
+                "job_id": part["job_id"],
+                "part": part["part"],
+                "offset": state["offset"],
+                "summary": summary
+            })
+        }
 
     def get_lowest_quantity(self, event, context):
-        """Retrieve the product with the lowest quantity along with its product ID and product name."""
+        """
+        Retrieve the product with the lowest quantity along with its product ID and product name.
+        With ?k=, return the k lowest-stock products instead.
+
+        Only products with a numeric quantity are ranked, since the low-stock
+        index can't hold the others. Before the index, a product without a
+        quantity counted as 0 and so came first.
+        """
+        query_params = event.get("queryStringParameters") or {}
         try:
-            # Scan the table and project only the required fields
-            response = self.product_table.scan(
-                ProjectionExpression="productId, product_name, quantity"
-            )
-            items = response.get("Items", [])
-            
-            # Handle pagination if data is more than 1MB
-            while 'LastEvaluatedKey' in response:
-                response = self.product_table.scan(
-                    ProjectionExpression="productId, product_name, quantity",
-                    ExclusiveStartKey=response["LastEvaluatedKey"]
+            k = parse_limit(query_params.get("k"), default=1, maximum=MAX_LOWEST_K, name="k")
+        except ValueError as e:
+            return {"statusCode": 400, "body": json.dumps({"message": f"Bad Request: {e}"})}
+
+        try:
+            try:
+                items = self.store.lowest_stock(k)
+            except botocore.exceptions.ClientError as e:
+                # Index missing or still backfilling: fall back to a full scan,
+                # ranking the same products the index would
+                logger.warning("Low-stock index unavailable, scanning instead: %s", e)
+                items = heapq.nsmallest(
+                    k,
+                    (item for item in self.store.scan_products(fields=["productId", "product_name", "quantity"])
+                     if isinstance(item.get("quantity"), Decimal)),
+                    key=lambda x: x["quantity"]
                 )
-                items.extend(response.get("Items", []))
             
             # Build the product response
-            if not items:
+            if "k" in query_params:
+                product = {"k": k, "items": items}
+            elif not items:
                 product = {"lowest_quantity": None, "product_id": None, "product_name": None}
             else:
-                # Determine the item with the lowest quantity.
-                # If a product is missing a quantity, it defaults to 0.
-                lowest_item = min(items, key=lambda x: Decimal(x.get("quantity", 0)))
+                lowest_item = items[0]
                 product = {
                     "lowest_quantity": lowest_item.get("quantity", 0),
                     "product_id": lowest_item.get("productId"),
@@ -602,7 +1397,7 @@ class ProductService:
                 "headers": {
                     "Content-Type": "application/json"  # Ensure the correct content type
                 },
-                "body": json.dumps(product, cls=DecimalEncoder)
+                "body": dumps(product)
             }
         except Exception as e:
             return {
@@ -613,38 +1408,127 @@ class ProductService:
                 "body": json.dumps({"error": str(e)})
             }
 
-# Lambda handler functions that use the ProductService class
-product_service = ProductService()
+# Lambda handler functions that use the ProductService class.
+# The service is built on the first invocation rather than at import time.
+_product_service = None
+
+def get_product_service():
+    global _product_service
+    if _product_service is None:
+        with timed_init("product_service"):
+            _product_service = ProductService()
+    return _product_service
 
+@emit_metrics
+@flush_telemetry
+@profile_startup
+@gzip_response
 def get_all_products(event, context):
-    return product_service.get_all_products(event, context)
+    return get_product_service().get_all_products(event, context)
 
+@emit_metrics
+@flush_telemetry
+@profile_startup
 def create_one_product(event, context):
-    return product_service.create_one_product(event, context)
+    return get_product_service().create_one_product(event, context)
 
+@emit_metrics
+@flush_telemetry
+@profile_startup
+@gzip_response
 def get_one_product(event, context):
-    return product_service.get_one_product(event, context)
+    return get_product_service().get_one_product(event, context)
+
+@emit_metrics
+@flush_telemetry
+@profile_startup
+@gzip_response
+def search_products(event, context):
+    return get_product_service().search_products(event, context)
+
+@emit_metrics
+@flush_telemetry
+@profile_startup
+@gzip_response
+def get_products_batch(event, context):
+    return get_product_service().get_products_batch(event, context)
 
+@emit_metrics
+@flush_telemetry
+@profile_startup
+def get_inventory_history(event, context):
+    return get_product_service().get_inventory_history(event, context)
+
+@emit_metrics
+@flush_telemetry
+@profile_startup
 def add_stocks_to_product(event, context):
-    return product_service.add_stocks_to_product(event, context)
+    return get_product_service().add_stocks_to_product(event, context)
+
+@emit_metrics
+@flush_telemetry
+@profile_startup
+def create_order(event, context):
+    return get_product_service().create_order(event, context)
 
+@emit_metrics
+@flush_telemetry
+@profile_startup
 def delete_one_product(event, context):
-    return product_service.delete_one_product(event, context)
+    return get_product_service().delete_one_product(event, context)
 
+@emit_metrics
+@flush_telemetry
+@profile_startup
 def update_one_product(event, context):
-    return product_service.update_one_product(event, context)
+    return get_product_service().update_one_product(event, context)
 
+@emit_metrics
+@flush_telemetry
+@profile_startup
 def batch_create_products(event, context):
-    return product_service.batch_create_products(event, context)
+    return get_product_service().batch_create_products(event, context)
 
+@emit_metrics
+@flush_telemetry
+@profile_startup
 def batch_delete_products(event, context):
-    return product_service.batch_delete_products(event, context)
+    return get_product_service().batch_delete_products(event, context)
 
+@emit_metrics
+@flush_telemetry
+@profile_startup
 def receive_message_from_sqs(event, context):
-    return product_service.receive_message_from_sqs(event, context)
+    return get_product_service().receive_message_from_sqs(event, context)
     
+@emit_metrics
+@flush_telemetry
+@profile_startup
+@gzip_response
 def get_lowest_quantity(event, context):
-    return product_service.get_lowest_quantity(event, context)
+    return get_product_service().get_lowest_quantity(event, context)
     
+@emit_metrics
+@flush_telemetry
+@profile_startup
+@gzip_response
 def get_one_product_by_name(event, context):
-    return product_service.get_one_product_by_name(event, context)
\ No newline at end of file
+    return get_product_service().get_one_product_by_name(event, context)
+
+@emit_metrics
+@flush_telemetry
+@profile_startup
+def sync_catalog_snapshot(event, context):
+    return get_product_service().sync_catalog_snapshot(event, context)
+
+@emit_metrics
+@flush_telemetry
+@profile_startup
+def rebuild_catalog_snapshot(event, context):
+    return get_product_service().rebuild_catalog_snapshot(event, context)
+
+@emit_metrics
+@flush_telemetry
+@profile_startup
+def reconcile_current_stock(event, context):
+    return get_product_service().reconcile_current_stock(event, context)
\ No newline at end of file
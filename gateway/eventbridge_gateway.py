@@ -1,7 +1,7 @@
-import boto3
 import os
 import json
 from utils.decimal_encoder import DecimalEncoder
+from utils.aws_clients import get_client
 
 class EventbridgeEvent:
     def __init__(self, detail_type, detail):
@@ -12,7 +12,7 @@ class EventbridgeEvent:
         
     def send(self):
         """Send the event to EventBridge"""
-        client = boto3.client('events', region_name='us-east-2')
+        client = get_client('events', region_name='us-east-2')
         
         response = client.put_events(
             Entries=[
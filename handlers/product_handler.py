@@ -1,17 +1,27 @@
 import json
-from gateway.dynamodb_gateway import (
-    get_all_products,
-    create_one_product,
-    get_one_product,
-    delete_one_product,
-    update_one_product,
-    add_stocks_to_product,
-    batch_create_products, 
-    batch_delete_products,
-    receive_message_from_sqs,
-    get_lowest_quantity,
-    get_one_product_by_name  # Newly added import
-)
+from utils.startup_profiler import timed_import
+
+with timed_import("gateway.dynamodb_gateway"):
+    from gateway.dynamodb_gateway import (
+        get_all_products,
+        create_one_product,
+        get_one_product,
+        get_products_batch,
+        search_products,
+        delete_one_product,
+        update_one_product,
+        add_stocks_to_product,
+        get_inventory_history,
+        create_order,
+        batch_create_products, 
+        batch_delete_products,
+        receive_message_from_sqs,
+        get_lowest_quantity,
+        get_one_product_by_name,  # Newly added import
+        reconcile_current_stock,
+        sync_catalog_snapshot,
+        rebuild_catalog_snapshot
+    )
 
 def handler(event, context):
     http_method = event.get("httpMethod")
@@ -25,6 +35,18 @@ def handler(event, context):
         else:
             return method_not_allowed()
             
+    elif resource == "/products/search":
+        if http_method == "GET":
+            return search_products(event, context)
+        else:
+            return method_not_allowed()
+
+    elif resource == "/products/batch":
+        if http_method == "GET":
+            return get_products_batch(event, context)
+        else:
+            return method_not_allowed()
+
     elif resource == "/products/{productId}":
         if http_method == "GET":
             return get_one_product(event, context)
@@ -38,6 +60,14 @@ def handler(event, context):
     elif resource == "/products/{productId}/inventory":
         if http_method == "POST":
             return add_stocks_to_product(event, context)
+        elif http_method == "GET":
+            return get_inventory_history(event, context)
+        else:
+            return method_not_allowed()
+
+    elif resource == "/orders":
+        if http_method == "POST":
+            return create_order(event, context)
         else:
             return method_not_allowed()
 
@@ -0,0 +1,175 @@
+import gzip
+import json
+import logging
+import time
+import botocore.exceptions
+from utils.decimal_encoder import dumps
+
+logger = logging.getLogger()
+
+# S3 error codes for a conditional request that lost a race
+CONFLICT_CODES = ("PreconditionFailed", "ConditionalRequestConflict", "412", "409")
+
+
+class CatalogSnapshot:
+    """
+    The whole product catalog as one gzip-compressed JSON object in S3.
+
+    The object body is the GET /products response itself
+    ({"items", "count", "version", "updated_at", "status"}), so serving it
+    is one object read and no serialization. The version increases by one
+    with every write and is also stored as object metadata.
+
+    Writers patch the snapshot with read-modify-write cycles guarded by
+    If-Match on the ETag they read, so concurrent stream batches never
+    overwrite each other's changes; a writer that loses the race re-reads
+    and tries again. A scheduled full rebuild puts back anything the
+    patches missed.
+    """
+
+    def __init__(self, s3_client, bucket, key, max_attempts=5):
+        """
+        Args:
+            s3_client: boto3 S3 client
+            bucket (str): Bucket holding the snapshot
+            key (str): Snapshot object key
+            max_attempts (int): Read-modify-write attempts before giving up
+        """
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.max_attempts = max_attempts
+        self._cached = None   # (etag, body, version, count, compressed body)
+
+    def read(self):
+        """
+        Return the snapshot, downloading it only if it changed since the
+        last call in this container.
+
+        Returns:
+            tuple: (uncompressed JSON body, version, count, gzip-compressed body),
+            or None if there is no snapshot
+        """
+        cached = self._cached
+        kwargs = {"Bucket": self.bucket, "Key": self.key}
+        if cached is not None:
+            kwargs["IfNoneMatch"] = cached[0]
+
+        try:
+            response = self.s3_client.get_object(**kwargs)
+        except botocore.exceptions.ClientError as e:
+            code = e.response["Error"]["Code"]
+            if code in ("304", "NotModified"):
+                return cached[1:]
+            if code in ("NoSuchKey", "404"):
+                self._cached = None
+                return None
+            raise
+
+        compressed = response["Body"].read()
+        metadata = response.get("Metadata", {})
+        self._cached = (
+            response["ETag"],
+            gzip.decompress(compressed),
+            int(metadata.get("version", 0)),
+            int(metadata.get("count", 0)),
+            compressed
+        )
+        return self._cached[1:]
+
+    def apply_changes(self, upserts, deletes, rebuild):
+        """
+        Patch the snapshot with changed and removed products.
+
+        Args:
+            upserts (dict): productId -> full product item
+            deletes (set): productIds to remove
+            rebuild (callable): Returns every product; used when there is no
+                snapshot yet, since patches alone would give a partial catalog
+
+        Returns:
+            int: Version written
+        """
+        for attempt in range(self.max_attempts):
+            current = self._load()
+            if current is None:
+                items, version, etag = {}, 0, None
+                products = rebuild()
+                logger.info("No catalog snapshot yet, building it from %d products", len(products))
+                for item in products:
+                    items[item["productId"]] = item
+            else:
+                items, version, etag = current
+
+            for product_id in deletes:
+                items.pop(product_id, None)
+            items.update(upserts)
+
+            try:
+                return self._write(items, version + 1, etag)
+            except botocore.exceptions.ClientError as e:
+                if e.response["Error"]["Code"] not in CONFLICT_CODES:
+                    raise
+                logger.info("Catalog snapshot changed while patching it (attempt %d), retrying", attempt + 1)
+                time.sleep(0.05 * (attempt + 1))
+
+        raise RuntimeError(f"Could not update the catalog snapshot after {self.max_attempts} attempts")
+
+    def rebuild(self, products):
+        """
+        Replace the snapshot with a full list of products, retrying if another
+        writer replaced it in between. Returns the version written.
+        """
+        items = {item["productId"]: item for item in products}
+        for attempt in range(self.max_attempts):
+            current = self._load()
+            version, etag = (0, None) if current is None else (current[1], current[2])
+            try:
+                return self._write(items, version + 1, etag)
+            except botocore.exceptions.ClientError as e:
+                if e.response["Error"]["Code"] not in CONFLICT_CODES:
+                    raise
+                logger.info("Catalog snapshot changed while rebuilding it (attempt %d), retrying", attempt + 1)
+                time.sleep(0.05 * (attempt + 1))
+
+        raise RuntimeError(f"Could not rebuild the catalog snapshot after {self.max_attempts} attempts")
+
+    def _load(self):
+        """Return (productId -> item, version, etag) straight from S3, or None"""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
+                return None
+            raise
+        document = json.loads(gzip.decompress(response["Body"].read()))
+        items = {item["productId"]: item for item in document.get("items", [])}
+        return items, int(document.get("version", 0)), response["ETag"]
+
+    def _write(self, items, version, etag):
+        document = {
+            "items": [items[product_id] for product_id in sorted(items)],
+            "count": len(items),
+            "version": version,
+            "updated_at": int(time.time()),
+            "status": "success"
+        }
+        body = dumps(document).encode("utf-8")
+
+        kwargs = {
+            "Bucket": self.bucket,
+            "Key": self.key,
+            "Body": gzip.compress(body),
+            "ContentType": "application/json",
+            "ContentEncoding": "gzip",
+            "Metadata": {"version": str(version), "count": str(len(items))}
+        }
+        # Only replace the object we read; create it only if it still doesn't exist
+        if etag is None:
+            kwargs["IfNoneMatch"] = "*"
+        else:
+            kwargs["IfMatch"] = etag
+        self.s3_client.put_object(**kwargs)
+
+        logger.info("Wrote catalog snapshot version %d with %d products", version, len(items))
+        return version
@@ -0,0 +1,111 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import time
+from utils.generate_code import generate_code
+
+logger = logging.getLogger()
+
+
+class CompactingS3Sink:
+    """
+    Collect the records of one SQS batch and write them to S3 as gzip-compressed,
+    time-partitioned CSV objects (<prefix>dt=YYYY-MM-DD/hour=HH/part-....csv.gz),
+    each with a .manifest.json next to it.
+
+    A sink lives for one invocation and flush() must run before the handler
+    returns: SQS deletes every message the handler doesn't report as failed,
+    so nothing may be left in memory afterwards. Compaction comes from the
+    event source mapping's batchSize and maximumBatchingWindow instead.
+    """
+
+    def __init__(self, s3_client, bucket, prefix, fieldnames):
+        """
+        Args:
+            s3_client: boto3 S3 client
+            bucket (str): Destination bucket
+            prefix (str): Key prefix the dt=/hour= partitions go under
+            fieldnames (list): CSV columns, in order; other fields are left out
+        """
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.fieldnames = fieldnames
+        self._partitions = {}    # "dt=.../hour=.../" -> {"lines", "record_ids", "min_ts", "max_ts"}
+
+    def add(self, record, timestamp=None, record_id=None):
+        """
+        Buffer one record. `timestamp` (epoch seconds) picks the partition;
+        it defaults to now. `record_id` is returned by flush() if the
+        record's partition can't be written.
+        """
+        timestamp = timestamp or time.time()
+        partition_key = time.strftime("dt=%Y-%m-%d/hour=%H/", time.gmtime(timestamp))
+
+        line = io.StringIO()
+        csv.DictWriter(line, fieldnames=self.fieldnames, extrasaction="ignore").writerow(record)
+
+        partition = self._partitions.get(partition_key)
+        if partition is None:
+            partition = self._partitions[partition_key] = {
+                "lines": [], "record_ids": [], "min_ts": timestamp, "max_ts": timestamp
+            }
+        partition["lines"].append(line.getvalue())
+        partition["record_ids"].append(record_id)
+        partition["min_ts"] = min(partition["min_ts"], timestamp)
+        partition["max_ts"] = max(partition["max_ts"], timestamp)
+
+    def flush(self):
+        """
+        Write every buffered partition to S3 and empty the buffer.
+
+        Returns:
+            tuple: (data object keys written, record_ids of the partitions that could not be written)
+        """
+        partitions, self._partitions = self._partitions, {}
+
+        written, failed_ids = [], []
+        for partition_key, partition in partitions.items():
+            try:
+                written.append(self._write_partition(partition_key, partition))
+            except Exception as e:
+                logger.exception("Error writing partition %s, %d record(s) will be redelivered: %s",
+                                 partition_key, len(partition["record_ids"]), e)
+                failed_ids.extend(partition["record_ids"])
+        return written, failed_ids
+
+    def _write_partition(self, partition_key, partition):
+        raw = "".join(partition["lines"]).encode("utf-8")
+        compressed = gzip.compress(raw)
+
+        part_name = f"part-{int(time.time() * 1000)}-{generate_code('', 8)}"
+        data_key = f"{self.prefix}{partition_key}{part_name}.csv.gz"
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=data_key,
+            Body=compressed,
+            ContentType="application/gzip"
+        )
+
+        manifest = {
+            "data_key": data_key,
+            "format": "csv",
+            "compression": "gzip",
+            "columns": self.fieldnames,
+            "records": len(partition["lines"]),
+            "uncompressed_bytes": len(raw),
+            "compressed_bytes": len(compressed),
+            "min_timestamp": partition["min_ts"],
+            "max_timestamp": partition["max_ts"]
+        }
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=f"{self.prefix}{partition_key}{part_name}.manifest.json",
+            Body=json.dumps(manifest).encode("utf-8"),
+            ContentType="application/json"
+        )
+
+        logger.info("Flushed %d records to s3://%s/%s", len(partition["lines"]), self.bucket, data_key)
+        return data_key
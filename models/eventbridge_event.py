@@ -1,7 +1,7 @@
-import boto3
 import os
 import json
 from utils.decimal_encoder import DecimalEncoder
+from utils.aws_clients import get_client
 
 class EventbridgeEvent:
     def __init__(self, detail_type, payload):
@@ -17,19 +17,21 @@ class EventbridgeEvent:
         self.source = "com.johnbons.products"
         self.event_bus_name = "custom-johnbons-event-bus-2"
         
+    def to_entry(self):
+        """Build the put_events entry for this event"""
+        return {
+            'Source': self.source,
+            'DetailType': self.detail_type,
+            'Detail': json.dumps(self.payload, cls=DecimalEncoder),
+            'EventBusName': self.event_bus_name
+        }
+        
     def send(self):
         """Send the event to EventBridge"""
-        client = boto3.client('events', region_name='us-east-2')
+        client = get_client('events', region_name='us-east-2')
         
         response = client.put_events(
-            Entries=[
-                {
-                    'Source': self.source,
-                    'DetailType': self.detail_type,
-                    'Detail': json.dumps(self.payload, cls=DecimalEncoder),
-                    'EventBusName': self.event_bus_name
-                }
-            ]
+            Entries=[self.to_entry()]
         )
         
         return response
\ No newline at end of file
@@ -1,8 +1,8 @@
 import time
-import boto3
+from utils.aws_clients import get_client
 
 def log_product_creation(product_id: str, region: str = 'us-east-2'):
-    log_client = boto3.client("logs", region_name=region)
+    log_client = get_client("logs", region_name=region)
     log_group_name = "/aws/lambda/product-creation-logs"
     log_stream_name = time.strftime("%Y/%m/%d")
     
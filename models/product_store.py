@@ -0,0 +1,530 @@
+import os
+import random
+import time
+import uuid
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from functools import cached_property
+import botocore.exceptions
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from utils.aws_clients import get_resource, DEFAULT_REGION
+from utils.batch_getter import ParallelBatchGetter
+from utils.batch_writer import ParallelBatchWriter
+from utils.pagination import projection_expression
+from utils.parallel_scan import ParallelScanner
+from utils.stock_index import query_lowest_stock, stock_shard
+
+# Why an inventory adjustment was refused
+PRODUCT_NOT_FOUND = "not_found"
+INSUFFICIENT_STOCK = "insufficient_stock"
+
+TRANSACTION_CONFLICT = "transaction_conflict"
+INVALID_QUANTITY = "invalid_quantity"
+
+# Failed conditions DynamoProductStore repairs itself before retrying the transaction
+STOCK_NOT_SEEDED = "stock_not_seeded"
+QUANTITY_NOT_NUMERIC = "quantity_not_numeric"
+REPAIRABLE_REASONS = (STOCK_NOT_SEEDED, QUANTITY_NOT_NUMERIC, TRANSACTION_CONFLICT)
+
+# Cancellation reasons worth retrying the same transaction for; botocore's
+# retry modes don't retry a TransactionCanceledException at all
+RETRYABLE_CANCELLATIONS = ("TransactionConflict", "ThrottlingError", "ProvisionedThroughputExceeded")
+
+# Inventory transactions tried per adjustment, and the first backoff delay in
+# seconds before retrying one that conflicted with another transaction
+MAX_ADJUST_ATTEMPTS = 5
+ADJUST_BASE_DELAY = 0.05
+
+
+def ledger_datetime():
+    """
+    Sort key for a new inventory ledger row. Keeps the sortable
+    YYYY-MM-DDTHH:MM:SS prefix used by older rows and adds microseconds plus
+    a random suffix, so rows written in the same second never collide.
+    """
+    now = time.time()
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(now)) + f".{int(now % 1 * 1000000):06d}#{uuid.uuid4().hex[:8]}"
+
+
+def ledger_item(product_id, quantity_change, remarks):
+    """Inventory ledger row for one adjustment"""
+    return {
+        "productId": product_id,
+        "datetime": ledger_datetime(),
+        "quantity": quantity_change,
+        "remarks": remarks
+    }
+
+
+def legacy_quantity(value):
+    """
+    The number in a quantity stored as a string (S) by the original CSV
+    import, or None if it doesn't hold a finite number.
+    """
+    try:
+        quantity = Decimal(value.strip())
+    except ArithmeticError:
+        return None
+    return quantity if quantity.is_finite() else None
+
+
+_deserializer = TypeDeserializer()
+
+
+class InventoryAdjustmentError(Exception):
+    """An inventory adjustment was refused; nothing in its transaction was written"""
+
+    def __init__(self, product_id, reason, stored_quantity=None):
+        super().__init__(f"{reason}: {product_id}")
+        self.product_id = product_id
+        self.reason = reason
+        # The string quantity behind a QUANTITY_NOT_NUMERIC refusal
+        self.stored_quantity = stored_quantity
+
+
+class ProductStore(ABC):
+    """
+    Storage operations ProductService needs from the products table and the
+    inventory ledger.
+
+    Items are plain dicts with Decimal numbers, as boto3 returns them.
+    Paging keys (`start_key`/the returned last key) are opaque dicts that
+    only need to survive encode_cursor/decode_cursor. `fields` is a list of
+    top-level attribute names to return, or None for the whole item.
+    """
+
+    # Products
+
+    @abstractmethod
+    def get_product(self, product_id, fields=None):
+        """Return one product, or None if it doesn't exist"""
+
+    @abstractmethod
+    def get_products(self, product_ids, fields=None):
+        """
+        Fetch several products by ID.
+
+        Returns:
+            tuple: (items found, ids that could not be read this time)
+        """
+
+    @abstractmethod
+    def put_product(self, item):
+        """Create or replace a product"""
+
+    @abstractmethod
+    def put_products(self, items, failed_keys=None):
+        """
+        Create or replace many products. Keys of items that could not be
+        written are appended to failed_keys if given.
+
+        Returns:
+            dict: {"rows", "written", "retried", "failed"}
+        """
+
+    @abstractmethod
+    def update_product(self, product_id, attributes):
+        """Set attributes on a product (creating it if needed) and return the whole updated item"""
+
+    @abstractmethod
+    def delete_product(self, product_id):
+        """Delete a product; deleting one that doesn't exist is not an error"""
+
+    @abstractmethod
+    def delete_products(self, keys, failed_keys=None):
+        """Delete many products by key; same summary and failed_keys as put_products"""
+
+    @abstractmethod
+    def scan_page(self, limit, start_key=None, fields=None):
+        """
+        Read one page of products.
+
+        Returns:
+            tuple: (items, key to resume from or None)
+        """
+
+    @abstractmethod
+    def scan_products(self, fields=None):
+        """Return every product"""
+
+    @abstractmethod
+    def query_products_by_name(self, product_name):
+        """Return the products with exactly this product_name"""
+
+    @abstractmethod
+    def lowest_stock(self, k):
+        """Return productId, product_name and quantity of the k lowest-stock indexed products, lowest first"""
+
+    @abstractmethod
+    def backfill_stock_shard(self, product_id):
+        """Add an existing product to the low-stock index. Returns False if the product doesn't exist."""
+
+    @abstractmethod
+    def set_current_stock(self, product_id, total, expected=None):
+        """
+        Overwrite a product's current_stock, but only if it still equals
+        `expected` (or is still absent when expected is None) and the
+        product exists. Returns False if the condition failed.
+        """
+
+    @abstractmethod
+    def convert_legacy_quantity(self, product_id, legacy):
+        """
+        Replace a quantity stored as the string `legacy` with its number,
+        but only if it is still that string. Returns False if the
+        condition failed or the string isn't a number.
+        """
+
+    # Inventory ledger
+
+    @abstractmethod
+    def adjust_inventory(self, adjustments):
+        """
+        Apply (productId, quantity change, remarks) adjustments atomically:
+        every product's quantity and current_stock change and a ledger row
+        is written for each, or nothing is written at all. A product's
+        quantity may not drop below 0. Each product may appear only once.
+        A product without current_stock has it seeded from the ledger first,
+        so the change is added to the ledger total rather than to 0, and a
+        quantity stored as a numeric string is converted to a number.
+
+        Raises:
+            InventoryAdjustmentError: a product is missing or would go below 0,
+                its stored quantity isn't a number, or it kept conflicting
+                with concurrent adjustments
+
+        Returns:
+            list: The ledger items written
+        """
+
+    @abstractmethod
+    def query_inventory(self, product_id, since=None, until=None, limit=None, start_key=None, newest_first=True):
+        """
+        Read a page of a product's ledger rows, optionally between two
+        inclusive datetime bounds.
+
+        Returns:
+            tuple: (items, key to resume from or None)
+        """
+
+    @abstractmethod
+    def sum_inventory(self, product_id):
+        """Sum every ledger quantity for a product"""
+
+
+class DynamoProductStore(ProductStore):
+    """ProductStore backed by the DynamoDB products and inventory tables"""
+
+    def __init__(self, table_name, inventory_table_name, region=DEFAULT_REGION):
+        """
+        Args:
+            table_name (str): Products table (with the product_name-index and stock-index GSIs)
+            inventory_table_name (str): Inventory ledger table (productId + datetime)
+            region (str): AWS region of both tables
+        """
+        self.table_name = table_name
+        self.inventory_table_name = inventory_table_name
+        self.region = region
+
+    # Built on first use so each route only pays for what it touches
+    @cached_property
+    def dynamodb(self):
+        return get_resource("dynamodb", region_name=self.region)
+
+    @cached_property
+    def product_table(self):
+        return self.dynamodb.Table(self.table_name)
+
+    @cached_property
+    def inventory_table(self):
+        return self.dynamodb.Table(self.inventory_table_name)
+
+    @cached_property
+    def scanner(self):
+        return ParallelScanner(self.product_table)
+
+    @staticmethod
+    def _projection(fields):
+        """ProjectionExpression/ExpressionAttributeNames kwargs for a list of fields"""
+        projection, attribute_names = projection_expression(",".join(fields or ()))
+        if not projection:
+            return {}
+        return {"ProjectionExpression": projection, "ExpressionAttributeNames": attribute_names}
+
+    def get_product(self, product_id, fields=None):
+        response = self.product_table.get_item(Key={"productId": product_id}, **self._projection(fields))
+        return response.get("Item")
+
+    def get_products(self, product_ids, fields=None):
+        getter = ParallelBatchGetter(self.dynamodb, self.table_name)
+        projection = self._projection(fields)
+        items, unprocessed = getter.get_items(
+            ({"productId": product_id} for product_id in product_ids),
+            projection=projection.get("ProjectionExpression"),
+            attribute_names=projection.get("ExpressionAttributeNames")
+        )
+        return items, [key["productId"] for key in unprocessed]
+
+    def put_product(self, item):
+        self.product_table.put_item(Item=item)
+
+    def put_products(self, items, failed_keys=None):
+        return ParallelBatchWriter(self.dynamodb, self.table_name).put_items(items, failed_keys=failed_keys)
+
+    def update_product(self, product_id, attributes):
+        response = self.product_table.update_item(
+            Key={"productId": product_id},
+            UpdateExpression="SET " + ", ".join(f"#{k} = :{k}" for k in attributes),
+            ExpressionAttributeNames={f"#{k}": k for k in attributes},
+            ExpressionAttributeValues={f":{k}": v for k, v in attributes.items()},
+            ReturnValues="ALL_NEW"
+        )
+        return response.get("Attributes")
+
+    def delete_product(self, product_id):
+        self.product_table.delete_item(Key={"productId": product_id})
+
+    def delete_products(self, keys, failed_keys=None):
+        return ParallelBatchWriter(self.dynamodb, self.table_name).delete_keys(keys, failed_keys=failed_keys)
+
+    def scan_page(self, limit, start_key=None, fields=None):
+        scan_kwargs = {"Limit": limit, **self._projection(fields)}
+        if start_key:
+            scan_kwargs["ExclusiveStartKey"] = start_key
+        response = self.product_table.scan(**scan_kwargs)
+        return response.get("Items", []), response.get("LastEvaluatedKey")
+
+    def scan_products(self, fields=None):
+        # Scan all segments of the table in parallel
+        return self.scanner.scan(**self._projection(fields))
+
+    def query_products_by_name(self, product_name):
+        # Query the table using the GSI on product_name
+        response = self.product_table.query(
+            IndexName="product_name-index",
+            KeyConditionExpression=Key("product_name").eq(product_name)
+        )
+        return response.get("Items", [])
+
+    def lowest_stock(self, k):
+        # Read the head of each shard of the low-stock index
+        return query_lowest_stock(self.product_table, k)
+
+    def backfill_stock_shard(self, product_id):
+        try:
+            self.product_table.update_item(
+                Key={"productId": product_id},
+                UpdateExpression="SET stock_shard = :s",
+                ConditionExpression="attribute_exists(productId)",
+                ExpressionAttributeValues={":s": stock_shard(product_id)}
+            )
+            return True
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+
+    def set_current_stock(self, product_id, total, expected=None):
+        if expected is not None:
+            condition = "current_stock = :seen"
+            values = {":total": total, ":seen": expected}
+        else:
+            condition = "attribute_exists(productId) AND attribute_not_exists(current_stock)"
+            values = {":total": total}
+        try:
+            self.product_table.update_item(
+                Key={"productId": product_id},
+                UpdateExpression="SET current_stock = :total",
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values
+            )
+            return True
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+
+    def convert_legacy_quantity(self, product_id, legacy):
+        quantity = legacy_quantity(legacy)
+        if quantity is None:
+            return False
+        try:
+            self.product_table.update_item(
+                Key={"productId": product_id},
+                UpdateExpression="SET quantity = :quantity",
+                ConditionExpression="quantity = :legacy",
+                ExpressionAttributeValues={":quantity": quantity, ":legacy": legacy}
+            )
+            return True
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+
+    def adjust_inventory(self, adjustments):
+        transact_items, ledger_items = [], []
+        for product_id, quantity_change, remarks in adjustments:
+            items, inventory_item = self._inventory_adjustment(product_id, quantity_change, remarks)
+            transact_items.extend(items)
+            ledger_items.append(inventory_item)
+        product_ids = [product_id for product_id, _, _ in adjustments]
+
+        for attempt in range(1, MAX_ADJUST_ATTEMPTS + 1):
+            try:
+                self.dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+                return ledger_items
+            except botocore.exceptions.ClientError as e:
+                errors = self._adjustment_errors(e, product_ids)
+                if not errors:
+                    raise
+                # A missing product or a real shortage can't be repaired
+                fatal = [error for error in errors if error.reason not in REPAIRABLE_REASONS]
+                if fatal or attempt == MAX_ADJUST_ATTEMPTS:
+                    raise (fatal or errors)[0] from e
+                for error in errors:
+                    if error.reason == STOCK_NOT_SEEDED:
+                        self._seed_current_stock(error.product_id)
+                    elif error.reason == QUANTITY_NOT_NUMERIC:
+                        self.convert_legacy_quantity(error.product_id, error.stored_quantity)
+                if any(error.reason == TRANSACTION_CONFLICT for error in errors):
+                    # Full jitter keeps concurrent adjustments of a popular product apart
+                    time.sleep(random.uniform(0, ADJUST_BASE_DELAY * (2 ** attempt)))
+
+    def _seed_current_stock(self, product_id):
+        """
+        Set a missing current_stock to the ledger total. Adjustments can't
+        commit while it's missing, so the total can't change in between;
+        if another caller seeded it first, its value stands.
+        """
+        self.set_current_stock(product_id, self.sum_inventory(product_id))
+
+    def _inventory_adjustment(self, product_id, quantity_change, remarks):
+        """
+        Build the TransactWriteItems actions for one inventory adjustment:
+        an atomic ADD to the product's quantity and current_stock, guarded so
+        quantity never drops below 0, current_stock is only added to once it
+        has been seeded and a string quantity fails the condition instead of
+        the whole transaction, plus the ledger row.
+
+        Returns:
+            tuple: (transact items, ledger item)
+        """
+        inventory_item = ledger_item(product_id, quantity_change, remarks)
+
+        values = {":d": quantity_change, ":number": "N"}
+        condition = (
+            "attribute_exists(productId) AND attribute_exists(current_stock)"
+            " AND (attribute_not_exists(quantity) OR attribute_type(quantity, :number))"
+        )
+        if quantity_change < 0:
+            # quantity + change >= 0  <=>  quantity >= -change
+            condition += " AND quantity >= :required"
+            values[":required"] = -quantity_change
+
+        transact_items = [
+            {
+                "Update": {
+                    "TableName": self.table_name,
+                    "Key": {"productId": product_id},
+                    "UpdateExpression": "ADD quantity :d, current_stock :d",
+                    "ConditionExpression": condition,
+                    "ExpressionAttributeValues": values,
+                    "ReturnValuesOnConditionCheckFailure": "ALL_OLD"
+                }
+            },
+            {
+                "Put": {
+                    "TableName": self.inventory_table_name,
+                    "Item": inventory_item,
+                    "ConditionExpression": "attribute_not_exists(productId)"
+                }
+            }
+        ]
+        return transact_items, inventory_item
+
+    @staticmethod
+    def _adjustment_errors(error, product_ids):
+        """
+        Map a cancelled inventory transaction to an InventoryAdjustmentError
+        for every product whose condition failed or whose writes conflicted
+        with another transaction, in adjustment order. Empty when the
+        failure is none of those.
+        """
+        if error.response['Error']['Code'] != 'TransactionCanceledException':
+            return []
+        reasons = error.response.get("CancellationReasons", [])
+        errors = []
+        for index, product_id in enumerate(product_ids):
+            # Each adjustment contributes the product update followed by its ledger row
+            reason = reasons[2 * index] if len(reasons) > 2 * index else {}
+            ledger_reason = reasons[2 * index + 1] if len(reasons) > 2 * index + 1 else {}
+            if reason.get("Code") in RETRYABLE_CANCELLATIONS or ledger_reason.get("Code") in RETRYABLE_CANCELLATIONS:
+                errors.append(InventoryAdjustmentError(product_id, TRANSACTION_CONFLICT))
+                continue
+            if reason.get("Code") != "ConditionalCheckFailed":
+                continue
+            # ALL_OLD comes back (still DynamoDB-typed) only when the product exists
+            old_item = {name: _deserializer.deserialize(value) for name, value in reason.get("Item", {}).items()}
+            if not old_item:
+                errors.append(InventoryAdjustmentError(product_id, PRODUCT_NOT_FOUND))
+            elif isinstance(old_item.get("quantity"), str):
+                # Imported as text by the original CSV path; ADD can't use it
+                if legacy_quantity(old_item["quantity"]) is None:
+                    errors.append(InventoryAdjustmentError(product_id, INVALID_QUANTITY))
+                else:
+                    errors.append(InventoryAdjustmentError(product_id, QUANTITY_NOT_NUMERIC, old_item["quantity"]))
+            elif "current_stock" not in old_item:
+                errors.append(InventoryAdjustmentError(product_id, STOCK_NOT_SEEDED))
+            else:
+                errors.append(InventoryAdjustmentError(product_id, INSUFFICIENT_STOCK))
+        return errors
+
+    def query_inventory(self, product_id, since=None, until=None, limit=None, start_key=None, newest_first=True):
+        key_condition = Key('productId').eq(product_id)
+        if since and until:
+            key_condition &= Key('datetime').between(since, until)
+        elif since:
+            key_condition &= Key('datetime').gte(since)
+        elif until:
+            key_condition &= Key('datetime').lte(until)
+
+        query_kwargs = {"KeyConditionExpression": key_condition, "ScanIndexForward": not newest_first}
+        if limit:
+            query_kwargs["Limit"] = limit
+        if start_key:
+            query_kwargs["ExclusiveStartKey"] = start_key
+        response = self.inventory_table.query(**query_kwargs)
+        return response.get("Items", []), response.get("LastEvaluatedKey")
+
+    def sum_inventory(self, product_id):
+        """Sum every inventory transaction for a product, following pagination"""
+        query_kwargs = {
+            "KeyConditionExpression": Key('productId').eq(product_id),
+            "ProjectionExpression": "quantity",
+            # The total overwrites current_stock, so it must include the
+            # newest ledger rows; an eventually consistent read can miss them
+            "ConsistentRead": True
+        }
+        total = Decimal(0)
+        while True:
+            response = self.inventory_table.query(**query_kwargs)
+            total += sum(Decimal(item.get('quantity', 0)) for item in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return total
+            query_kwargs["ExclusiveStartKey"] = response['LastEvaluatedKey']
+
+
+def create_product_store(table_name, inventory_table_name, region=DEFAULT_REGION):
+    """
+    Build the store selected by PRODUCT_STORE: "dynamodb" (default) or
+    "sqlite", which keeps both tables in the SQLite file at
+    PRODUCT_STORE_PATH (default :memory:) and needs no AWS access.
+    """
+    backend = os.environ.get("PRODUCT_STORE", "dynamodb").lower()
+    if backend == "dynamodb":
+        return DynamoProductStore(table_name, inventory_table_name, region=region)
+    if backend == "sqlite":
+        from models.sqlite_product_store import SQLiteProductStore
+        return SQLiteProductStore(os.environ.get("PRODUCT_STORE_PATH", ":memory:"))
+    raise ValueError(f"Unknown PRODUCT_STORE {backend!r}, expected 'dynamodb' or 'sqlite'")
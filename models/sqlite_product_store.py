@@ -0,0 +1,320 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from models.product_store import (
+    ProductStore, InventoryAdjustmentError, PRODUCT_NOT_FOUND, INSUFFICIENT_STOCK, INVALID_QUANTITY,
+    ledger_item, legacy_quantity
+)
+from utils.stock_index import stock_shard
+
+# Rows written per transaction by put_products/delete_products
+WRITE_CHUNK = 500
+
+# Items are stored whole as DynamoDB-typed JSON, so numbers keep their exact
+# Decimal value and sets/maps come back as they were written. The columns
+# next to it only exist to be indexed, mirroring the table's keys and GSIs.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    productId TEXT PRIMARY KEY,
+    product_name TEXT,
+    stock_shard TEXT,
+    quantity REAL,
+    item TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_by_name ON products (product_name);
+CREATE INDEX IF NOT EXISTS products_by_stock ON products (quantity, productId)
+    WHERE stock_shard IS NOT NULL AND quantity IS NOT NULL;
+CREATE TABLE IF NOT EXISTS inventory (
+    productId TEXT NOT NULL,
+    datetime TEXT NOT NULL,
+    quantity TEXT,
+    item TEXT NOT NULL,
+    PRIMARY KEY (productId, datetime)
+) WITHOUT ROWID;
+"""
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def encode_item(item):
+    return json.dumps({name: _serializer.serialize(value) for name, value in item.items()}, separators=(",", ":"))
+
+
+def decode_item(text, fields=None):
+    raw = json.loads(text)
+    if fields:
+        # Project before converting; most of the cost is in the conversion
+        raw = {name: raw[name] for name in fields if name in raw}
+    return {name: _deserializer.deserialize(value) for name, value in raw.items()}
+
+
+class SQLiteProductStore(ProductStore):
+    """
+    ProductStore kept in a local SQLite database, for load tests, local
+    runs and edge deployments without DynamoDB.
+
+    The products table is indexed like the DynamoDB table (primary key on
+    productId, product_name for the name lookup, a partial index on
+    quantity for the low-stock query) and the ledger is clustered on
+    (productId, datetime), so every operation is an index lookup or range
+    scan. One connection is shared by all threads and serialized with a
+    lock; inventory adjustments run in a single write transaction.
+    """
+
+    def __init__(self, path=":memory:"):
+        """
+        Args:
+            path (str): Database file, or ":memory:" for a private in-memory database
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _product_row(item):
+        product_id = item.get("productId")
+        if not isinstance(product_id, str) or not product_id:
+            raise ValueError("productId must be a non-empty string")
+        # Like a GSI, an index column is only filled when the attribute has the key's type
+        product_name = item.get("product_name")
+        shard = item.get("stock_shard")
+        quantity = item.get("quantity")
+        return (
+            product_id,
+            product_name if isinstance(product_name, str) else None,
+            shard if isinstance(shard, str) else None,
+            float(quantity) if isinstance(quantity, (Decimal, int)) and not isinstance(quantity, bool) else None,
+            encode_item(item)
+        )
+
+    def _write_product(self, db, item):
+        db.execute(
+            "INSERT OR REPLACE INTO products (productId, product_name, stock_shard, quantity, item) "
+            "VALUES (?, ?, ?, ?, ?)",
+            self._product_row(item)
+        )
+
+    def _read_product(self, db, product_id):
+        row = db.execute("SELECT item FROM products WHERE productId = ?", (product_id,)).fetchone()
+        return None if row is None else decode_item(row[0])
+
+    def get_product(self, product_id, fields=None):
+        rows = self._query("SELECT item FROM products WHERE productId = ?", (product_id,))
+        return decode_item(rows[0][0], fields) if rows else None
+
+    def get_products(self, product_ids, fields=None):
+        product_ids = list(dict.fromkeys(product_ids))
+        if fields:
+            # Results have to be matched back to ids, as BatchGetItem's are
+            fields = ["productId"] + [name for name in fields if name != "productId"]
+        items = []
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(product_ids), WRITE_CHUNK):
+            chunk = product_ids[i:i + WRITE_CHUNK]
+            rows = self._query(
+                f"SELECT item FROM products WHERE productId IN ({','.join('?' * len(chunk))})", chunk
+            )
+            items.extend(decode_item(row[0], fields) for row in rows)
+        return items, []
+
+    def put_product(self, item):
+        with self._transaction() as db:
+            self._write_product(db, item)
+
+    def put_products(self, items, failed_keys=None):
+        return self._write_chunks(items, lambda db, item: self._write_product(db, item))
+
+    def update_product(self, product_id, attributes):
+        if "productId" in attributes:
+            raise ValueError("productId is the key and can't be updated")
+        with self._transaction() as db:
+            item = self._read_product(db, product_id) or {"productId": product_id}
+            item.update(attributes)
+            self._write_product(db, item)
+        return item
+
+    def delete_product(self, product_id):
+        with self._transaction() as db:
+            db.execute("DELETE FROM products WHERE productId = ?", (product_id,))
+
+    def delete_products(self, keys, failed_keys=None):
+        return self._write_chunks(
+            keys, lambda db, key: db.execute("DELETE FROM products WHERE productId = ?", (key["productId"],))
+        )
+
+    def _write_chunks(self, requests, write):
+        """Apply write(db, request) to every request, WRITE_CHUNK per transaction"""
+        summary = {"rows": 0, "written": 0, "retried": 0, "failed": 0}
+        chunk = []
+        for request in requests:
+            chunk.append(request)
+            if len(chunk) == WRITE_CHUNK:
+                self._write_chunk(chunk, write, summary)
+                chunk = []
+        if chunk:
+            self._write_chunk(chunk, write, summary)
+        return summary
+
+    def _write_chunk(self, chunk, write, summary):
+        with self._transaction() as db:
+            for request in chunk:
+                write(db, request)
+        summary["rows"] += len(chunk)
+        summary["written"] += len(chunk)
+
+    def scan_page(self, limit, start_key=None, fields=None):
+        if start_key:
+            if not isinstance(start_key.get("productId"), str):
+                raise ValueError("Invalid cursor")
+            rows = self._query(
+                "SELECT productId, item FROM products WHERE productId > ? ORDER BY productId LIMIT ?",
+                (start_key["productId"], limit + 1)
+            )
+        else:
+            rows = self._query("SELECT productId, item FROM products ORDER BY productId LIMIT ?", (limit + 1,))
+
+        # One extra row tells whether there is a next page
+        last_key = {"productId": rows[limit - 1][0]} if len(rows) > limit else None
+        return [decode_item(item, fields) for _, item in rows[:limit]], last_key
+
+    def scan_products(self, fields=None):
+        return [decode_item(row[0], fields) for row in self._query("SELECT item FROM products")]
+
+    def query_products_by_name(self, product_name):
+        rows = self._query("SELECT item FROM products WHERE product_name = ?", (product_name,))
+        return [decode_item(row[0]) for row in rows]
+
+    def lowest_stock(self, k):
+        rows = self._query(
+            "SELECT item FROM products WHERE stock_shard IS NOT NULL AND quantity IS NOT NULL "
+            "ORDER BY quantity, productId LIMIT ?",
+            (k,)
+        )
+        return [decode_item(row[0], ("productId", "product_name", "quantity")) for row in rows]
+
+    def backfill_stock_shard(self, product_id):
+        with self._transaction() as db:
+            item = self._read_product(db, product_id)
+            if item is None:
+                return False
+            item["stock_shard"] = stock_shard(product_id)
+            self._write_product(db, item)
+        return True
+
+    def set_current_stock(self, product_id, total, expected=None):
+        with self._transaction() as db:
+            item = self._read_product(db, product_id)
+            if item is None:
+                return False
+            if expected is None and "current_stock" in item:
+                return False
+            if expected is not None and item.get("current_stock") != expected:
+                return False
+            item["current_stock"] = total
+            self._write_product(db, item)
+        return True
+
+    def convert_legacy_quantity(self, product_id, legacy):
+        quantity = legacy_quantity(legacy)
+        if quantity is None:
+            return False
+        with self._transaction() as db:
+            item = self._read_product(db, product_id)
+            if item is None or item.get("quantity") != legacy:
+                return False
+            item["quantity"] = quantity
+            self._write_product(db, item)
+        return True
+
+    def adjust_inventory(self, adjustments):
+        product_ids = [product_id for product_id, _, _ in adjustments]
+        if len(set(product_ids)) != len(product_ids):
+            raise ValueError("A product can only be adjusted once per transaction")
+
+        ledger_items = []
+        with self._transaction() as db:
+            for product_id, quantity_change, remarks in adjustments:
+                item = self._read_product(db, product_id)
+                if item is None:
+                    raise InventoryAdjustmentError(product_id, PRODUCT_NOT_FOUND)
+                if isinstance(item.get("quantity"), str):
+                    # Imported as text by the original CSV path
+                    item["quantity"] = legacy_quantity(item["quantity"])
+                    if item["quantity"] is None:
+                        raise InventoryAdjustmentError(product_id, INVALID_QUANTITY)
+                # Like the DynamoDB condition, a missing quantity fails "quantity >= :required"
+                if quantity_change < 0 and ("quantity" not in item or item["quantity"] < -quantity_change):
+                    raise InventoryAdjustmentError(product_id, INSUFFICIENT_STOCK)
+
+                # ADD semantics: a missing quantity counts as 0. A missing
+                # current_stock starts from the ledger total, as in DynamoDB.
+                if "current_stock" not in item:
+                    item["current_stock"] = self.sum_inventory(product_id)
+                item["quantity"] = item.get("quantity", 0) + quantity_change
+                item["current_stock"] += quantity_change
+                self._write_product(db, item)
+
+                inventory_item = ledger_item(product_id, quantity_change, remarks)
+                db.execute(
+                    "INSERT INTO inventory (productId, datetime, quantity, item) VALUES (?, ?, ?, ?)",
+                    (product_id, inventory_item["datetime"], str(quantity_change), encode_item(inventory_item))
+                )
+                ledger_items.append(inventory_item)
+        return ledger_items
+
+    def query_inventory(self, product_id, since=None, until=None, limit=None, start_key=None, newest_first=True):
+        sql = "SELECT datetime, item FROM inventory WHERE productId = ?"
+        params = [product_id]
+        if since:
+            sql += " AND datetime >= ?"
+            params.append(since)
+        if until:
+            sql += " AND datetime <= ?"
+            params.append(until)
+        if start_key:
+            if start_key.get("productId") != product_id or not isinstance(start_key.get("datetime"), str):
+                raise ValueError("Invalid cursor")
+            sql += " AND datetime < ?" if newest_first else " AND datetime > ?"
+            params.append(start_key["datetime"])
+        sql += " ORDER BY datetime DESC" if newest_first else " ORDER BY datetime"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+
+        rows = self._query(sql, params)
+        last_key = None
+        if limit and len(rows) > limit:
+            last_key = {"productId": product_id, "datetime": rows[limit - 1][0]}
+            rows = rows[:limit]
+        return [decode_item(item) for _, item in rows], last_key
+
+    def sum_inventory(self, product_id):
+        rows = self._query("SELECT quantity FROM inventory WHERE productId = ?", (product_id,))
+        return sum((Decimal(quantity or 0) for quantity, in rows), Decimal(0))
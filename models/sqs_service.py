@@ -1,8 +1,213 @@
-import json
-import boto3
-from utils.decimal_encoder import DecimalEncoder
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import botocore.exceptions
+from utils.decimal_encoder import dumps
+from utils.aws_clients import get_client
+from utils.telemetry import register_flush
+
+logger = logging.getLogger()
+
+# SendMessageBatch limits: 10 entries and 256 KiB of message bodies per call
+MAX_BATCH_ENTRIES = 10
+MAX_BATCH_BYTES = 262144
+
+
+class SqsProducer:
+    """
+    Sends messages to SQS queues by name.
+
+    Queue URLs are looked up once per process. Messages are packed into
+    SendMessageBatch calls of up to 10 entries and 256 KiB, and entries a
+    batch rejects for a non-sender reason (throttling, a service error) are
+    retried one by one with backoff.
+
+    In "buffered" mode enqueue() only queues the message; a daemon thread
+    sends batches as they fill up and flush() waits for the queue to drain
+    (the Lambda entry points call it through flush_telemetry). In "sync"
+    mode enqueue() sends right away.
+    """
+
+    def __init__(self, region='us-east-2', mode=None, max_retries=3, base_delay=0.05, max_workers=4, linger=0.02):
+        """
+        Args:
+            region (str): AWS region of the queues
+            mode (str): "sync" or "buffered", defaults to SQS_PRODUCER_MODE
+            max_retries (int): Individual retries for an entry a batch didn't take
+            base_delay (float): First backoff delay in seconds
+            max_workers (int): Batches sent concurrently
+            linger (float): Seconds the buffered worker waits to fill a batch
+        """
+        self.region = region
+        self.mode = mode or os.environ.get("SQS_PRODUCER_MODE", "sync")
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_workers = max_workers
+        self.linger = linger
+
+        self._queue_urls = {}
+        self._lock = threading.Lock()
+        self._buffer = []            # (queue name, body)
+        self._wakeup = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = False
+        self._worker = None
+
+    @property
+    def client(self):
+        return get_client('sqs', region_name=self.region)
+
+    def queue_url(self, queue_name):
+        """Return a queue's URL, looking it up only the first time"""
+        url = self._queue_urls.get(queue_name)
+        if url is None:
+            url = self.client.get_queue_url(QueueName=queue_name)["QueueUrl"]
+            self._queue_urls[queue_name] = url
+        return url
+
+    def send(self, queue_name, message):
+        """Send one message now. Returns True if SQS accepted it."""
+        return not self.send_messages(queue_name, [message])
+
+    def send_messages(self, queue_name, messages):
+        """
+        Send messages (dicts are JSON-encoded, strings go as they are) in
+        packed batches. Returns the indexes of the messages that weren't sent.
+        """
+        bodies = [message if isinstance(message, str) else dumps(message) for message in messages]
+        if not bodies:
+            return []
+
+        try:
+            queue_url = self.queue_url(queue_name)
+        except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as e:
+            logger.error("Could not look up SQS queue %s: %s", queue_name, e)
+            return list(range(len(bodies)))
+        batches, failed = self._pack(bodies)
+        if len(batches) == 1:
+            failed.extend(self._send_batch(queue_url, bodies, batches[0]))
+        elif batches:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+                for batch_failed in executor.map(lambda batch: self._send_batch(queue_url, bodies, batch), batches):
+                    failed.extend(batch_failed)
+        return sorted(failed)
+
+    def enqueue(self, queue_name, message):
+        """Send a message now (sync mode) or queue it for the background worker (buffered mode)"""
+        if self.mode != "buffered":
+            if not self.send(queue_name, message):
+                logger.error("Could not send message to %s", queue_name)
+            return
+        body = message if isinstance(message, str) else dumps(message)
+        with self._lock:
+            self._buffer.append((queue_name, body))
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="sqs-producer", daemon=True)
+                self._worker.start()
+            self._wakeup.notify()
+
+    def flush(self, timeout=None):
+        """Wait up to `timeout` seconds for buffered messages to be sent"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._wakeup.notify()
+            while self._buffer or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    logger.warning("SQS flush timed out with %d message(s) still buffered", len(self._buffer))
+                    return
+                self._idle.wait(remaining)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._buffer:
+                    self._wakeup.wait()
+            # Give the request a moment to queue more messages into this batch
+            time.sleep(self.linger)
+            with self._lock:
+                buffered, self._buffer = self._buffer, []
+                self._in_flight = True
+            try:
+                by_queue = {}
+                for queue_name, body in buffered:
+                    by_queue.setdefault(queue_name, []).append(body)
+                for queue_name, bodies in by_queue.items():
+                    failed = self.send_messages(queue_name, bodies)
+                    if failed:
+                        logger.error("Could not send %d buffered message(s) to %s", len(failed), queue_name)
+            except Exception as e:
+                logger.exception("Error flushing buffered SQS messages: %s", e)
+            finally:
+                with self._lock:
+                    self._in_flight = False
+                    self._idle.notify_all()
+
+    @staticmethod
+    def _pack(bodies):
+        """
+        Group message indexes into batches within the entry and size limits.
+        Returns (batches, indexes of messages too large to send at all).
+        """
+        batches, too_large = [], []
+        batch, batch_bytes = [], 0
+        for index, body in enumerate(bodies):
+            size = len(body.encode("utf-8"))
+            if size > MAX_BATCH_BYTES:
+                logger.error("SQS message %d is %d bytes, over the %d byte limit", index, size, MAX_BATCH_BYTES)
+                too_large.append(index)
+                continue
+            if batch and (len(batch) == MAX_BATCH_ENTRIES or batch_bytes + size > MAX_BATCH_BYTES):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(index)
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+        return batches, too_large
+
+    def _send_batch(self, queue_url, bodies, batch):
+        """Send one packed batch; returns the indexes that still failed after retries"""
+        entries = [{"Id": str(index), "MessageBody": bodies[index]} for index in batch]
+        try:
+            response = self.client.send_message_batch(QueueUrl=queue_url, Entries=entries)
+        except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as e:
+            # A service error or a connection failure after botocore's own retries
+            logger.warning("SendMessageBatch failed, retrying %d message(s) one by one: %s", len(batch), e)
+            retry, permanent = batch, []
+        else:
+            retry, permanent = [], []
+            for failure in response.get("Failed", []):
+                if failure.get("SenderFault"):
+                    # The message itself is bad; sending it again won't help
+                    logger.error("SQS rejected a message: %s", failure)
+                    permanent.append(int(failure["Id"]))
+                else:
+                    retry.append(int(failure["Id"]))
+
+        return permanent + [index for index in retry if not self._send_one(queue_url, bodies[index])]
+
+    def _send_one(self, queue_url, body):
+        for attempt in range(1, self.max_retries + 1):
+            # Full jitter keeps concurrent retries apart
+            time.sleep(random.uniform(0, self.base_delay * (2 ** attempt)))
+            try:
+                self.client.send_message(QueueUrl=queue_url, MessageBody=body)
+                return True
+            except (botocore.exceptions.ClientError, botocore.exceptions.BotoCoreError) as e:
+                logger.warning("SendMessage retry %d failed: %s", attempt, e)
+        return False
+
+
+# Shared by every caller in the process, so queue URLs are looked up once
+sqs_producer = SqsProducer()
+if sqs_producer.mode == "buffered":
+    register_flush(sqs_producer.flush)
+
 
 def send_message_to_queue(queue_name: str, message: dict, region: str = 'us-east-2'):
-    sqs = boto3.resource('sqs', region_name=region)
-    queue = sqs.get_queue_by_name(QueueName=queue_name)
-    queue.send_message(MessageBody=json.dumps(message, cls=DecimalEncoder))
+    producer = sqs_producer if region == sqs_producer.region else SqsProducer(region=region, mode="sync")
+    producer.enqueue(queue_name, message)
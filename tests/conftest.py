@@ -0,0 +1,11 @@
+import os
+
+# No test talks to AWS: clients are stubbed or replaced, but botocore still
+# wants a region and credentials to build them. Metrics stay off so the EMF
+# lines don't end up in the test output.
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("METRICS_ENABLED", "0")
+os.environ.setdefault("SQS_PRODUCER_MODE", "sync")
+os.environ.setdefault("TELEMETRY_MODE", "deferred")
@@ -0,0 +1,124 @@
+import botocore.exceptions
+import pytest
+from utils.batch_writer import ParallelBatchWriter
+from utils.batch_getter import ParallelBatchGetter
+
+
+def client_error(code):
+    return botocore.exceptions.ClientError({"Error": {"Code": code, "Message": code}}, "Batch")
+
+
+class FakeDynamoDB:
+    """
+    Records batch calls. `script` lists what successive calls do: "throttle",
+    "unprocess" (hand back every request but the first), "reject" (hand
+    back every request) or None (succeed).
+    Items with "bad": True fail the whole call, as a GSI type mismatch does.
+    """
+
+    def __init__(self, script=(), items=None):
+        self.script = list(script)
+        self.items = items or {}
+        self.calls = []
+
+    def _next(self):
+        action = self.script.pop(0) if self.script else None
+        if action == "throttle":
+            raise client_error("ProvisionedThroughputExceededException")
+        return action
+
+    def batch_write_item(self, RequestItems):
+        requests, = RequestItems.values()
+        self.calls.append(requests)
+        if any(request.get("PutRequest", {}).get("Item", {}).get("bad") for request in requests):
+            raise client_error("ValidationException")
+        action = self._next()
+        if action == "reject":
+            return {"UnprocessedItems": {"T": requests}}
+        if action == "unprocess":
+            return {"UnprocessedItems": {"T": requests[1:]}} if len(requests) > 1 else {}
+        return {}
+
+    def batch_get_item(self, RequestItems):
+        request, = RequestItems.values()
+        keys = request["Keys"]
+        self.calls.append(keys)
+        found = [self.items[key["productId"]] for key in keys if key["productId"] in self.items]
+        if self._next() == "unprocess":
+            return {"Responses": {"T": found[:1]}, "UnprocessedKeys": {"T": {"Keys": keys[1:]}}}
+        return {"Responses": {"T": found}}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+
+
+def products(count, **extra):
+    return [{"productId": f"P{i}", **extra} for i in range(count)]
+
+
+def test_writes_in_batches_of_25():
+    dynamodb = FakeDynamoDB()
+    summary = ParallelBatchWriter(dynamodb, "T", max_workers=2).put_items(products(60))
+    assert summary == {"rows": 60, "written": 60, "retried": 0, "failed": 0}
+    assert sorted(len(call) for call in dynamodb.calls) == [10, 25, 25]
+
+
+def test_unprocessed_and_throttled_items_are_retried():
+    dynamodb = FakeDynamoDB(["throttle", "unprocess", None])
+    summary = ParallelBatchWriter(dynamodb, "T", max_workers=1).put_items(products(3))
+    assert summary == {"rows": 3, "written": 3, "retried": 5, "failed": 0}
+
+
+def test_items_still_unprocessed_after_retries_fail():
+    dynamodb = FakeDynamoDB(["unprocess"] + ["reject"] * 10)
+    failed = []
+    summary = ParallelBatchWriter(dynamodb, "T", max_workers=1, max_retries=2).put_items(products(3), failed_keys=failed)
+    assert summary == {"rows": 3, "written": 1, "retried": 4, "failed": 2}
+    assert failed == [{"productId": "P1"}, {"productId": "P2"}]
+
+
+def test_one_invalid_item_fails_alone():
+    items = products(25)
+    items[7]["bad"] = True
+    failed = []
+    summary = ParallelBatchWriter(FakeDynamoDB(), "T", max_workers=1).put_items(items, failed_keys=failed)
+    assert (summary["written"], summary["failed"]) == (24, 1)
+    assert failed == [{"productId": "P7"}]
+
+
+def test_duplicate_keys_in_a_batch_collapse_to_the_last():
+    dynamodb = FakeDynamoDB()
+    ParallelBatchWriter(dynamodb, "T", max_workers=1).put_items([{"productId": "A", "v": 1}, {"productId": "A", "v": 2}])
+    assert dynamodb.calls == [[{"PutRequest": {"Item": {"productId": "A", "v": 2}}}]]
+
+
+def test_getter_retries_unprocessed_keys():
+    items = {f"P{i}": {"productId": f"P{i}"} for i in range(150)}
+    dynamodb = FakeDynamoDB(["unprocess"], items=items)
+    found, unprocessed = ParallelBatchGetter(dynamodb, "T", max_workers=1).get_items(
+        [{"productId": f"P{i}"} for i in range(150)] + [{"productId": "P0"}, {"productId": "missing"}]
+    )
+    assert unprocessed == []
+    assert sorted(item["productId"] for item in found) == sorted(items)
+    assert max(len(call) for call in dynamodb.calls) == 100
+
+
+def test_getter_returns_keys_left_unprocessed():
+    items = {f"P{i}": {"productId": f"P{i}"} for i in range(3)}
+    dynamodb = FakeDynamoDB(["unprocess"] * 10, items=items)
+    found, unprocessed = ParallelBatchGetter(dynamodb, "T", max_retries=1).get_items(
+        [{"productId": f"P{i}"} for i in range(3)]
+    )
+    assert [item["productId"] for item in found] == ["P0", "P1"]
+    assert unprocessed == [{"productId": "P2"}]
+
+
+def test_getter_projection_always_includes_the_key():
+    dynamodb = FakeDynamoDB()
+    calls = []
+    dynamodb.batch_get_item = lambda RequestItems: calls.append(RequestItems["T"]) or {"Responses": {"T": []}}
+    ParallelBatchGetter(dynamodb, "T").get_items([{"productId": "P1"}], projection="#f0", attribute_names={"#f0": "price"})
+    assert calls[0]["ProjectionExpression"] == "#f0, #k0"
+    assert calls[0]["ExpressionAttributeNames"] == {"#f0": "price", "#k0": "productId"}
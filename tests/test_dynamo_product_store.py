@@ -0,0 +1,138 @@
+from decimal import Decimal
+import botocore.exceptions
+import pytest
+from botocore.stub import Stubber, ANY
+import models.product_store as product_store
+from models.product_store import (
+    DynamoProductStore, InventoryAdjustmentError, INSUFFICIENT_STOCK, INVALID_QUANTITY, PRODUCT_NOT_FOUND,
+    TRANSACTION_CONFLICT, MAX_ADJUST_ATTEMPTS
+)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(product_store, "ADJUST_BASE_DELAY", 0)
+    return DynamoProductStore("Products", "Inventory")
+
+
+@pytest.fixture
+def stubber(store):
+    with Stubber(store.dynamodb.meta.client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+
+def cancelled(stubber, *reasons):
+    """Queue a TransactionCanceledException with one reason per transaction action"""
+    stubber.add_client_error("transact_write_items", "TransactionCanceledException", "Transaction cancelled",
+                             modeled_fields={"CancellationReasons": list(reasons)})
+
+
+def condition_failed(item=None):
+    reason = {"Code": "ConditionalCheckFailed"}
+    if item is not None:
+        reason["Item"] = item
+    return reason
+
+
+NONE = {"Code": "None"}
+CONFLICT = {"Code": "TransactionConflict"}
+
+
+def test_adjustment_is_one_guarded_transaction(store, stubber):
+    stubber.add_response("transact_write_items", {}, {"TransactItems": ANY})
+    ledger, = store.adjust_inventory([("P1", Decimal(-2), "sold")])
+    assert ledger["productId"] == "P1" and ledger["quantity"] == Decimal(-2)
+
+    update, put = store._inventory_adjustment("P1", Decimal(-2), "sold")[0]
+    condition = update["Update"]["ConditionExpression"]
+    assert "attribute_exists(current_stock)" in condition
+    assert "attribute_type(quantity, :number)" in condition
+    assert "quantity >= :required" in condition
+    assert put["Put"]["TableName"] == "Inventory"
+
+
+def test_missing_current_stock_is_seeded_from_the_ledger_before_retrying(store, stubber):
+    # Regression: ADD on a missing current_stock started it from 0 instead of the ledger total
+    cancelled(stubber, condition_failed({"productId": {"S": "P1"}, "quantity": {"N": "7"}}), NONE)
+    stubber.add_response("query", {"Items": [{"quantity": {"N": "4"}}, {"quantity": {"N": "3"}}]}, {
+        "TableName": "Inventory",
+        "KeyConditionExpression": ANY,
+        "ProjectionExpression": "quantity",
+        "ConsistentRead": True
+    })
+    stubber.add_response("update_item", {}, {
+        "TableName": "Products",
+        "Key": {"productId": "P1"},
+        "UpdateExpression": "SET current_stock = :total",
+        "ConditionExpression": "attribute_exists(productId) AND attribute_not_exists(current_stock)",
+        "ExpressionAttributeValues": {":total": Decimal(7)}
+    })
+    stubber.add_response("transact_write_items", {})
+    assert len(store.adjust_inventory([("P1", Decimal(3), "restock")])) == 1
+
+
+class LaggingLedger:
+    """Inventory table whose eventually consistent reads haven't seen the last row yet"""
+
+    def __init__(self, quantities):
+        self.quantities = quantities
+
+    def query(self, ConsistentRead=False, **kwargs):
+        seen = self.quantities if ConsistentRead else self.quantities[:-1]
+        return {"Items": [{"quantity": Decimal(quantity)} for quantity in seen]}
+
+
+def test_ledger_total_includes_the_newest_rows(store):
+    # Regression: reconcile wrote a total that missed rows a lagging read hadn't seen
+    store.inventory_table = LaggingLedger([4, 3, 5])
+    assert store.sum_inventory("P1") == Decimal(12)
+
+
+def test_conflicts_are_retried(store, stubber):
+    # Regression: TransactionConflict used to be re-raised and returned as a 500
+    cancelled(stubber, CONFLICT, NONE)
+    cancelled(stubber, NONE, NONE, CONFLICT, NONE)
+    stubber.add_response("transact_write_items", {})
+    assert len(store.adjust_inventory([("P1", Decimal(-1), ""), ("P2", Decimal(-1), "")])) == 2
+
+
+def test_conflicts_give_up_after_max_attempts(store, stubber):
+    for _ in range(MAX_ADJUST_ATTEMPTS):
+        cancelled(stubber, CONFLICT, NONE)
+    with pytest.raises(InventoryAdjustmentError) as refused:
+        store.adjust_inventory([("P1", Decimal(-1), "")])
+    assert refused.value.reason == TRANSACTION_CONFLICT
+
+
+@pytest.mark.parametrize("item, reason", [
+    (None, PRODUCT_NOT_FOUND),
+    ({"productId": {"S": "P1"}, "quantity": {"N": "1"}, "current_stock": {"N": "1"}}, INSUFFICIENT_STOCK),
+    ({"productId": {"S": "P1"}, "quantity": {"S": "lots"}}, INVALID_QUANTITY),
+])
+def test_refusals_are_not_retried(store, stubber, item, reason):
+    cancelled(stubber, condition_failed(item), NONE)
+    with pytest.raises(InventoryAdjustmentError) as refused:
+        store.adjust_inventory([("P1", Decimal(-5), "")])
+    assert (refused.value.product_id, refused.value.reason) == ("P1", reason)
+
+
+def test_legacy_string_quantity_is_converted_before_retrying(store, stubber):
+    cancelled(stubber, condition_failed({"productId": {"S": "P1"}, "quantity": {"S": "12"},
+                                         "current_stock": {"N": "0"}}), NONE)
+    stubber.add_response("update_item", {}, {
+        "TableName": "Products",
+        "Key": {"productId": "P1"},
+        "UpdateExpression": "SET quantity = :quantity",
+        "ConditionExpression": "quantity = :legacy",
+        "ExpressionAttributeValues": {":quantity": Decimal(12), ":legacy": "12"}
+    })
+    stubber.add_response("transact_write_items", {})
+    assert len(store.adjust_inventory([("P1", Decimal(-2), "sold")])) == 1
+
+
+def test_other_errors_are_raised_as_they_are(store, stubber):
+    stubber.add_client_error("transact_write_items", "ValidationException", "bad request")
+    with pytest.raises(botocore.exceptions.ClientError) as raised:
+        store.adjust_inventory([("P1", Decimal(1), "")])
+    assert raised.value.response["Error"]["Code"] == "ValidationException"
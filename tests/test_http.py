@@ -0,0 +1,80 @@
+import base64
+import gzip
+from utils.http_cache import conditional_response, content_etag, etag_matches
+from utils.http_compression import accepts_gzip, compress_response, gzip_response
+
+BODY = '{"items": []}'
+
+
+def event(**headers):
+    return {"headers": headers}
+
+
+def ok(body=BODY, **headers):
+    return {"statusCode": 200, "headers": {"Content-Type": "application/json", **headers}, "body": body}
+
+
+def test_etag_is_stable_and_content_based():
+    assert content_etag(BODY) == content_etag(BODY.encode("utf-8"))
+    assert content_etag(BODY) != content_etag(BODY + " ")
+
+
+def test_etag_matching_is_weak():
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", "abc"', 'W/"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_conditional_response_adds_validators():
+    response = conditional_response(event(), ok(), cache_control="public, max-age=5")
+    assert response["statusCode"] == 200
+    assert response["headers"]["ETag"] == content_etag(BODY)
+    assert response["headers"]["Cache-Control"] == "public, max-age=5"
+
+
+def test_matching_if_none_match_gives_304():
+    response = conditional_response(event(**{"if-none-match": content_etag(BODY)}), ok())
+    assert response["statusCode"] == 304
+    assert response["body"] == ""
+    assert "Content-Type" not in response["headers"]
+    assert response["headers"]["ETag"] == content_etag(BODY)
+
+
+def test_errors_pass_through():
+    error = {"statusCode": 404, "body": "{}"}
+    assert conditional_response(event(**{"If-None-Match": "*"}), error) is error
+
+
+def test_accepts_gzip():
+    assert accepts_gzip(event(**{"Accept-Encoding": "gzip, deflate, br"}))
+    assert accepts_gzip(event(**{"accept-encoding": "br;q=1.0, *;q=0.5"}))
+    assert not accepts_gzip(event(**{"Accept-Encoding": "gzip;q=0"}))
+    assert not accepts_gzip(event(**{"Accept-Encoding": "br"}))
+    assert not accepts_gzip(event())
+
+
+def test_large_body_is_gzipped():
+    body = '{"items": [' + ",".join(['{"productId": "P1"}'] * 200) + "]}"
+    response = compress_response(event(**{"Accept-Encoding": "gzip"}), ok(body, ETag='"v1"'))
+    assert response["isBase64Encoded"] is True
+    assert response["headers"]["Content-Encoding"] == "gzip"
+    assert response["headers"]["Vary"] == "Accept-Encoding"
+    assert response["headers"]["ETag"] == 'W/"v1"'
+    assert gzip.decompress(base64.b64decode(response["body"])).decode("utf-8") == body
+
+
+def test_small_or_unaccepted_bodies_stay_plain():
+    assert compress_response(event(**{"Accept-Encoding": "gzip"}), ok()) == ok()
+
+    body = "x" * 5000
+    response = compress_response(event(), ok(body))
+    assert response["body"] == body
+    assert response["headers"]["Vary"] == "Accept-Encoding"
+
+
+def test_gzip_response_decorator_skips_encoded_bodies():
+    already = {**ok("x" * 5000), "isBase64Encoded": True}
+    handler = gzip_response(lambda event, context: already)
+    assert handler(event(**{"Accept-Encoding": "gzip"}), None) is already
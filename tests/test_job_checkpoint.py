@@ -0,0 +1,16 @@
+from utils.job_checkpoint import make_job_id, upload_id
+
+
+def test_reuploading_an_identical_file_is_a_new_job():
+    first = {"eventTime": "2025-01-01T00:00:00Z", "s3": {"object": {"key": "for_create/a.csv", "sequencer": "0A"}}}
+    second = {"eventTime": "2025-01-02T00:00:00Z", "s3": {"object": {"key": "for_create/a.csv", "sequencer": "0B"}}}
+    assert make_job_id("b", "for_create/a.csv", '"etag"', upload_id(first)) != \
+        make_job_id("b", "for_create/a.csv", '"etag"', upload_id(second))
+    assert make_job_id("b", "for_create/a.csv", '"etag"', upload_id(first)) == \
+        make_job_id("b", "for_create/a.csv", '"etag"', upload_id(dict(first)))
+
+
+def test_upload_id_falls_back_to_version_then_event_time():
+    assert upload_id({"eventTime": "t", "s3": {"object": {"versionId": "v1"}}}) == "v1"
+    assert upload_id({"eventTime": "t"}) == "t"
+    assert upload_id({}) == ""
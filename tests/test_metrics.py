@@ -0,0 +1,38 @@
+import io
+import json
+import pytest
+from benchmarks.fakes import FakeSQS
+from utils import aws_clients, metrics
+
+
+@pytest.fixture
+def output(monkeypatch):
+    output = io.StringIO()
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics, "_output", output)
+    return output
+
+
+def emitted(output):
+    lines = output.getvalue().splitlines()
+    output.seek(0)
+    output.truncate()
+    return json.loads(lines[-1])
+
+
+def test_client_reuse_is_reported_per_invocation(output):
+    handler = metrics.emit_metrics(lambda event, context: {"statusCode": 200, "body": "{}"})
+    aws_clients.set_client("sqs", FakeSQS())
+    handler({}, None)
+    emitted(output)
+
+    aws_clients.get_client("sqs")
+    aws_clients.get_client("sqs")
+    handler({}, None)
+    document = emitted(output)
+    assert document["AwsClients.clients_reused"] == 2
+    assert {"Name": "AwsClients.clients_reused", "Unit": "Count"} in document["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+
+    # Counters that didn't move are left out
+    handler({}, None)
+    assert "AwsClients.clients_reused" not in emitted(output)
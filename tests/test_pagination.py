@@ -0,0 +1,49 @@
+import pytest
+from utils.pagination import encode_cursor, decode_cursor, parse_limit, parse_fields, projection_expression
+
+
+def test_cursor_round_trip():
+    key = {"productId": "P0000042", "datetime": "2025-01-31T12:00:00.000001#abcd1234"}
+    cursor = encode_cursor(key)
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+    assert decode_cursor(cursor) == key
+
+
+def test_empty_cursor_is_none():
+    assert encode_cursor(None) is None
+    assert encode_cursor({}) is None
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24", encode_cursor({"a": 1})[:-2] + "!!", "W10", "e30"])
+def test_malformed_cursor_raises(cursor):
+    # "W10" is [] and "e30" is {}: valid JSON but not a key
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_parse_limit():
+    assert parse_limit(None) == 100
+    assert parse_limit("") == 100
+    assert parse_limit("25") == 25
+    assert parse_limit("5000") == 1000
+    assert parse_limit("50", default=10, maximum=20) == 20
+    for value in ("0", "-3", "ten", "2.5", " "):
+        with pytest.raises(ValueError, match="^limit must be an integer between 1 and 1000$"):
+            parse_limit(value)
+    with pytest.raises(ValueError, match="^k must be an integer between 1 and 20$"):
+        parse_limit("x", maximum=20, name="k")
+
+
+def test_parse_fields_dedupes_in_order():
+    assert parse_fields(" price, productId ,price,,") == ["price", "productId"]
+    assert parse_fields("") is None
+    assert parse_fields(None) is None
+
+
+def test_projection_expression_names_every_field():
+    projection, names = projection_expression("name,datetime")
+    assert projection == "#f0, #f1"
+    assert names == {"#f0": "name", "#f1": "datetime"}
+    assert projection_expression("") == (None, None)
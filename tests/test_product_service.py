@@ -0,0 +1,197 @@
+import json
+import time
+from decimal import Decimal
+import botocore.exceptions
+import pytest
+from benchmarks.fakes import FakeS3, FakeSQS, FakeEventBridge, FakeCloudWatchLogs
+from models.product_store import InventoryAdjustmentError, TRANSACTION_CONFLICT
+from models.sqlite_product_store import SQLiteProductStore
+from utils import aws_clients
+import gateway.dynamodb_gateway as product_gateway
+
+
+@pytest.fixture
+def s3():
+    s3 = FakeS3()
+    aws_clients.set_client("s3", s3)
+    for service, fake in (("sqs", FakeSQS()), ("events", FakeEventBridge()), ("logs", FakeCloudWatchLogs())):
+        aws_clients.set_client(service, fake)
+    return s3
+
+
+@pytest.fixture
+def service(s3):
+    service = product_gateway.ProductService()
+    service.store = SQLiteProductStore()
+    return service
+
+
+def sqs_record(message_id, body, sent_at):
+    return {"messageId": message_id, "body": body, "attributes": {"SentTimestamp": str(int(sent_at * 1000))}}
+
+
+@pytest.mark.parametrize("route, params", [
+    ("get_all_products", {}),
+    ("search_products", {"q": "shoe"}),
+    ("get_inventory_history", {}),
+])
+def test_bad_limit_gets_a_clean_400(service, route, params):
+    event = {"pathParameters": {"productId": "A"}, "queryStringParameters": {**params, "limit": "ten"}}
+    response = getattr(service, route)(event, None)
+    assert response["statusCode"] == 400
+    # Regression: the message used to be int()'s "invalid literal for int() with base 10: ..."
+    assert json.loads(response["body"])["message"].startswith("Bad Request: limit must be an integer between 1 and ")
+
+
+def test_sqs_batch_is_written_before_it_is_acknowledged(service, s3):
+    now = time.time()
+    records = [
+        sqs_record("m1", json.dumps({"productId": "P1", "price": 1, "color": "red"}), now),
+        sqs_record("m2", json.dumps({"productId": "P2"}), now - 7200),
+        sqs_record("m3", "not json", now),
+    ]
+    response = service.receive_message_from_sqs({"Records": records}, None)
+    # Extra fields are dropped, not a reason to redeliver
+    assert response == {"batchItemFailures": [{"itemIdentifier": "m3"}]}
+    assert len([key for _, key in s3.objects if key.endswith(".csv.gz")]) == 2
+
+
+def test_sqs_records_of_an_unwritten_partition_are_redelivered(service, s3, monkeypatch):
+    put_object = s3.put_object
+
+    def failing_put(**kwargs):
+        if "dt=1970-01-01/" in kwargs["Key"]:
+            raise RuntimeError("S3 unavailable")
+        return put_object(**kwargs)
+
+    monkeypatch.setattr(s3, "put_object", failing_put)
+    records = [sqs_record("old", json.dumps({"productId": "P1"}), 60), sqs_record("new", json.dumps({"productId": "P2"}), time.time())]
+    response = service.receive_message_from_sqs({"Records": records}, None)
+    assert response == {"batchItemFailures": [{"itemIdentifier": "old"}]}
+
+
+def test_bulk_create_reports_bad_products_without_failing_the_rest(service):
+    body = [{"productId": "A", "price": 1.5, "quantity": "3"}, {"productId": "B", "quantity": "many"},
+            {"productId": "C", "blob": "x" * 500 * 1024}, {"price": 1}]
+    response = service.create_one_product({"body": json.dumps(body)}, None)
+    results = json.loads(response["body"])["results"]
+    assert response["statusCode"] == 207
+    assert [result["status"] for result in results] == ["created", "invalid", "invalid", "invalid"]
+    assert service.store.get_product("A")["quantity"] == Decimal(3)
+    assert service.store.get_product("B") is None
+
+
+def test_single_create_validates_numbers(service):
+    response = service.create_one_product({"body": json.dumps({"productId": "A", "price": "NaN"})}, None)
+    assert response["statusCode"] == 400
+    assert service.store.get_product("A") is None
+
+
+@pytest.mark.parametrize("quantity", ["NaN", "Infinity", "-Infinity", "sNaN", "ten"])
+def test_stock_change_must_be_a_finite_number(service, quantity):
+    service.store.put_product({"productId": "A", "quantity": Decimal(5), "current_stock": Decimal(5)})
+    event = {"pathParameters": {"productId": "A"}, "body": json.dumps({"quantity": quantity})}
+    response = service.add_stocks_to_product(event, None)
+    assert response["statusCode"] == 400
+    assert service.store.get_product("A")["quantity"] == Decimal(5)
+
+
+def test_order_that_keeps_conflicting_gets_409(service, monkeypatch):
+    def conflicted(adjustments):
+        raise InventoryAdjustmentError(adjustments[0][0], TRANSACTION_CONFLICT)
+
+    monkeypatch.setattr(service.store, "adjust_inventory", conflicted)
+    response = service.create_order({"body": json.dumps({"cart": [{"productId": "A", "quantity": 1}]})}, None)
+    assert response["statusCode"] == 409
+    assert response["headers"]["Retry-After"] == "1"
+
+
+@pytest.mark.parametrize("product_id", [{"id": "A"}, ["A"], 7, ""])
+def test_order_lines_need_a_string_product_id(service, product_id):
+    service.store.put_product({"productId": "A", "quantity": Decimal(5), "current_stock": Decimal(5)})
+    cart = [{"productId": "A", "quantity": 1}, {"productId": product_id, "quantity": 1}]
+    response = service.create_order({"body": json.dumps({"cart": cart})}, None)
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["line"] == 1
+    assert service.store.get_product("A")["quantity"] == Decimal(5)
+
+
+@pytest.mark.parametrize("quantity", ["lots", None, True, "NaN"])
+def test_update_refuses_a_quantity_that_is_not_a_number(service, quantity):
+    # Regression: on an indexed product DynamoDB refused the write, which came back as a 500
+    service.store.put_product({"productId": "A", "quantity": Decimal(5), "stock_shard": "0"})
+    event = {"pathParameters": {"productId": "A"}, "body": json.dumps({"quantity": quantity})}
+    assert service.update_one_product(event, None)["statusCode"] == 400
+    assert service.store.get_product("A")["quantity"] == Decimal(5)
+
+
+def test_update_stores_numeric_strings_as_numbers(service):
+    service.store.put_product({"productId": "A", "quantity": Decimal(5), "stock_shard": "0"})
+    event = {"pathParameters": {"productId": "A"}, "body": json.dumps({"quantity": "7", "color": "red"})}
+    assert service.update_one_product(event, None)["statusCode"] == 200
+    assert service.store.get_product("A")["quantity"] == Decimal(7)
+
+
+def test_lowest_quantity_scan_ranks_only_numeric_quantities(service, monkeypatch):
+    service.store.put_products([{"productId": "A", "quantity": Decimal(3)}, {"productId": "B"},
+                                {"productId": "C", "quantity": "1"}, {"productId": "D", "quantity": Decimal(2)}])
+
+    def index_missing(k):
+        raise botocore.exceptions.ClientError({"Error": {"Code": "ValidationException", "Message": "no index"}}, "Query")
+
+    monkeypatch.setattr(service.store, "lowest_stock", index_missing)
+    body = json.loads(service.get_lowest_quantity({"queryStringParameters": {"k": "5"}}, None)["body"])
+    assert [item["productId"] for item in body["items"]] == ["D", "A"]
+
+
+def test_reconcile_continues_past_a_failing_product(service, monkeypatch):
+    for product_id in ("A", "B", "C"):
+        service.store.put_product({"productId": product_id, "quantity": "4"})
+    backfill = service.store.backfill_stock_shard
+
+    def rejecting_backfill(product_id):
+        if product_id == "B":
+            raise botocore.exceptions.ClientError({"Error": {"Code": "ValidationException", "Message": "type"}}, "UpdateItem")
+        return backfill(product_id)
+
+    monkeypatch.setattr(service.store, "backfill_stock_shard", rejecting_backfill)
+    summary = json.loads(service.reconcile_current_stock({}, None)["body"])
+    assert (summary["checked"], summary["converted"], summary["errors"]) == (3, 3, 1)
+    assert service.store.get_product("C")["quantity"] == Decimal(4)
+
+
+@pytest.fixture
+def snapshot_service(service, monkeypatch):
+    monkeypatch.setattr(product_gateway, "CATALOG_SNAPSHOT_BUCKET", "catalog")
+    monkeypatch.setattr(product_gateway, "_product_service", service)
+    monkeypatch.setattr("models.catalog_snapshot.time.sleep", lambda seconds: None)
+    return service
+
+
+def stream_record(product_id, quantity):
+    return {"eventName": "MODIFY", "dynamodb": {"Keys": {"productId": {"S": product_id}},
+                                                "NewImage": {"productId": {"S": product_id},
+                                                             "quantity": {"N": str(quantity)}}}}
+
+
+def test_stream_batch_that_loses_every_race_is_retried(snapshot_service, s3, monkeypatch):
+    # Regression: the batch has to fail so Lambda retries it, not be dropped
+    snapshot_service.catalog_snapshot.rebuild([])
+
+    def losing_put(**kwargs):
+        raise botocore.exceptions.ClientError({"Error": {"Code": "PreconditionFailed", "Message": ""}}, "PutObject")
+
+    monkeypatch.setattr(s3, "put_object", losing_put)
+    with pytest.raises(RuntimeError):
+        product_gateway.sync_catalog_snapshot({"Records": [stream_record("A", 1)]}, None)
+
+
+def test_scheduled_rebuild_repairs_a_stale_snapshot(snapshot_service):
+    snapshot_service.store.put_products([{"productId": "A", "quantity": Decimal(1)},
+                                         {"productId": "B", "quantity": Decimal(2)}])
+    snapshot_service.catalog_snapshot.rebuild([{"productId": "A", "quantity": Decimal(1)}])
+    summary = json.loads(product_gateway.rebuild_catalog_snapshot({}, None)["body"])
+    assert (summary["version"], summary["count"]) == (2, 2)
+    body = json.loads(snapshot_service.get_all_products({"headers": {}}, None)["body"])
+    assert body["version"] == 2
+    assert [item["productId"] for item in body["items"]] == ["A", "B"]
@@ -0,0 +1,62 @@
+import io
+import pytest
+from utils.s3_stream import iter_s3_lines, read_first_line
+from utils.job_checkpoint import plan_byte_ranges
+
+
+class RangeS3:
+    """Serves one object, honouring Range: bytes=N- and bytes=N-M"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        data = self.data
+        if Range:
+            first, _, last = Range[len("bytes="):].partition("-")
+            data = data[int(first):int(last) + 1 if last else None]
+        return {"Body": io.BytesIO(data)}
+
+
+DATA = b"id,name\nP1,alpha\nP2,beta\n\nP3,gamma\nP4,delta"
+
+
+def lines_in(s3, start, end, chunk_size=4):
+    return [line for line, _ in iter_s3_lines(s3, "b", "k", start, end, chunk_size=chunk_size)]
+
+
+def test_whole_object():
+    s3 = RangeS3(DATA)
+    assert lines_in(s3, 0, None) == DATA.splitlines(keepends=True)
+
+
+@pytest.mark.parametrize("split", range(1, len(DATA)))
+def test_adjacent_ranges_split_every_line_once(split):
+    # Wherever the boundary falls, the two ranges together yield each line exactly once
+    s3 = RangeS3(DATA)
+    assert lines_in(s3, 0, split) + lines_in(s3, split, len(DATA)) == DATA.splitlines(keepends=True)
+
+
+def test_planned_ranges_cover_the_file_once():
+    s3 = RangeS3(DATA)
+    lines = []
+    for start, end in plan_byte_ranges(8, len(DATA), range_bytes=7):
+        lines.extend(lines_in(s3, start, end, chunk_size=3))
+    assert lines == DATA.splitlines(keepends=True)[1:]
+
+
+def test_next_offset_resumes_after_the_line():
+    s3 = RangeS3(DATA)
+    line, next_offset = next(iter_s3_lines(s3, "b", "k", 8))
+    assert line == b"P1,alpha\n"
+    assert lines_in(s3, next_offset, None)[0] == b"P2,beta\n"
+
+
+def test_read_first_line_strips_bom():
+    s3 = RangeS3(b"\xef\xbb\xbfid,name\nP1,alpha\n")
+    assert read_first_line(s3, "b", "k") == ("id,name\n", 11)
+
+
+def test_plan_byte_ranges():
+    assert plan_byte_ranges(10, 35, 10) == [(10, 20), (20, 30), (30, 35)]
+    assert plan_byte_ranges(10, 10, 10) == [(10, 10)]
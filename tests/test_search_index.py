@@ -0,0 +1,66 @@
+from utils.search_index import SearchIndex, edit_distance, max_typos
+
+CATALOG = [
+    {"productId": "P1", "product_name": "Trail Running Shoe", "brand_name": "Acme"},
+    {"productId": "P2", "product_name": "Running Shoe Pro 2", "brand_name": "Zoom"},
+    {"productId": "P3", "product_name": "Rain Jacket", "brand_name": "Runner Co"},
+    {"productId": "P4", "product_name": "Shoelace", "brand_name": "Acme"},
+    {"productId": "P5", "product_name": "Model 42 Tent", "brand_name": "Camp"},
+]
+
+
+def ids(results):
+    return [product["productId"] for _, product in results]
+
+
+def test_exact_beats_prefix_beats_typo():
+    index = SearchIndex(CATALOG)
+    results = index.search("shoe")
+    # "shoe" exactly in two names, as a prefix of "shoelace" in one
+    assert ids(results) == ["P1", "P2", "P4"]
+    assert results[0][0] > results[2][0]
+
+    # One typo allowed from 4 letters; a typo match scores below a prefix
+    typo = index.search("shoo")
+    assert ids(typo) == ["P1", "P2"]
+    assert typo[0][0] < results[2][0]
+    assert ids(index.search("jackte")) == ["P3"]
+
+
+def test_name_outweighs_brand():
+    # "runn" prefixes "running" in names (weight 2) and "runner" in a brand (weight 1)
+    results = SearchIndex(CATALOG).search("runn")
+    assert ids(results)[-1] == "P3"
+    assert results[0][0] == 2 * results[-1][0]
+
+
+def test_every_token_must_match():
+    index = SearchIndex(CATALOG)
+    assert ids(index.search("running pro")) == ["P2"]
+    assert index.search("running jacket") == []
+
+
+def test_tokens_with_digits_need_exact_or_prefix_matches():
+    index = SearchIndex(CATALOG)
+    assert ids(index.search("model 4")) == ["P5"]
+    assert index.search("model 43") == []
+    assert max_typos("x42") == 0
+
+
+def test_ties_prefer_shorter_names():
+    items = [
+        {"productId": "long", "product_name": "Lamp with a very long name"},
+        {"productId": "short", "product_name": "Lamp"},
+    ]
+    assert ids(SearchIndex(items).search("lamp")) == ["short", "long"]
+
+
+def test_limit_and_empty_query():
+    index = SearchIndex(CATALOG)
+    assert len(index.search("shoe", limit=1)) == 1
+    assert index.search("  !! ") == []
+
+
+def test_edit_distance_counts_transpositions_once():
+    assert edit_distance("jacket", "jakcet", 2) == 1
+    assert edit_distance("jacket", "packets", 1) == 2
@@ -0,0 +1,174 @@
+from decimal import Decimal
+import pytest
+from models.product_store import (
+    InventoryAdjustmentError, ProductStore, PRODUCT_NOT_FOUND, INSUFFICIENT_STOCK, INVALID_QUANTITY
+)
+from models.sqlite_product_store import SQLiteProductStore, encode_item
+from utils.pagination import encode_cursor, decode_cursor
+from utils.stock_index import stock_shard
+
+
+def product(product_id, quantity, **extra):
+    return {"productId": product_id, "product_name": f"Product {product_id}", "quantity": Decimal(quantity),
+            "current_stock": Decimal(0), "stock_shard": stock_shard(product_id), **extra}
+
+
+@pytest.fixture
+def store():
+    store = SQLiteProductStore()
+    store.put_products([product(f"P{i}", i * 10) for i in range(1, 6)])
+    yield store
+    store.close()
+
+
+def write_ledger_row(store, product_id, quantity, datetime):
+    """A ledger row written before current_stock existed"""
+    item = {"productId": product_id, "datetime": datetime, "quantity": Decimal(quantity), "remarks": "legacy"}
+    with store._transaction() as db:
+        db.execute("INSERT INTO inventory (productId, datetime, quantity, item) VALUES (?, ?, ?, ?)",
+                   (product_id, datetime, str(quantity), encode_item(item)))
+
+
+def test_is_a_product_store(store):
+    assert isinstance(store, ProductStore)
+
+
+def test_items_keep_their_types(store):
+    store.put_product({"productId": "X", "price": Decimal("19.99"), "tags": {"a", "b"}, "dims": {"w": Decimal(2)}})
+    assert store.get_product("X") == {"productId": "X", "price": Decimal("19.99"), "tags": {"a", "b"},
+                                      "dims": {"w": Decimal(2)}}
+    assert store.get_product("X", fields=["price", "nope"]) == {"price": Decimal("19.99")}
+    assert store.get_product("missing") is None
+
+
+def test_get_products_reports_found_items_only(store):
+    items, unprocessed = store.get_products(["P2", "missing", "P1", "P2"], fields=["quantity"])
+    assert sorted(items, key=lambda item: item["productId"]) == [
+        {"productId": "P1", "quantity": Decimal(10)}, {"productId": "P2", "quantity": Decimal(20)}
+    ]
+    assert unprocessed == []
+
+
+def test_scan_pages_through_every_product_once(store):
+    seen, start_key = [], None
+    while True:
+        items, last_key = store.scan_page(2, start_key, fields=["productId"])
+        seen.extend(item["productId"] for item in items)
+        if last_key is None:
+            break
+        # Keys survive the API's cursor encoding
+        start_key = decode_cursor(encode_cursor(last_key))
+    assert seen == ["P1", "P2", "P3", "P4", "P5"]
+
+
+def test_invalid_cursor_is_a_value_error(store):
+    with pytest.raises(ValueError):
+        store.scan_page(2, {"productId": 5})
+
+
+def test_update_returns_the_whole_item(store):
+    updated = store.update_product("P1", {"price": Decimal("2.50")})
+    assert updated["price"] == Decimal("2.50") and updated["quantity"] == Decimal(10)
+    assert store.update_product("NEW", {"price": Decimal(1)}) == {"productId": "NEW", "price": Decimal(1)}
+    with pytest.raises(ValueError):
+        store.update_product("P1", {"productId": "P9"})
+
+
+def test_deletes(store):
+    store.delete_product("P1")
+    summary = store.delete_products([{"productId": "P2"}, {"productId": "missing"}])
+    assert summary["written"] == 2
+    assert [item["productId"] for item in store.scan_products()] == ["P3", "P4", "P5"]
+
+
+def test_lookups_by_name_and_lowest_stock(store):
+    store.put_product({"productId": "UNINDEXED", "quantity": Decimal(0)})
+    assert [item["productId"] for item in store.query_products_by_name("Product P3")] == ["P3"]
+    assert store.lowest_stock(2) == [
+        {"productId": "P1", "product_name": "Product P1", "quantity": Decimal(10)},
+        {"productId": "P2", "product_name": "Product P2", "quantity": Decimal(20)},
+    ]
+    assert store.backfill_stock_shard("UNINDEXED") is True
+    assert store.lowest_stock(1)[0]["productId"] == "UNINDEXED"
+    assert store.backfill_stock_shard("missing") is False
+
+
+def test_set_current_stock_is_conditional(store):
+    store.put_product({"productId": "X"})
+    assert store.set_current_stock("X", Decimal(4)) is True
+    assert store.set_current_stock("X", Decimal(5)) is False
+    assert store.set_current_stock("X", Decimal(5), expected=Decimal(3)) is False
+    assert store.set_current_stock("X", Decimal(5), expected=Decimal(4)) is True
+    assert store.set_current_stock("missing", Decimal(1)) is False
+    assert store.get_product("X")["current_stock"] == Decimal(5)
+
+
+def test_adjust_inventory_writes_product_and_ledger(store):
+    ledger = store.adjust_inventory([("P1", Decimal(-4), "sold"), ("P2", Decimal(5), "restock")])
+    assert [row["quantity"] for row in ledger] == [Decimal(-4), Decimal(5)]
+    assert store.get_product("P1")["quantity"] == Decimal(6)
+    assert store.get_product("P1")["current_stock"] == Decimal(-4)
+    assert store.sum_inventory("P2") == Decimal(5)
+
+
+@pytest.mark.parametrize("adjustments, product_id, reason", [
+    ([("P1", Decimal(-1), ""), ("missing", Decimal(1), "")], "missing", PRODUCT_NOT_FOUND),
+    ([("P2", Decimal(1), ""), ("P1", Decimal(-11), "")], "P1", INSUFFICIENT_STOCK),
+])
+def test_refused_adjustments_write_nothing(store, adjustments, product_id, reason):
+    with pytest.raises(InventoryAdjustmentError) as refused:
+        store.adjust_inventory(adjustments)
+    assert (refused.value.product_id, refused.value.reason) == (product_id, reason)
+    assert store.get_product("P2")["quantity"] == Decimal(20)
+    assert store.sum_inventory("P2") == 0
+
+
+def test_a_product_is_adjusted_once_per_transaction(store):
+    with pytest.raises(ValueError):
+        store.adjust_inventory([("P1", Decimal(1), ""), ("P1", Decimal(1), "")])
+
+
+def test_missing_current_stock_is_seeded_from_the_ledger(store):
+    # Regression: the first adjustment used to set current_stock to just its delta
+    store.put_product({"productId": "OLD", "quantity": Decimal(7)})
+    write_ledger_row(store, "OLD", 7, "2024-01-01T00:00:00")
+    store.adjust_inventory([("OLD", Decimal(3), "restock")])
+    assert store.get_product("OLD")["current_stock"] == Decimal(10)
+    assert store.sum_inventory("OLD") == Decimal(10)
+
+
+def test_legacy_string_quantities(store):
+    store.put_product({"productId": "CSV", "quantity": "12", "current_stock": Decimal(0)})
+    store.adjust_inventory([("CSV", Decimal(-2), "sold")])
+    assert store.get_product("CSV")["quantity"] == Decimal(10)
+
+    store.put_product({"productId": "BAD", "quantity": "lots", "current_stock": Decimal(0)})
+    with pytest.raises(InventoryAdjustmentError) as refused:
+        store.adjust_inventory([("BAD", Decimal(1), "")])
+    assert refused.value.reason == INVALID_QUANTITY
+
+    store.put_product({"productId": "CSV2", "quantity": "5"})
+    assert store.convert_legacy_quantity("CSV2", "4") is False
+    assert store.convert_legacy_quantity("CSV2", "5") is True
+    assert store.get_product("CSV2")["quantity"] == Decimal(5)
+    assert store.convert_legacy_quantity("BAD", "lots") is False
+
+
+def test_query_inventory_ranges_and_pages(store):
+    for day in range(1, 6):
+        write_ledger_row(store, "P1", day, f"2025-01-0{day}T12:00:00")
+    write_ledger_row(store, "P2", 1, "2025-01-03T12:00:00")
+
+    items, last_key = store.query_inventory("P1", limit=2)
+    assert [item["quantity"] for item in items] == [Decimal(5), Decimal(4)]
+    items, last_key = store.query_inventory("P1", limit=2, start_key=last_key)
+    assert [item["quantity"] for item in items] == [Decimal(3), Decimal(2)]
+    items, last_key = store.query_inventory("P1", limit=2, start_key=last_key)
+    assert [item["quantity"] for item in items] == [Decimal(1)] and last_key is None
+
+    items, _ = store.query_inventory("P1", since="2025-01-02", until="2025-01-03\uffff", newest_first=False)
+    assert [item["quantity"] for item in items] == [Decimal(2), Decimal(3)]
+    assert store.sum_inventory("P1") == Decimal(15)
+
+    with pytest.raises(ValueError):
+        store.query_inventory("P1", start_key={"productId": "P2", "datetime": "2025"})
@@ -0,0 +1,57 @@
+import time
+import pytest
+from benchmarks.fakes import FakeEventBridge, FakeCloudWatchLogs
+from utils.telemetry import TelemetryBuffer
+
+
+@pytest.fixture
+def buffer():
+    buffer = TelemetryBuffer(mode="background", linger=5.0)
+    buffer._events_client = FakeEventBridge()
+    buffer._logs_client = FakeCloudWatchLogs()
+    return buffer
+
+
+def entry(i):
+    return {"Source": "test", "DetailType": "t", "Detail": f'{{"i": {i}}}', "EventBusName": "default"}
+
+
+def test_flush_does_not_wait_out_the_linger(buffer):
+    # Regression: the worker slept for the whole linger before draining, so
+    # every invocation that queued telemetry ended ~50 ms late
+    for i in range(25):
+        buffer.put_event(entry(i))
+    buffer.put_log("group", "stream", "hello")
+    started = time.monotonic()
+    buffer.flush(timeout=2.0)
+    assert time.monotonic() - started < 0.5
+    assert buffer.events_client.events == 25
+    assert buffer.logs_client.log_events == 1
+
+
+def test_background_worker_batches_until_the_linger_ends():
+    buffer = TelemetryBuffer(mode="background", linger=0.05)
+    buffer._events_client = FakeEventBridge()
+    for i in range(3):
+        buffer.put_event(entry(i))
+    assert buffer.events_client.events == 0
+    time.sleep(0.3)
+    assert buffer.events_client.events == 3
+
+
+def test_repeated_flushes_stay_fast(buffer):
+    started = time.monotonic()
+    for i in range(20):
+        buffer.put_event(entry(i))
+        buffer.flush(timeout=2.0)
+    assert time.monotonic() - started < 0.5
+    assert buffer.events_client.events == 20
+
+
+def test_deferred_mode_sends_nothing_until_flush():
+    buffer = TelemetryBuffer(mode="deferred")
+    buffer._events_client = FakeEventBridge()
+    buffer.put_event(entry(0))
+    assert buffer.events_client.events == 0
+    buffer.flush()
+    assert buffer.events_client.events == 1
@@ -0,0 +1,50 @@
+import pytest
+from utils import ttl_cache
+from utils.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_hit_miss_and_expiry(clock):
+    cache = TTLCache(ttl=10)
+    assert cache.lookup("a") == (False, None)
+    cache.set("a", 1)
+    assert cache.lookup("a") == (True, 1)
+    clock[0] += 10
+    assert cache.lookup("a") == (False, None)
+    assert cache.stats()["expired"] == 1
+
+
+def test_none_is_cached_for_negative_ttl(clock):
+    cache = TTLCache(ttl=30, negative_ttl=5)
+    cache.set("missing", None)
+    assert cache.lookup("missing") == (True, None)
+    clock[0] += 5
+    assert cache.lookup("missing") == (False, None)
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.lookup("a")
+    cache.set("c", 3)
+    assert cache.lookup("b") == (False, None)
+    assert cache.lookup("a") == (True, 1)
+    assert cache.stats()["evicted"] == 1
+
+
+def test_invalidate_and_stats(clock):
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.lookup("a")
+    cache.invalidate("a")
+    cache.lookup("a")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 0)
+    assert stats["hit_ratio"] == 0.5
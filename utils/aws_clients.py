@@ -0,0 +1,104 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+from utils.startup_profiler import timed_init
+from utils.metrics import instrument_client, register_counters
+
+DEFAULT_REGION = "us-east-2"
+
+# One botocore Config shared by every client and resource in the container.
+# The pool has to be at least as large as the parallel scan / writer thread
+# pools, otherwise threads queue up waiting for a connection.
+CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.environ.get("AWS_MAX_POOL_CONNECTIONS", "50")),
+    tcp_keepalive=True,
+    retries={
+        "mode": os.environ.get("AWS_RETRY_MODE", "standard"),
+        "max_attempts": int(os.environ.get("AWS_MAX_ATTEMPTS", "3"))
+    },
+    connect_timeout=float(os.environ.get("AWS_CONNECT_TIMEOUT", "2")),
+    read_timeout=float(os.environ.get("AWS_READ_TIMEOUT", "10"))
+)
+
+_lock = threading.Lock()
+_clients = {}
+_resources = {}
+_counters = {"clients_created": 0, "clients_reused": 0, "resources_created": 0, "resources_reused": 0}
+
+
+def get_client(service_name, region_name=DEFAULT_REGION):
+    """Return the shared boto3 client for a service/region, creating it on first use"""
+    key = (service_name, region_name)
+    with _lock:
+        if key in _clients:
+            _counters["clients_reused"] += 1
+        else:
+            with timed_init(f"{service_name}_client"):
+                _clients[key] = instrument_client(
+                    boto3.client(service_name, region_name=region_name, config=CLIENT_CONFIG)
+                )
+            _counters["clients_created"] += 1
+        return _clients[key]
+
+
+def get_resource(service_name, region_name=DEFAULT_REGION):
+    """Return the shared boto3 resource for a service/region, creating it on first use"""
+    key = (service_name, region_name)
+    with _lock:
+        if key in _resources:
+            _counters["resources_reused"] += 1
+        else:
+            with timed_init(f"{service_name}_resource"):
+                _resources[key] = boto3.resource(service_name, region_name=region_name, config=CLIENT_CONFIG)
+                instrument_client(_resources[key].meta.client)
+            _counters["resources_created"] += 1
+        return _resources[key]
+
+
+def set_client(service_name, client, region_name=DEFAULT_REGION):
+    """Install the client get_client returns for a service/region (benchmarks use it for local stand-ins)"""
+    with _lock:
+        _clients[(service_name, region_name)] = client
+
+
+def _connection_pools(client):
+    """Yield the urllib3 connection pools behind a botocore client"""
+    http_session = getattr(getattr(client, "_endpoint", None), "http_session", None)
+    managers = [getattr(http_session, "_manager", None)]
+    managers.extend(getattr(http_session, "_proxy_managers", {}).values())
+    for manager in managers:
+        pools = getattr(manager, "pools", None)
+        if pools is None:
+            continue
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is not None:
+                yield pool
+
+
+def registry_stats():
+    """
+    Counters for client reuse and HTTP connection reuse in this container.
+
+    connections_reused is the number of requests that went out on an
+    already-open connection (requests minus connections opened).
+    """
+    with _lock:
+        stats = dict(_counters)
+        clients = list(_clients.values()) + [r.meta.client for r in _resources.values()]
+
+    opened = requests = 0
+    for client in clients:
+        for pool in _connection_pools(client):
+            opened += getattr(pool, "num_connections", 0)
+            requests += getattr(pool, "num_requests", 0)
+
+    stats["connections_opened"] = opened
+    stats["requests_sent"] = requests
+    stats["connections_reused"] = max(0, requests - opened)
+    return stats
+
+
+# Reported with every invocation's metrics, so reuse shows up in CloudWatch
+register_counters("AwsClients", registry_stats)
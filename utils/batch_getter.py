@@ -0,0 +1,108 @@
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import botocore.exceptions
+
+logger = logging.getLogger()
+
+# BatchGetItem accepts at most 100 keys per call
+MAX_BATCH_KEYS = 100
+
+
+class ParallelBatchGetter:
+    """
+    Fetch items by key with BatchGetItem.
+
+    Keys are split into 100-key chunks that are all requested at once from
+    a thread pool, so a lookup costs about one round trip however many keys
+    it has. Unprocessed keys are retried with exponential backoff; keys
+    still unprocessed after max_retries are returned separately so the
+    caller can tell them apart from keys that don't exist.
+    """
+
+    def __init__(self, dynamodb, table_name, key_names=("productId",), max_workers=8,
+                 max_retries=5, base_delay=0.05):
+        """
+        Args:
+            dynamodb: boto3 DynamoDB service resource
+            table_name (str): Table to read from
+            key_names (tuple): Primary key attribute names
+            max_workers (int): Most chunks requested concurrently
+            max_retries (int): Attempts for unprocessed keys before giving up
+            base_delay (float): First backoff delay in seconds
+        """
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.key_names = key_names
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+
+    def get_items(self, keys, projection=None, attribute_names=None):
+        """
+        Fetch every key. `projection`/`attribute_names` are passed through as
+        ProjectionExpression/ExpressionAttributeNames; the key attributes
+        are always added so results can be matched to keys.
+
+        Returns:
+            tuple: (items found, keys left unprocessed)
+        """
+        keys = list({self._key_tuple(key): key for key in keys}.values())
+        if not keys:
+            return [], []
+
+        request = {}
+        if projection:
+            attribute_names = dict(attribute_names or {})
+            projected = set(attribute_names.values())
+            expression = [projection]
+            for i, name in enumerate(self.key_names):
+                if name not in projected:
+                    attribute_names[f"#k{i}"] = name
+                    expression.append(f"#k{i}")
+            request["ProjectionExpression"] = ", ".join(expression)
+            request["ExpressionAttributeNames"] = attribute_names
+
+        chunks = [keys[i:i + MAX_BATCH_KEYS] for i in range(0, len(keys), MAX_BATCH_KEYS)]
+        if len(chunks) == 1:
+            results = [self._get_chunk(chunks[0], request)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+                results = list(executor.map(lambda chunk: self._get_chunk(chunk, request), chunks))
+
+        items, unprocessed = [], []
+        for chunk_items, chunk_unprocessed in results:
+            items.extend(chunk_items)
+            unprocessed.extend(chunk_unprocessed)
+        return items, unprocessed
+
+    def _key_tuple(self, item):
+        return tuple(item.get(name) for name in self.key_names)
+
+    def _get_chunk(self, keys, request):
+        """Fetch one chunk, retrying unprocessed keys. Returns (items, unprocessed keys)."""
+        items = []
+        pending = keys
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                # Full jitter keeps parallel chunks from retrying in lockstep
+                time.sleep(random.uniform(0, self.base_delay * (2 ** attempt)))
+
+            try:
+                response = self.dynamodb.batch_get_item(
+                    RequestItems={self.table_name: {**request, "Keys": pending}}
+                )
+            except botocore.exceptions.ClientError as e:
+                if e.response["Error"]["Code"] in ("ProvisionedThroughputExceededException", "ThrottlingException"):
+                    continue
+                raise
+
+            items.extend(response.get("Responses", {}).get(self.table_name, []))
+            pending = response.get("UnprocessedKeys", {}).get(self.table_name, {}).get("Keys", [])
+            if not pending:
+                return items, []
+
+        logger.warning("BatchGetItem left %d key(s) unprocessed after %d retries", len(pending), self.max_retries)
+        return items, pending
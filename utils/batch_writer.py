@@ -0,0 +1,143 @@
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import botocore.exceptions
+
+logger = logging.getLogger()
+
+# BatchWriteItem accepts at most 25 put/delete requests per call
+MAX_BATCH_SIZE = 25
+
+
+def default_writer_count():
+    """Number of concurrent BatchWriteItem writers, from BULK_WRITERS (default 4)"""
+    return max(1, int(os.environ.get("BULK_WRITERS", "4")))
+
+
+class ParallelBatchWriter:
+    """
+    Stream put/delete requests into 25-item BatchWriteItem calls spread
+    over a small pool of writer threads.
+
+    Unprocessed items are retried with exponential backoff; whatever is
+    still unprocessed after max_retries is counted as failed. Requests for
+    the same key inside one batch are collapsed (last one wins), since
+    BatchWriteItem rejects duplicate keys in a call.
+    """
+
+    def __init__(self, dynamodb, table_name, key_names=("productId",), max_workers=None,
+                 max_retries=5, base_delay=0.05):
+        """
+        Args:
+            dynamodb: boto3 DynamoDB service resource
+            table_name (str): Table to write to
+            key_names (tuple): Primary key attribute names, used to de-duplicate batches
+            max_workers (int): Concurrent writer threads, defaults to BULK_WRITERS
+            max_retries (int): Attempts for unprocessed items before giving up
+            base_delay (float): First backoff delay in seconds
+        """
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.key_names = key_names
+        self.max_workers = max_workers or default_writer_count()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+
+    def put_items(self, items, failed_keys=None):
+        """
+        Write every item from an iterable. Returns the summary dict.
+        Keys of items that could not be written are appended to failed_keys if given.
+        """
+        return self._run((({"PutRequest": {"Item": item}}, item) for item in items), failed_keys)
+
+    def delete_keys(self, keys, failed_keys=None):
+        """
+        Delete every key from an iterable. Returns the summary dict.
+        Keys that could not be deleted are appended to failed_keys if given.
+        """
+        return self._run((({"DeleteRequest": {"Key": key}}, key) for key in keys), failed_keys)
+
+    def _run(self, requests, failed_keys=None):
+        summary = {"rows": 0, "written": 0, "retried": 0, "failed": 0}
+        max_pending = self.max_workers * 2
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            for batch in self._batches(requests, summary):
+                # Bound the number of queued batches so memory stays flat for huge files
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._collect(done, summary, failed_keys)
+                pending.add(executor.submit(self._write_batch, batch))
+
+            done, _ = wait(pending)
+            self._collect(done, summary, failed_keys)
+
+        return summary
+
+    def _batches(self, requests, summary):
+        batch = {}
+        for request, item in requests:
+            summary["rows"] += 1
+            batch[tuple(item.get(name) for name in self.key_names)] = request
+            if len(batch) == MAX_BATCH_SIZE:
+                yield list(batch.values())
+                batch = {}
+        if batch:
+            yield list(batch.values())
+
+    def _collect(self, futures, summary, failed_keys):
+        for future in futures:
+            written, retried, unprocessed = future.result()
+            summary["written"] += written
+            summary["retried"] += retried
+            summary["failed"] += len(unprocessed)
+            if failed_keys is not None:
+                failed_keys.extend(self._request_key(request) for request in unprocessed)
+
+    def _request_key(self, request):
+        if "PutRequest" in request:
+            item = request["PutRequest"]["Item"]
+        else:
+            item = request["DeleteRequest"]["Key"]
+        return {name: item.get(name) for name in self.key_names}
+
+    def _write_batch(self, batch):
+        """Write one batch, retrying unprocessed items. Returns (written, retried, unprocessed requests)."""
+        retried = 0
+        unprocessed = batch
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                retried += len(unprocessed)
+                # Full jitter keeps parallel writers from retrying in lockstep
+                time.sleep(random.uniform(0, self.base_delay * (2 ** attempt)))
+
+            try:
+                response = self.dynamodb.batch_write_item(RequestItems={self.table_name: unprocessed})
+            except botocore.exceptions.ClientError as e:
+                if e.response["Error"]["Code"] in ("ProvisionedThroughputExceededException", "ThrottlingException"):
+                    continue
+                if e.response["Error"]["Code"] == "ValidationException" and len(unprocessed) > 1:
+                    # One bad item fails the whole call; write the rest one by one so only it fails
+                    logger.warning("BatchWriteItem rejected %d item(s), writing them one by one: %s", len(unprocessed), e)
+                    return self._write_individually(batch, unprocessed, retried)
+                logger.error("BatchWriteItem failed for %d item(s): %s", len(unprocessed), e)
+                break
+
+            unprocessed = response.get("UnprocessedItems", {}).get(self.table_name, [])
+            if not unprocessed:
+                return len(batch), retried, []
+
+        return len(batch) - len(unprocessed), retried, unprocessed
+
+    def _write_individually(self, batch, requests, retried):
+        """Write each request as its own batch. Returns the totals of `batch` like _write_batch."""
+        failed = []
+        for request in requests:
+            _, request_retried, unprocessed = self._write_batch([request])
+            retried += request_retried
+            failed.extend(unprocessed)
+        return len(batch) - len(failed), retried, failed
@@ -1,9 +1,9 @@
-import boto3
 import time
 import json
+from utils.aws_clients import get_client
 
 def push_product_creation_log(product_id, pid=123):
-    logs_client = boto3.client('logs', region_name='us-east-2')
+    logs_client = get_client('logs', region_name='us-east-2')
     log_group_name = "ProductCreationLogs"
     log_stream_name = "ProductCreationStream"
     
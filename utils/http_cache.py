@@ -0,0 +1,63 @@
+import hashlib
+
+# Revalidate on every use; a matching ETag makes that a bodiless 304
+DEFAULT_CACHE_CONTROL = "no-cache"
+
+
+def request_header(event, name):
+    """Case-insensitive lookup of a request header in an API Gateway event"""
+    name = name.lower()
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def content_etag(body):
+    """Strong ETag for a response body (str or bytes)"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value matches the ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def conditional_response(event, response, etag=None, cache_control=DEFAULT_CACHE_CONTROL):
+    """
+    Add ETag and Cache-Control headers to a 200 response, and turn it into
+    a 304 Not Modified if the request's If-None-Match already has it.
+
+    Args:
+        event (dict): API Gateway event
+        response (dict): Handler response with a "body"
+        etag (str): Precomputed ETag (e.g. from a version number); hashed from the body if omitted
+        cache_control (str): Cache-Control header value
+    """
+    if response.get("statusCode") != 200:
+        return response
+
+    etag = etag or content_etag(response.get("body") or "")
+    headers = dict(response.get("headers") or {})
+    headers["ETag"] = etag
+    headers["Cache-Control"] = cache_control
+
+    if etag_matches(request_header(event, "If-None-Match"), etag):
+        # A 304 carries the validators but no body or entity headers
+        headers.pop("Content-Type", None)
+        return {"statusCode": 304, "headers": headers, "body": ""}
+
+    return {**response, "headers": headers}
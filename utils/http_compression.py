@@ -0,0 +1,77 @@
+import base64
+import functools
+import gzip
+import os
+from utils.http_cache import request_header
+from utils.metrics import timed
+
+# Bodies smaller than this go out uncompressed; below about one packet the
+# gzip overhead isn't worth it
+GZIP_MIN_BYTES = int(os.environ.get("GZIP_MIN_BYTES", "1400"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "5"))
+
+
+def accepts_gzip(event):
+    """True if the request's Accept-Encoding allows gzip"""
+    accept = request_header(event, "Accept-Encoding")
+    if not accept:
+        return False
+    for part in accept.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def gzipped(response, compressed):
+    """Return response with an already gzip-compressed body"""
+    headers = dict(response.get("headers") or {})
+    headers["Content-Encoding"] = "gzip"
+    headers["Vary"] = "Accept-Encoding"
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        # The bytes differ from the identity encoding, so the validator becomes weak
+        headers["ETag"] = "W/" + etag
+    return {
+        **response,
+        "headers": headers,
+        "body": base64.b64encode(compressed).decode("ascii"),
+        "isBase64Encoded": True
+    }
+
+
+def compress_response(event, response, min_bytes=GZIP_MIN_BYTES):
+    """Gzip a response body when the client accepts it and it is large enough"""
+    body = response.get("body")
+    if (not isinstance(body, str) or response.get("isBase64Encoded")
+            or "Content-Encoding" in (response.get("headers") or {})):
+        return response
+    if len(body) < min_bytes:
+        return response
+    if not accepts_gzip(event):
+        # Shared caches must not hand this copy to clients that asked for gzip
+        return {**response, "headers": {**(response.get("headers") or {}), "Vary": "Accept-Encoding"}}
+    with timed("app.Gzip"):
+        compressed = gzip.compress(body.encode("utf-8"), compresslevel=GZIP_LEVEL, mtime=0)
+    return gzipped(response, compressed)
+
+
+def gzip_response(handler):
+    """
+    Decorator for HTTP API entry points: gzip large response bodies for
+    clients that accept it (HTTP APIs don't compress on their own).
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        response = handler(event, context)
+        if isinstance(response, dict):
+            return compress_response(event, response)
+        return response
+    return wrapper
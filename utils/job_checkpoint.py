@@ -0,0 +1,64 @@
+import hashlib
+import json
+import time
+
+# Default size of the byte range a single invocation is asked to process
+DEFAULT_RANGE_BYTES = 64 * 1024 * 1024
+
+
+def make_job_id(bucket, key, etag, upload_id=""):
+    """
+    Stable id for one upload of one object, so a retried or continued run
+    resumes instead of starting over.
+
+    Args:
+        upload_id (str): What tells uploads apart: the S3 event's sequencer,
+            versionId or eventTime. Needed because uploading identical
+            content again gives the same ETag.
+    """
+    return hashlib.sha1(f"{bucket}/{key}@{etag}#{upload_id}".encode("utf-8")).hexdigest()[:16]
+
+
+def upload_id(record):
+    """The id of the upload an S3 event notification record is about"""
+    s3_object = record.get("s3", {}).get("object", {})
+    return s3_object.get("sequencer") or s3_object.get("versionId") or record.get("eventTime", "")
+
+
+def plan_byte_ranges(start, size, range_bytes=DEFAULT_RANGE_BYTES):
+    """Split [start, size) into consecutive (start, end) byte ranges of at most range_bytes"""
+    if size <= start:
+        return [(start, size)]
+    return [(offset, min(offset + range_bytes, size)) for offset in range(start, size, range_bytes)]
+
+
+class CheckpointStore:
+    """
+    Job-state records for bulk jobs, one small JSON object per part:
+    s3://<bucket>/<prefix><job_id>/part-00000.json
+    """
+
+    def __init__(self, s3_client, bucket, prefix="_jobs/"):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, job_id, part):
+        return f"{self.prefix}{job_id}/part-{part:05d}.json"
+
+    def load(self, job_id, part):
+        """Return the saved state for a part, or None if it has never checkpointed"""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._key(job_id, part))
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response["Body"].read())
+
+    def save(self, job_id, part, state):
+        state["updated_at"] = int(time.time())
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(job_id, part),
+            Body=json.dumps(state).encode("utf-8"),
+            ContentType="application/json"
+        )
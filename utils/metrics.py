@@ -0,0 +1,245 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Set METRICS_ENABLED=0 to turn the instrumentation off entirely
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "ProductService")
+
+# DynamoDB operations that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = frozenset({
+    "GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan",
+    "BatchGetItem", "BatchWriteItem", "TransactGetItems", "TransactWriteItems"
+})
+
+# EMF accepts at most 100 metrics per CloudWatchMetrics directive
+MAX_METRICS_PER_DIRECTIVE = 100
+
+# Per-operation totals, in the order they are stored, with their EMF units.
+# Calls and Latency are always emitted; the rest only when non-zero.
+FIELDS = (
+    ("Calls", "Count"),
+    ("Latency", "Milliseconds"),
+    ("Retries", "Count"),
+    ("Errors", "Count"),
+    ("ConsumedCapacity", "Count"),
+    ("RequestBytes", "Bytes"),
+    ("ResponseBytes", "Bytes"),
+)
+
+_output = sys.stdout
+
+# [prefix, callable returning cumulative counters, values at the last emit]
+_counter_sources = []
+
+
+class InvocationMetrics:
+    """Per-operation totals for one invocation; worker threads add to it too"""
+
+    def __init__(self):
+        self.operations = {}   # operation -> [calls, latency ms, retries, errors, capacity, request bytes, response bytes]
+        self._lock = threading.Lock()
+
+    def add(self, operation, latency_ms, retries=0, errors=0, capacity=0, request_bytes=0, response_bytes=0):
+        with self._lock:
+            totals = self.operations.get(operation)
+            if totals is None:
+                totals = self.operations[operation] = [0, 0.0, 0, 0, 0.0, 0, 0]
+            totals[0] += 1
+            totals[1] += latency_ms
+            totals[2] += retries
+            totals[3] += errors
+            totals[4] += capacity
+            totals[5] += request_bytes
+            totals[6] += response_bytes
+
+
+# Lambda runs one invocation at a time per container, so one recorder is
+# enough. Calls made outside an invocation (module init, a background flush
+# finishing late) are reported with the next one.
+_current = InvocationMetrics()
+
+
+def configure(enabled=None, output=None):
+    """Turn the instrumentation on/off, or send the EMF lines somewhere other than stdout"""
+    global ENABLED, _output
+    if enabled is not None:
+        ENABLED = enabled
+    if output is not None:
+        _output = output
+
+
+def register_counters(prefix, source):
+    """
+    Report how much each of source()'s cumulative counters grew during an
+    invocation, as Count metrics named "<prefix>.<counter>". Counters that
+    didn't change are left out.
+    """
+    _counter_sources.append([prefix, source, {}])
+
+
+def record(operation, latency_ms, **values):
+    """Add one timed operation to the current invocation"""
+    if ENABLED:
+        _current.add(operation, latency_ms, **values)
+
+
+class timed:
+    """Context manager timing a block of application code as one operation, e.g. timed("app.Serialize")"""
+
+    __slots__ = ("operation", "started")
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.operation, (time.perf_counter() - self.started) * 1000, errors=int(exc_type is not None))
+        return False
+
+
+def instrument_client(client):
+    """
+    Time every call a botocore client makes, recording retries and payload
+    sizes, and have DynamoDB report the capacity each call consumed.
+    The hooks only read what botocore already has; they make no calls.
+    """
+    if not ENABLED:
+        return client
+    events = client.meta.events
+    service = client.meta.service_model.service_name
+    events.register("before-call", _before_call, unique_id="metrics-before-call")
+    events.register("after-call", _after_call, unique_id="metrics-after-call")
+    events.register("after-call-error", _after_call_error, unique_id="metrics-after-call-error")
+    if service == "dynamodb":
+        # Not provide-client-params: boto3's resource handler there returns a copy of the params
+        events.register("before-parameter-build.dynamodb", _request_capacity, unique_id="metrics-capacity")
+    return client
+
+
+def _request_capacity(params, model, **kwargs):
+    if model.name in CAPACITY_OPERATIONS and "ReturnConsumedCapacity" not in params:
+        params["ReturnConsumedCapacity"] = "TOTAL"
+
+
+def _before_call(model, params, context, **kwargs):
+    body = params.get("body")
+    context["metrics_request_bytes"] = len(body) if isinstance(body, (bytes, str)) else 0
+    context["metrics_started"] = time.perf_counter()
+
+
+def _after_call(http_response, parsed, model, context, **kwargs):
+    started = context.get("metrics_started")
+    if started is None:
+        return
+    latency_ms = (time.perf_counter() - started) * 1000
+
+    response_bytes = 0
+    if http_response is not None:
+        length = http_response.headers.get("content-length")
+        if length is not None:
+            response_bytes = int(length)
+        elif http_response.raw is not None and not model.has_streaming_output:
+            # Already read for parsing; a streaming body must be left for the caller
+            response_bytes = len(http_response.content or b"")
+
+    capacity = parsed.get("ConsumedCapacity")
+    if isinstance(capacity, dict):
+        capacity = capacity.get("CapacityUnits", 0)
+    elif isinstance(capacity, list):
+        capacity = sum(table.get("CapacityUnits", 0) for table in capacity)
+
+    record(
+        f"{model.service_model.service_name}.{model.name}",
+        latency_ms,
+        retries=parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0),
+        errors=int("Error" in parsed),
+        capacity=capacity or 0,
+        request_bytes=context.get("metrics_request_bytes", 0),
+        response_bytes=response_bytes
+    )
+
+
+def _after_call_error(exception, model, context, **kwargs):
+    # Raised before any response was parsed, e.g. a connection error after all retries
+    started = context.get("metrics_started")
+    if started is not None:
+        record(f"{model.service_model.service_name}.{model.name}", (time.perf_counter() - started) * 1000, errors=1)
+
+
+def emit_metrics(handler):
+    """
+    Decorator for Lambda entry points: print one CloudWatch Embedded Metric
+    Format line per invocation with the route's duration and response size
+    and the totals of every AWS call and timed block it made, plus the
+    growth of registered counters (AWS client and connection reuse). Put
+    it outermost so the telemetry flush is included.
+    """
+    route = handler.__name__
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if not ENABLED:
+            return handler(event, context)
+
+        started = time.perf_counter()
+        response = None
+        try:
+            response = handler(event, context)
+            return response
+        finally:
+            _emit(route, event, context, response, (time.perf_counter() - started) * 1000)
+    return wrapper
+
+
+def _emit(route, event, context, response, duration_ms):
+    global _current
+    metrics, _current = _current, InvocationMetrics()
+
+    status = response.get("statusCode") if isinstance(response, dict) else None
+    body = response.get("body") if isinstance(response, dict) else None
+    document = {
+        "Route": route,
+        "Duration": round(duration_ms, 3),
+        "ResponseBytes": len(body) if isinstance(body, str) else 0,
+        # Properties: searchable in Logs Insights, not metrics
+        "StatusCode": status if status is not None else "error",
+        "RequestId": getattr(context, "aws_request_id", None),
+    }
+    if isinstance(event, dict) and "resource" in event:
+        document["Resource"] = event.get("resource")
+        document["HttpMethod"] = event.get("httpMethod")
+
+    definitions = [{"Name": "Duration", "Unit": "Milliseconds"}, {"Name": "ResponseBytes", "Unit": "Bytes"}]
+    with metrics._lock:
+        operations = sorted(metrics.operations.items())
+    for operation, totals in operations:
+        for index, (field, unit) in enumerate(FIELDS):
+            if index > 1 and not totals[index]:
+                continue
+            name = f"{operation}.{field}"
+            document[name] = round(totals[index], 3) if isinstance(totals[index], float) else totals[index]
+            definitions.append({"Name": name, "Unit": unit})
+    for entry in _counter_sources:
+        prefix, source, previous = entry
+        entry[2] = counters = source()
+        for counter, value in sorted(counters.items()):
+            if value != previous.get(counter, 0):
+                document[f"{prefix}.{counter}"] = value - previous.get(counter, 0)
+                definitions.append({"Name": f"{prefix}.{counter}", "Unit": "Count"})
+
+    document["_aws"] = {
+        "Timestamp": int(time.time() * 1000),
+        "CloudWatchMetrics": [
+            {"Namespace": NAMESPACE, "Dimensions": [["Route"]], "Metrics": definitions[i:i + MAX_METRICS_PER_DIRECTIVE]}
+            for i in range(0, len(definitions), MAX_METRICS_PER_DIRECTIVE)
+        ]
+    }
+    _output.write(json.dumps(document, separators=(",", ":"), default=str) + "\n")
+    _output.flush()
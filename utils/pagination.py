@@ -0,0 +1,74 @@
+import base64
+import json
+from utils.decimal_encoder import DecimalEncoder
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(last_evaluated_key):
+    """Turn a DynamoDB LastEvaluatedKey into an opaque, URL-safe cursor"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, cls=DecimalEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Turn a cursor produced by encode_cursor back into an ExclusiveStartKey.
+    Raises ValueError if the cursor is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(key, dict) or not key:
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE, name="limit"):
+    """
+    Parse a ?limit= value, clamping it to 1..maximum. Raises ValueError with
+    a message fit for the client if it is not a positive integer.
+    """
+    if value in (None, ""):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        limit = 0
+    if limit < 1:
+        raise ValueError(f"{name} must be an integer between 1 and {maximum}")
+    return min(limit, maximum)
+
+
+def parse_fields(fields):
+    """
+    Split a comma-separated ?fields= value into attribute names, keeping the
+    order the client asked for, without duplicates. Returns None if empty.
+    """
+    names = [f.strip() for f in (fields or "").split(",") if f.strip()]
+    return list(dict.fromkeys(names)) or None
+
+
+def projection_expression(fields):
+    """
+    Build a ProjectionExpression from a comma-separated ?fields= value.
+
+    Every attribute goes through ExpressionAttributeNames so reserved words
+    (name, datetime, ...) are safe to request.
+
+    Returns:
+        tuple: (ProjectionExpression, ExpressionAttributeNames), or (None, None)
+    """
+    names = parse_fields(fields)
+    if not names:
+        return None, None
+
+    placeholders = {f"#f{i}": name for i, name in enumerate(names)}
+    return ", ".join(placeholders), placeholders
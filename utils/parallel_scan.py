@@ -0,0 +1,75 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Upper bound on segments/threads so a single scan can't exhaust the
+# connection pool or the table's read capacity
+MAX_SEGMENTS = 16
+
+
+def default_segment_count():
+    """
+    Pick the number of scan segments for this container.
+
+    SCAN_SEGMENTS wins when set. Otherwise the count follows the Lambda
+    memory size, since Lambda hands out CPU and network bandwidth in
+    proportion to memory (128 MB -> 1 segment, 1024 MB -> 8 segments).
+    """
+    configured = os.environ.get("SCAN_SEGMENTS")
+    if configured:
+        return max(1, min(MAX_SEGMENTS, int(configured)))
+
+    memory_mb = int(os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", 128))
+    return max(1, min(MAX_SEGMENTS, memory_mb // 128))
+
+
+def scan_segment(table, **scan_kwargs):
+    """Scan a table (or one segment of it) following LastEvaluatedKey until done"""
+    items = []
+    response = table.scan(**scan_kwargs)
+    items.extend(response.get("Items", []))
+
+    # Handle pagination if data is more than 1MB
+    while "LastEvaluatedKey" in response:
+        response = table.scan(ExclusiveStartKey=response["LastEvaluatedKey"], **scan_kwargs)
+        items.extend(response.get("Items", []))
+
+    return items
+
+
+class ParallelScanner:
+    """Scan a DynamoDB table as N segments at once on a bounded thread pool"""
+
+    def __init__(self, table, segments=None, max_workers=None):
+        """
+        Args:
+            table: boto3 Table resource (or anything with a compatible scan())
+            segments (int): TotalSegments to split the table into
+            max_workers (int): Thread pool size, defaults to one thread per segment
+        """
+        self.table = table
+        self.segments = segments or default_segment_count()
+        self.max_workers = min(max_workers or self.segments, MAX_SEGMENTS)
+
+    def scan(self, **scan_kwargs):
+        """Scan every segment and return the merged list of items"""
+        if self.segments == 1:
+            return scan_segment(self.table, **scan_kwargs)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(
+                    scan_segment,
+                    self.table,
+                    Segment=segment,
+                    TotalSegments=self.segments,
+                    **scan_kwargs
+                )
+                for segment in range(self.segments)
+            ]
+
+            # Merge in segment order so results are stable between calls
+            items = []
+            for future in futures:
+                items.extend(future.result())
+
+        return items
@@ -0,0 +1,59 @@
+def iter_s3_lines(s3_client, bucket, key, start=0, end=None, chunk_size=1 << 16, **get_kwargs):
+    """
+    Yield (line, next_offset) for every line of an S3 object that starts
+    inside the byte range [start, end).
+
+    next_offset is the absolute byte offset just past the line, so it can be
+    stored as a checkpoint and passed back as `start` to resume. A line that
+    starts before `end` is returned whole even if it runs past `end`, and a
+    line that straddles `start` is left to the previous range, so adjacent
+    ranges never drop or repeat a line. Lines are split on b"\\n"; CSV
+    fields with embedded newlines are not supported.
+    """
+    # Read one byte early so we can tell whether `start` is the beginning of a line
+    read_from = max(0, start - 1)
+    if read_from:
+        get_kwargs["Range"] = f"bytes={read_from}-"
+    body = s3_client.get_object(Bucket=bucket, Key=key, **get_kwargs)["Body"]
+
+    position = read_from        # absolute offset of buffer[0]
+    skip_partial = start > 0
+    buffer = b""
+    try:
+        while True:
+            chunk = body.read(chunk_size)
+            buffer += chunk
+
+            index = 0
+            while True:
+                newline = buffer.find(b"\n", index)
+                if newline == -1:
+                    break
+                line, line_start = buffer[index:newline + 1], position + index
+                index = newline + 1
+                if skip_partial:
+                    skip_partial = False
+                    continue
+                if end is not None and line_start >= end:
+                    return
+                yield line, position + index
+
+            position += index
+            buffer = buffer[index:]
+
+            if not chunk:
+                # Last line without a trailing newline
+                if buffer and not skip_partial and (end is None or position < end):
+                    yield buffer, position + len(buffer)
+                return
+    finally:
+        body.close()
+
+
+def read_first_line(s3_client, bucket, key, max_bytes=1 << 16):
+    """Return (first line as text, offset just past it) using a small ranged GET"""
+    body = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{max_bytes - 1}")["Body"]
+    data = body.read()
+    newline = data.find(b"\n")
+    line = data if newline == -1 else data[:newline + 1]
+    return line.decode("utf-8-sig"), len(line)
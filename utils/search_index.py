@@ -0,0 +1,224 @@
+import bisect
+import heapq
+import re
+from collections import defaultdict
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# How much a query token matching in each field counts
+FIELD_WEIGHTS = {"product_name": 2.0, "brand_name": 1.0}
+
+# Score multiplier by match kind; a typo match is worth less than a prefix
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.4
+
+# Most indexed tokens one query token may expand to as a prefix ("1" could
+# otherwise pull in every number in the catalog)
+MAX_PREFIX_EXPANSIONS = 256
+
+# Attributes kept per product for the result list
+RESULT_FIELDS = ("productId", "product_name", "brand_name", "price", "quantity")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text or "").lower())
+
+
+def trigrams(token):
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_typos(token):
+    """
+    Edits tolerated for a query token: none below 4 characters or for
+    anything with digits (model numbers, sizes), 2 from 8 characters
+    """
+    if len(token) < 4 or not token.isalpha():
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance (a transposition counts as one edit),
+    or limit + 1 as soon as it is known to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SearchIndex:
+    """
+    In-memory product search over product_name and brand_name.
+
+    Built once from the catalog and kept in a warm container. Every query
+    token is matched exactly, as a prefix of an indexed token (binary
+    search over the sorted vocabulary), or within a small edit distance
+    (candidates come from a trigram index). A product must match every
+    query token; results are ranked by the summed match scores.
+    """
+
+    def __init__(self, items, version=None):
+        """
+        Args:
+            items (iterable): Product items
+            version: Identifies the catalog the index was built from
+        """
+        self.version = version
+        self.documents = []
+        postings = defaultdict(dict)   # token -> {document index: field weight}, in document order
+
+        # Documents are numbered in tie-break order (shorter names first, then
+        # catalog order), so among equal scores the lowest number wins
+        for item in sorted(items, key=lambda item: len(str(item.get("product_name") or ""))):
+            doc = len(self.documents)
+            self.documents.append({field: item[field] for field in RESULT_FIELDS if field in item})
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(item.get(field)):
+                    if postings[token].get(doc, 0) < weight:
+                        postings[token][doc] = weight
+
+        self.postings = dict(postings)
+        self.vocabulary = sorted(self.postings)
+        self.trigram_index = defaultdict(set)
+        for token in self.vocabulary:
+            for gram in trigrams(token):
+                self.trigram_index[gram].add(token)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def search(self, query, limit=20):
+        """Return up to `limit` (score, product) pairs, best first"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        if len(tokens) == 1:
+            matches = self._matching_tokens(tokens[0])
+            return [(round(score, 3), self.documents[doc]) for score, doc in self._top_for_token(matches, limit)]
+
+        # Start from the rarest token; the others only have to score the
+        # documents that are still in the running
+        token_matches = sorted(
+            (self._matching_tokens(token) for token in tokens),
+            key=lambda matches: sum(len(self.postings[candidate]) for candidate in matches)
+        )
+
+        scores = None
+        for matches in token_matches:
+            scores = self._score(matches, scores)
+            if not scores:
+                return []
+
+        best = heapq.nsmallest(limit, ((-score, doc) for doc, score in scores.items()))
+        return [(round(-score, 3), self.documents[doc]) for score, doc in best]
+
+    def _top_for_token(self, matches, limit):
+        """
+        Best `limit` (score, document) pairs for a one-token query without
+        scoring every match: score tiers are walked from the top, merging
+        the matching postings in document order, until `limit` are found.
+        A document is always reached first in its highest tier, because a
+        tier is only left once it has been exhausted.
+        """
+        kinds = set(matches.values())
+        tiers = sorted({weight * kind for weight in FIELD_WEIGHTS.values() for kind in kinds}, reverse=True)
+
+        results, seen = [], set()
+        for tier in tiers:
+            streams = [self._docs_scoring(candidate, kind, tier) for candidate, kind in matches.items()]
+            for doc in heapq.merge(*streams):
+                if doc in seen:
+                    continue
+                seen.add(doc)
+                results.append((tier, doc))
+                if len(results) == limit:
+                    return results
+        return results
+
+    def _docs_scoring(self, candidate, kind, tier):
+        """Documents, in order, where `candidate` scores exactly `tier`"""
+        for doc, weight in self.postings[candidate].items():
+            if weight * kind == tier:
+                yield doc
+
+    def _score(self, matches, scores):
+        """
+        Add one query token's best score per document to `scores`, keeping
+        only documents it matches. With scores=None every match is scored.
+        """
+        if scores is not None:
+            # Probing every candidate per document costs more than walking
+            # the candidates' postings when there are many candidates
+            postings_size = sum(len(self.postings[candidate]) for candidate in matches)
+            if postings_size < len(scores) * len(matches):
+                token_scores = self._score(matches, None)
+                return {doc: total + token_scores[doc] for doc, total in scores.items() if doc in token_scores}
+
+        if scores is None:
+            if len(matches) == 1:
+                (candidate, kind), = matches.items()
+                return {doc: weight * kind for doc, weight in self.postings[candidate].items()}
+            token_scores = {}
+            for candidate, kind in matches.items():
+                for doc, weight in self.postings[candidate].items():
+                    score = weight * kind
+                    if token_scores.get(doc, 0) < score:
+                        token_scores[doc] = score
+            return token_scores
+
+        narrowed = {}
+        for doc, total in scores.items():
+            best = 0
+            for candidate, kind in matches.items():
+                weight = self.postings[candidate].get(doc)
+                if weight is not None and weight * kind > best:
+                    best = weight * kind
+            if best:
+                narrowed[doc] = total + best
+        return narrowed
+
+    def _matching_tokens(self, token):
+        """Indexed tokens a query token matches, with the kind of match"""
+        matches = {token: EXACT} if token in self.postings else {}
+
+        vocabulary = self.vocabulary
+        start = bisect.bisect_left(vocabulary, token)
+        for position in range(start, min(start + MAX_PREFIX_EXPANSIONS, len(vocabulary))):
+            candidate = vocabulary[position]
+            if not candidate.startswith(token):
+                break
+            matches.setdefault(candidate, PREFIX)
+
+        typos = max_typos(token)
+        if typos:
+            for candidate in self._fuzzy_candidates(token, typos):
+                if candidate not in matches and edit_distance(token, candidate, typos) <= typos:
+                    matches[candidate] = FUZZY
+        return matches
+
+    def _fuzzy_candidates(self, token, typos):
+        """Indexed tokens sharing enough trigrams to be within `typos` edits"""
+        grams = trigrams(token)
+        # A substitution, insertion or deletion touches at most three
+        # trigrams, a transposition four
+        required = max(1, len(grams) - 4 * typos)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self.trigram_index.get(gram, ()):
+                shared[candidate] += 1
+        return [candidate for candidate, count in shared.items() if count >= required]
@@ -0,0 +1,151 @@
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are only single-flight within a process
+    fcntl = None
+
+logger = logging.getLogger()
+
+CHUNK_SIZE = 64 * 1024
+
+
+class SharedSnapshot:
+    """
+    A snapshot of some expensive upstream response, kept in a file that
+    every worker process on the host maps read-only.
+
+    - Fresh (younger than ttl): served straight from the mapping.
+    - Stale (younger than max_stale): served as is while one worker
+      refreshes it in the background (stale-while-revalidate).
+    - Missing or older than max_stale: the request waits for a refresh.
+
+    Refreshes are single-flight across processes: whoever holds the lock
+    file calls the loader, everyone else keeps serving the old snapshot or
+    waits for the new one. A new snapshot is written to a temp file and
+    renamed over the old one, so readers never see a partial file.
+    """
+
+    def __init__(self, path, loader, ttl=30, max_stale=600):
+        """
+        Args:
+            path (str): Snapshot file; the lock file is path + ".lock"
+            loader (callable): Returns the snapshot body as bytes
+            ttl (float): Seconds a snapshot is served without refreshing
+            max_stale (float): Seconds a stale snapshot may still be served
+        """
+        self.path = path
+        self.loader = loader
+        self.ttl = ttl
+        self.max_stale = max_stale
+
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._current = None   # (file identity, meta, mmap, body offset)
+
+    def read(self):
+        """
+        Return the current snapshot, refreshing it first if there is none
+        usable. Raises whatever the loader raised if nothing can be served.
+
+        Returns:
+            tuple: (meta dict with fetched_at/size/age, iterator of body chunks)
+        """
+        current = self._open()
+        age = None if current is None else time.time() - current[1]["fetched_at"]
+
+        if current is None or age >= self.max_stale:
+            try:
+                self._refresh(blocking=True)
+            except Exception:
+                if current is None:
+                    raise
+                logger.exception("Snapshot refresh failed, serving the old one")
+            current = self._open() or current
+        elif age >= self.ttl:
+            self._refresh_in_background()
+
+        _, meta, mapping, offset = current
+        meta = dict(meta, age=round(time.time() - meta["fetched_at"], 3))
+        return meta, self._chunks(mapping, offset)
+
+    @staticmethod
+    def _chunks(mapping, offset):
+        # The generator keeps the mapping alive even if a newer snapshot
+        # replaces it while the response is still streaming
+        for start in range(offset, len(mapping), CHUNK_SIZE):
+            yield mapping[start:start + CHUNK_SIZE]
+
+    def _open(self):
+        """Map the snapshot file, reusing the mapping while the file is unchanged"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        current = self._current
+        if current is not None and current[0] == identity:
+            return current
+
+        with open(self.path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = mapping.find(b"\n")
+        meta = json.loads(mapping[:header_end])
+        self._current = current = (identity, meta, mapping, header_end + 1)
+        return current
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._refresh(blocking=False)
+            except Exception as e:
+                logger.exception("Background snapshot refresh failed: %s", e)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="snapshot-refresh", daemon=True).start()
+
+    def _refresh(self, blocking):
+        """Reload the snapshot unless another process is already doing it"""
+        with open(self.path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                try:
+                    fcntl.flock(lock_file, flags)
+                except BlockingIOError:
+                    return
+            try:
+                # Whoever held the lock before us may have just refreshed it
+                current = self._open()
+                if current is not None and time.time() - current[1]["fetched_at"] < self.ttl:
+                    return
+                self._write(self.loader())
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, body):
+        header = json.dumps({"fetched_at": time.time(), "size": len(body)}).encode("utf-8")
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header + b"\n" + body)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        logger.info("Wrote %d byte snapshot to %s", len(body), self.path)
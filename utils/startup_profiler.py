@@ -0,0 +1,75 @@
+import functools
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger()
+
+# Set STARTUP_PROFILE=1 on a function to log a cold-start breakdown
+ENABLED = os.environ.get("STARTUP_PROFILE") == "1"
+
+_import_ms = {}     # module -> milliseconds spent importing it
+_init_ms = {}       # component -> milliseconds spent constructing it
+_profiled = set()   # handlers that already reported their first invocation
+
+
+@contextmanager
+def timed_import(module_name):
+    """Record how long the imports inside the block take"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _import_ms[module_name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+@contextmanager
+def timed_init(component):
+    """Record how long constructing a component (client, resource, service) takes"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _init_ms[component] = _init_ms.get(component, 0) + round((time.perf_counter() - started) * 1000, 2)
+
+
+def profile_startup(handler):
+    """
+    Decorator for Lambda entry points.
+
+    When STARTUP_PROFILE=1, the first invocation of each handler in a
+    container logs the module import times, the components built while
+    serving it and the total handler time as one JSON line.
+    """
+    if not ENABLED:
+        return handler
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        if handler.__name__ in _profiled:
+            return handler(event, context)
+
+        _profiled.add(handler.__name__)
+        init_before = dict(_init_ms)
+        started = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            handler_ms = round((time.perf_counter() - started) * 1000, 2)
+            init_ms = {
+                component: round(ms - init_before.get(component, 0), 2)
+                for component, ms in _init_ms.items()
+                if ms != init_before.get(component)
+            }
+            logger.info(json.dumps({
+                "startup_profile": {
+                    "handler": handler.__name__,
+                    "first_in_container": len(_profiled) == 1,
+                    "import_ms": _import_ms,
+                    "init_ms": init_ms,
+                    "handler_ms": handler_ms
+                }
+            }))
+    return wrapper
@@ -0,0 +1,44 @@
+import heapq
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from boto3.dynamodb.conditions import Key
+
+# Sparse GSI on the products table: hash key stock_shard, range key quantity.
+# Products are spread over a fixed number of shards so quantity updates don't
+# all land on one index partition. Changing the shard count needs a backfill.
+STOCK_INDEX_NAME = "stock-index"
+STOCK_INDEX_SHARDS = 8
+
+
+def stock_shard(product_id):
+    """Index shard a product belongs to; stable for a given productId"""
+    return str(zlib.crc32(str(product_id).encode("utf-8")) % STOCK_INDEX_SHARDS)
+
+
+def query_lowest_stock(table, k):
+    """
+    Return the k products with the lowest quantity, lowest first.
+
+    Reads the first k entries of every shard in parallel (quantity is the
+    index sort key) and merges them, so the cost is STOCK_INDEX_SHARDS
+    small queries regardless of catalog size.
+    """
+    def lowest_in_shard(shard):
+        response = table.query(
+            IndexName=STOCK_INDEX_NAME,
+            KeyConditionExpression=Key("stock_shard").eq(str(shard)),
+            ProjectionExpression="productId, product_name, quantity",
+            ScanIndexForward=True,
+            Limit=k
+        )
+        return response.get("Items", [])
+
+    with ThreadPoolExecutor(max_workers=STOCK_INDEX_SHARDS) as executor:
+        shard_items = list(executor.map(lowest_in_shard, range(STOCK_INDEX_SHARDS)))
+
+    return heapq.nsmallest(
+        k,
+        (item for items in shard_items for item in items),
+        key=lambda item: Decimal(item["quantity"])
+    )
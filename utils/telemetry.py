@@ -0,0 +1,235 @@
+import functools
+import logging
+import os
+import threading
+import time
+from utils.aws_clients import get_client
+
+logger = logging.getLogger()
+
+DEFAULT_REGION = "us-east-2"
+
+# Service limits for a single call
+MAX_EVENTS_PER_PUT = 10            # EventBridge put_events entries
+MAX_LOG_EVENTS_PER_PUT = 10000     # CloudWatch put_log_events events
+MAX_LOG_BYTES_PER_PUT = 1048576    # CloudWatch put_log_events payload
+LOG_EVENT_OVERHEAD_BYTES = 26      # CloudWatch counts 26 bytes per event on top of the message
+
+
+class TelemetryBuffer:
+    """
+    In-process queue for EventBridge events and CloudWatch log events.
+
+    Handlers enqueue telemetry instead of calling AWS on the request path.
+    In "background" mode a daemon thread drains the queue as items arrive;
+    in "deferred" mode nothing is sent until flush() is called at the end
+    of the invocation. Either way events go out in batched put_events /
+    put_log_events calls, and log groups/streams are only created once per
+    container.
+    """
+
+    def __init__(self, region=DEFAULT_REGION, mode=None, linger=0.05):
+        """
+        Args:
+            region (str): AWS region for the events and logs clients
+            mode (str): "background" or "deferred", defaults to TELEMETRY_MODE
+            linger (float): Seconds the background thread waits to collect a
+                batch, cut short as soon as flush() is called
+        """
+        self.region = region
+        self.mode = mode or os.environ.get("TELEMETRY_MODE", "background")
+        self.linger = linger
+
+        self._events = []
+        self._logs = {}              # (group, stream) -> [log events]
+        self._pending_streams = []   # (group, stream) to create without logging anything
+        self._known_groups = set()
+        self._known_streams = set()
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = False
+        self._worker = None
+        self._flush_requested = threading.Event()
+
+        self._events_client = None
+        self._logs_client = None
+
+    @property
+    def events_client(self):
+        if self._events_client is None:
+            self._events_client = get_client("events", region_name=self.region)
+        return self._events_client
+
+    @property
+    def logs_client(self):
+        if self._logs_client is None:
+            self._logs_client = get_client("logs", region_name=self.region)
+        return self._logs_client
+
+    def put_event(self, entry):
+        """Queue one put_events entry (Source, DetailType, Detail, EventBusName)"""
+        with self._lock:
+            self._events.append(entry)
+            self._notify()
+
+    def put_log(self, log_group_name, log_stream_name, message, timestamp=None):
+        """Queue one CloudWatch log event, creating the group/stream on first use"""
+        log_event = {
+            "timestamp": timestamp or int(time.time() * 1000),
+            "message": message
+        }
+        with self._lock:
+            self._logs.setdefault((log_group_name, log_stream_name), []).append(log_event)
+            self._notify()
+
+    def ensure_log_stream(self, log_group_name, log_stream_name):
+        """Queue creation of a log group/stream unless this container already made it"""
+        with self._lock:
+            if (log_group_name, log_stream_name) in self._known_streams:
+                return
+            self._pending_streams.append((log_group_name, log_stream_name))
+            self._notify()
+
+    def flush(self, timeout=None):
+        """
+        Send everything queued so far.
+
+        In background mode this wakes the worker so it drains the queue
+        straight away, without waiting out the linger, and waits up to
+        `timeout` seconds for it; anything left is sent after the next thaw.
+        """
+        if self.mode != "background":
+            self._drain()
+            return
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._notify()
+            while self._has_pending() or self._in_flight:
+                self._flush_requested.set()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    logger.warning("Telemetry flush timed out with events still queued")
+                    return
+                self._idle.wait(remaining)
+            # Nothing left to hurry; let the next batch linger again
+            self._flush_requested.clear()
+
+    def _has_pending(self):
+        return bool(self._events or self._logs or self._pending_streams)
+
+    def _notify(self):
+        """Wake the background worker. Caller holds the lock."""
+        if self.mode != "background":
+            return
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="telemetry-flush", daemon=True)
+            self._worker.start()
+        self._wakeup.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._has_pending():
+                    self._wakeup.wait()
+            # Give the request a moment to queue more telemetry into this batch,
+            # unless flush() is already waiting for it
+            self._flush_requested.wait(self.linger)
+            self._flush_requested.clear()
+            self._drain()
+
+    def _drain(self):
+        with self._lock:
+            events, self._events = self._events, []
+            logs, self._logs = self._logs, {}
+            streams, self._pending_streams = self._pending_streams, []
+            self._in_flight = True
+
+        try:
+            for log_group_name, log_stream_name in streams + list(logs):
+                self._create_log_stream(log_group_name, log_stream_name)
+            for (log_group_name, log_stream_name), log_events in logs.items():
+                self._send_log_events(log_group_name, log_stream_name, log_events)
+            self._send_events(events)
+        except Exception as e:
+            logger.exception("Error flushing telemetry: %s", e)
+        finally:
+            with self._lock:
+                self._in_flight = False
+                self._idle.notify_all()
+
+    def _send_events(self, events):
+        for start in range(0, len(events), MAX_EVENTS_PER_PUT):
+            batch = events[start:start + MAX_EVENTS_PER_PUT]
+            response = self.events_client.put_events(Entries=batch)
+            if response.get("FailedEntryCount", 0) > 0:
+                logger.warning("Failed to send %s event(s) to EventBridge: %s",
+                               response["FailedEntryCount"], response)
+
+    def _send_log_events(self, log_group_name, log_stream_name, log_events):
+        # put_log_events requires chronological order within a call
+        log_events.sort(key=lambda e: e["timestamp"])
+
+        batch, batch_bytes = [], 0
+        for log_event in log_events:
+            size = len(log_event["message"].encode("utf-8")) + LOG_EVENT_OVERHEAD_BYTES
+            if batch and (len(batch) >= MAX_LOG_EVENTS_PER_PUT or batch_bytes + size > MAX_LOG_BYTES_PER_PUT):
+                self._put_log_batch(log_group_name, log_stream_name, batch)
+                batch, batch_bytes = [], 0
+            batch.append(log_event)
+            batch_bytes += size
+        if batch:
+            self._put_log_batch(log_group_name, log_stream_name, batch)
+
+    def _put_log_batch(self, log_group_name, log_stream_name, batch):
+        self.logs_client.put_log_events(
+            logGroupName=log_group_name,
+            logStreamName=log_stream_name,
+            logEvents=batch
+        )
+
+    def _create_log_stream(self, log_group_name, log_stream_name):
+        if (log_group_name, log_stream_name) in self._known_streams:
+            return
+
+        if log_group_name not in self._known_groups:
+            try:
+                self.logs_client.create_log_group(logGroupName=log_group_name)
+            except self.logs_client.exceptions.ResourceAlreadyExistsException:
+                pass
+            self._known_groups.add(log_group_name)
+
+        try:
+            self.logs_client.create_log_stream(logGroupName=log_group_name, logStreamName=log_stream_name)
+        except self.logs_client.exceptions.ResourceAlreadyExistsException:
+            pass
+        self._known_streams.add((log_group_name, log_stream_name))
+
+
+telemetry = TelemetryBuffer()
+
+# How long an invocation waits for the background worker before returning
+FLUSH_TIMEOUT = float(os.environ.get("TELEMETRY_FLUSH_TIMEOUT", "0.5"))
+
+# Other buffers (e.g. the buffered SQS producer) flushed alongside telemetry
+_flush_hooks = []
+
+
+def register_flush(flush):
+    """Have flush_telemetry also call flush(timeout=...) at the end of every invocation"""
+    _flush_hooks.append(flush)
+
+
+def flush_telemetry(handler):
+    """Decorator for Lambda entry points: flush queued telemetry when the invocation ends"""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            for flush in _flush_hooks:
+                flush(timeout=FLUSH_TIMEOUT)
+            telemetry.flush(timeout=FLUSH_TIMEOUT)
+    return wrapper